@@ -0,0 +1,406 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Detection Pipeline Benchmark
+
+This script measures the throughput of the real-time and static pipelines without a
+webcam or GUI. The real-time pipeline (the capture, inference and render stages of
+RealTimeDetection, including tracking, crop cache and batching) runs on a recorded clip
+or on synthetic frames with 0-N faces; every frame is processed exactly once. The static
+pipeline runs on a directory of images. The report contains FPS, p50/p95/p99 latency per
+stage, peak RSS and model load time, and is written as JSON so runs can be compared
+across commits.
+
+Examples:
+    python src/benchmarks/benchmark_pipeline.py --synthetic 4 --face-image face.jpg --frames 300 -o before.json
+    python src/benchmarks/benchmark_pipeline.py --clip session.mp4 --images stills/ -o after.json
+    python src/benchmarks/benchmark_pipeline.py --compare before.json after.json
+"""
+
+import argparse
+import platform
+import subprocess
+import json
+import tempfile
+import shutil
+import time
+import sys
+import os
+import cv2
+import numpy as np
+from PIL import Image
+
+# Make the detection modules importable
+current_dir = os.path.dirname(os.path.abspath(__file__))
+detection_dir = os.path.join(current_dir, "..", "detection")
+sys.path.insert(0, detection_dir)
+
+from session_store import RESULTS_DIR_ENV
+
+# Keep the records and statistics of benchmark runs out of the results of the application
+results_dir = os.environ[RESULTS_DIR_ENV] = tempfile.mkdtemp(prefix="benchmark-results-")
+
+from emotion_model import create_local_model, analyze_image, INFERENCE_BACKENDS
+from emotion_detection_realtime import RealTimeDetection
+from face_detector import create_face_detector, DETECTOR_BACKENDS, DEFAULT_DETECTION_WIDTH
+from frame_recorder import ReplayCapture, is_recording
+from result_cache import CropCache
+from result_writer import ResultWriter
+from session_buffer import epoch_ms_now
+from metrics import Metrics
+
+STATIC_STAGES = ["decode", "analyze"]
+MIN_FACE_SIZE = 32  # Smallest synthetic face in pixels; smaller faces are not found by the detectors
+
+
+class SyntheticSource:
+    """
+    Capture source producing synthetic frames with a fixed number of faces.
+    A small set of frames is generated up front and replayed in a loop, so generating
+    frames does not distort the "read" stage.
+    """
+
+    def __init__(self, faces=0, face_image=None, size=(1280, 720), variants=30, seed=0):
+        """
+        Parameters:
+        - faces: Number of faces per frame (requires face_image if > 0).
+        - face_image: Path of a face photo that is pasted into the frames.
+        - size: Frame size as (width, height).
+        - variants: Number of distinct frames (faces jitter slightly between them).
+        """
+        rng = np.random.default_rng(seed)
+        width, height = size
+        face = None
+        if faces:
+            if face_image is None:
+                raise ValueError("--face-image is required for synthetic frames with faces.")
+            face = cv2.imread(face_image)
+            if face is None:
+                raise IOError(f"Cannot read face image: {face_image}")
+            face_size = min(height // 2, width // faces) - 20
+            if face_size < MIN_FACE_SIZE:
+                raise ValueError(f"{faces} faces do not fit into a {width}x{height} frame "
+                                 f"(at most {width // (MIN_FACE_SIZE + 20)} faces).")
+            face = cv2.resize(face, (face_size, face_size))
+
+        self.frames = []
+        for _ in range(variants):
+            frame = rng.integers(90, 110, size=(height, width, 3), dtype=np.uint8)
+            for i in range(faces):
+                jitter_x, jitter_y = rng.integers(-5, 6, size=2)
+                x = max(0, min(width - face.shape[1], 10 + i * (face.shape[1] + 20) + int(jitter_x)))
+                y = max(0, min(height - face.shape[0], height // 4 + int(jitter_y)))
+                frame[y:y+face.shape[0], x:x+face.shape[1]] = face
+            self.frames.append(frame)
+        self.position = 0
+
+    def read(self, image=None):
+        """Returns the next frame like cv2.VideoCapture.read(image), reusing `image` if it fits."""
+        frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def release(self):
+        """Nothing to release."""
+
+
+class BenchmarkCapture:
+    """
+    Capture object of the benchmarked stream: delivers the frames of a source until the
+    frame limit is reached, so the capture stage ends like at the end of a video file.
+
+    Attributes:
+    - source: Object with a cv2.VideoCapture-like read() method.
+    - frames: Maximum number of frames delivered.
+    - frames_read (int): Number of frames delivered so far.
+    """
+
+    def __init__(self, source, frames):
+        """Initialize the frame counter."""
+        self.source = source
+        self.frames = frames
+        self.frames_read = 0
+
+    def isOpened(self):
+        """The source was opened by the caller."""
+        return True
+
+    def read(self, image=None):
+        """Returns the next frame of the source, or (False, None) once the limit is reached."""
+        if self.frames_read >= self.frames:
+            return False, None
+        ret, frame = self.source.read(image)
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+
+    def set(self, property_id, value):
+        """The resolution of the benchmark source is fixed."""
+        return False
+
+    def release(self):
+        """Releases the source."""
+        self.source.release()
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None if unavailable."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+
+
+def summarize(samples):
+    """Computes mean and p50/p95/p99 of latency samples given in seconds, reported in ms."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean_ms": float(values.mean()), "p50_ms": float(p50),
+            "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def benchmark_realtime(source, frames, use_tracker=False, detector_name="haar", detection_width=DEFAULT_DETECTION_WIDTH,
+                       backend="tf", max_batch=32, crop_cache=None, inference_workers=1):
+    """
+    Runs the real-time pipeline of RealTimeDetection (capture, inference and render stages)
+    on a capture source and times its stages. The stream is lossless, so every frame is
+    processed exactly once and the FPS is the throughput of the pipeline.
+
+    Parameters:
+    - source: Object with a cv2.VideoCapture-like read() method.
+    - frames: Maximum number of frames to process.
+    - use_tracker: Use the face tracker and per-track inference cadence of RealTimeDetection
+      instead of detecting and analyzing every face on every frame.
+    - detector_name: Face detector backend (see face_detector.DETECTOR_BACKENDS).
+    - detection_width: Width frames are downscaled to for the detection (None keeps full resolution).
+    - backend: Inference backend ("tf", "onnx" or "onnx-int8").
+    - max_batch: Maximum number of faces per model invocation.
+    - crop_cache: CropCache reusing the analysis of unchanged face crops, or None.
+    - inference_workers: Number of inference worker threads.
+
+    Returns:
+    - dict: FPS, per-stage latency statistics and model load time.
+    """
+    metrics = Metrics(enabled=True, window=None)  # Keep every sample of the run
+    interval = {} if use_tracker else {"detection_interval": 1, "inference_interval": 1}
+    detector = RealTimeDetection(sources=("benchmark",), metrics=metrics, detector=detector_name,
+                                 detection_width=detection_width, max_batch=max_batch, crop_cache=crop_cache,
+                                 inference_workers=inference_workers, **interval)
+    stream = detector.streams[0]
+    stream.cap = BenchmarkCapture(source, frames)
+    stream.mirror = getattr(source, "mirror", True)  # Camera frames are mirrored; recordings know their source
+    stream.lossless = True
+    stream.face_detector = create_face_detector(detector_name, detection_width)
+    detector.emotion_model = create_local_model(backend)
+
+    load_start = time.perf_counter()
+    detector.emotion_model.load()
+    detector.emotion_model.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)])
+    model_load_s = time.perf_counter() - load_start
+
+    detector.session_start = time.monotonic()
+    detector.start_epoch_ms = epoch_ms_now()
+    detector.result_writer = ResultWriter(os.path.join(results_dir, "emotions_results.csv"), metrics=metrics,
+                                          label=None).start()
+    run_start = time.perf_counter()
+    detector.run_stages()
+    elapsed = time.perf_counter() - run_start
+    detector.result_writer.close()
+    stream.cap.release()
+
+    processed = stream.cap.frames_read
+    snapshot = metrics.snapshot()
+    return {
+        "frames": processed,
+        "fps": processed / elapsed if elapsed else 0.0,
+        "analyses_per_frame": detector.stats.records / processed if processed else 0.0,
+        "crop_cache_hit_rate": crop_cache.hit_rate() if crop_cache is not None else None,
+        "model_load_s": model_load_s,
+        "counters": snapshot["counters"],
+        "stages": snapshot["latency"],
+    }
+
+
+def benchmark_static(image_dir, limit=None, backend="tf"):
+    """
+    Runs the static pipeline (decode + analysis) on every image of a directory.
+    The "tf" backend uses DeepFace.analyze, the ONNX backends the Haar Cascade and ONNX Runtime.
+
+    Returns:
+    - dict: Throughput, per-stage latency statistics and model load time.
+    """
+    images = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                    if name.lower().endswith((".jpg", ".jpeg", ".png")))[:limit]
+
+    load_start = time.perf_counter()
+    model = create_local_model(backend)
+    model.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)])
+    if backend == "tf":
+        from deepface import DeepFace
+        DeepFace.analyze(np.zeros((224, 224, 3), dtype=np.uint8), actions=['emotion'], enforce_detection=False)
+    model_load_s = time.perf_counter() - load_start
+
+    timings = {stage: [] for stage in STATIC_STAGES}
+    errors = 0
+    run_start = time.perf_counter()
+    for path in images:
+        t0 = time.perf_counter()
+        with Image.open(path) as img:
+            img.load()
+        t1 = time.perf_counter()
+        try:
+            analyze_image(path, model=model)
+        except Exception:
+            errors += 1
+        t2 = time.perf_counter()
+        timings["decode"].append(t1 - t0)
+        timings["analyze"].append(t2 - t1)
+    elapsed = time.perf_counter() - run_start
+
+    return {
+        "images": len(images),
+        "errors": errors,
+        "images_per_s": len(images) / elapsed if elapsed else 0.0,
+        "model_load_s": model_load_s,
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+    }
+
+
+def run_metadata(args):
+    """Collects information identifying the benchmark run (commit, versions, settings)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=current_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+
+
+def compare_reports(before_path, after_path):
+    """Prints the relative change of the main metrics between two benchmark reports."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def rows(report):
+        values = {}
+        for section in ("realtime", "static"):
+            data = report.get(section)
+            if not data:
+                continue
+            for key in ("fps", "images_per_s", "model_load_s"):
+                if key in data:
+                    values[f"{section}.{key}"] = data[key]
+            for stage, stats in data.get("stages", {}).items():
+                if "p95_ms" in stats:
+                    values[f"{section}.{stage}.p95_ms"] = stats["p95_ms"]
+        values["peak_rss_mb"] = report.get("peak_rss_mb")
+        return values
+
+    before_rows, after_rows = rows(before), rows(after)
+    print(f"{'metric':34} {'before':>12} {'after':>12} {'change':>9}")
+    for key in before_rows.keys() & after_rows.keys():
+        old, new = before_rows[key], after_rows[key]
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:34} {old:12.2f} {new:12.2f} {change:>9}")
+
+
+def main():
+    """Parses the command line and runs the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Headless benchmark of the emotion detection pipelines.")
+    parser.add_argument("--clip", help="Recorded video clip or raw frame recording (*.mcqraw) used as real-time source.")
+    parser.add_argument("--synthetic", type=int, metavar="FACES",
+                        help="Use synthetic frames with this many faces as real-time source.")
+    parser.add_argument("--face-image", help="Face photo pasted into the synthetic frames.")
+    parser.add_argument("--frame-size", default="1280x720", help="Synthetic frame size (WIDTHxHEIGHT).")
+    parser.add_argument("--frames", type=int, default=300, help="Number of real-time frames to process.")
+    parser.add_argument("--use-tracker", action="store_true",
+                        help="Benchmark the tracker path (keyframe detection, per-track inference cadence).")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="haar", help="Face detector backend.")
+    parser.add_argument("--detection-width", type=int, default=DEFAULT_DETECTION_WIDTH,
+                        help="Downscale frames to this width for the face detection (0 keeps full resolution).")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default="tf", help="Inference backend.")
+    parser.add_argument("--max-batch", type=int, default=32, help="Maximum number of faces per model invocation.")
+    parser.add_argument("--inference-workers", type=int, default=1, help="Number of inference worker threads.")
+    parser.add_argument("--no-cache", action="store_true", help="Analyze every due face crop, even if unchanged.")
+    parser.add_argument("--images", help="Directory of images for the static pipeline.")
+    parser.add_argument("--image-limit", type=int, default=None, help="Maximum number of static images.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="JSON report file.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two JSON reports.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    if not (args.clip or args.synthetic is not None or args.images):
+        parser.error("Select at least one fixture: --clip, --synthetic or --images.")
+
+    report = {"meta": run_metadata(args)}
+    if args.clip or args.synthetic is not None:
+        if is_recording(args.clip):
+            # Raw frame recordings are replayed as fast as possible, without decoding costs
+            source = ReplayCapture(args.clip, pacing="fast")
+            if not source.isOpened():
+                parser.error(f"Cannot open recording: {args.clip}")
+        elif args.clip:
+            source = cv2.VideoCapture(args.clip)
+            if not source.isOpened():
+                parser.error(f"Cannot open clip: {args.clip}")
+        else:
+            width, height = (int(v) for v in args.frame_size.lower().split("x"))
+            try:
+                source = SyntheticSource(args.synthetic, args.face_image, size=(width, height))
+            except (ValueError, IOError) as e:
+                parser.error(str(e))
+        crop_cache = None if args.no_cache else CropCache()
+        report["realtime"] = benchmark_realtime(source, args.frames, args.use_tracker,
+                                                args.detector, args.detection_width or None, args.backend,
+                                                args.max_batch, crop_cache, args.inference_workers)
+        inference = report["realtime"]["stages"].get("inference", {})
+        print(f"Real-time: {report['realtime']['fps']:.1f} FPS, "
+              f"p95 inference latency {inference.get('p95_ms', 0):.1f} ms")
+
+    if args.images:
+        report["static"] = benchmark_static(args.images, args.image_limit, args.backend)
+        print(f"Static: {report['static']['images_per_s']:.2f} images/s")
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    shutil.rmtree(results_dir, ignore_errors=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Inference Service Load Test
+
+This script sends concurrent requests to a running inference service
+(src/detection/inference_service.py) and reports the throughput, the p50/p95/p99
+latency, the number of requests rejected with 503 (backpressure) and the errors.
+The report is written as JSON, so different batch settings can be compared.
+
+Examples:
+    python src/benchmarks/load_test_service.py --concurrency 16 --requests 2000 --faces 4
+    python src/benchmarks/load_test_service.py --image face.jpg --concurrency 8 -o load.json
+    python src/benchmarks/load_test_service.py --address unix:/tmp/mcq-emotion.sock --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import sys
+import os
+import numpy as np
+
+# Make the detection modules importable
+current_dir = os.path.dirname(os.path.abspath(__file__))
+detection_dir = os.path.join(current_dir, "..", "detection")
+sys.path.insert(0, detection_dir)
+
+from inference_client import AsyncInferenceClient, ServiceBusy, service_address
+
+
+def summarize(samples):
+    """Computes mean and p50/p95/p99 of latency samples given in seconds, reported in ms."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean_ms": float(values.mean()), "p50_ms": float(p50),
+            "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+async def run_load(address, concurrency, requests, duration, image_bytes=None, faces=1, face_size=96):
+    """
+    Runs the load test with `concurrency` clients sending requests back to back.
+
+    Parameters:
+    - address: Service address.
+    - concurrency: Number of concurrent requests.
+    - requests: Total number of requests (ignored if duration is given).
+    - duration: Seconds to run instead of a fixed number of requests.
+    - image_bytes: Encoded image sent to /v1/image; without it, random face crops are sent to /v1/faces.
+    - faces: Number of face crops per /v1/faces request.
+    - face_size: Edge length of the random face crops.
+
+    Returns:
+    - dict: Throughput, latency summary and counts of rejected and failed requests.
+    """
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, (face_size, face_size, 3), dtype=np.uint8) for _ in range(faces)]
+    latencies = []
+    counts = {"ok": 0, "rejected": 0, "errors": 0}
+    remaining = [requests]
+    deadline = time.monotonic() + duration if duration else None
+
+    async with AsyncInferenceClient(address, max_connections=concurrency) as client:
+        print(f"Service: {await client.health()}")
+
+        async def user():
+            while True:
+                if deadline is not None:
+                    if time.monotonic() >= deadline:
+                        return
+                elif remaining[0] <= 0:
+                    return
+                else:
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                try:
+                    if image_bytes is not None:
+                        await client.analyze_image_bytes(image_bytes)
+                    else:
+                        await client.analyze_faces(crops)
+                    latencies.append(time.perf_counter() - start)
+                    counts["ok"] += 1
+                except ServiceBusy as e:
+                    counts["rejected"] += 1
+                    await asyncio.sleep(min(e.retry_after, 0.1))  # Back off briefly, like a well-behaved client
+                except Exception as e:
+                    counts["errors"] += 1
+                    if counts["errors"] == 1:
+                        print(f"First error: {e}")
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start_time
+
+    faces_per_request = None if image_bytes is not None else faces
+    return {
+        "concurrency": concurrency,
+        "faces_per_request": faces_per_request,
+        "elapsed_s": elapsed,
+        "requests_per_s": counts["ok"] / elapsed if elapsed else 0.0,
+        "faces_per_s": counts["ok"] * faces_per_request / elapsed if elapsed and faces_per_request else None,
+        "latency": summarize(latencies),
+        **counts,
+    }
+
+
+def main():
+    """Parses the command line and runs the load test."""
+    parser = argparse.ArgumentParser(description="Load test of the local emotion inference service.")
+    parser.add_argument("--address", default=None, help="Service address (default: MCQ_SERVICE_ADDRESS or 127.0.0.1:8765).")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Number of concurrent requests.")
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="Total number of requests.")
+    parser.add_argument("--duration", type=float, default=None, help="Run for this many seconds instead.")
+    parser.add_argument("--image", default=None, help="Send this image file to /v1/image (random face crops otherwise).")
+    parser.add_argument("--faces", type=int, default=1, help="Face crops per request without --image.")
+    parser.add_argument("-o", "--output", default="load_test_results.json", help="JSON report file.")
+    args = parser.parse_args()
+
+    image_bytes = None
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+
+    address = service_address(args.address)
+    report = asyncio.run(run_load(address, args.concurrency, args.requests, args.duration, image_bytes, args.faces))
+    report["address"] = address
+    latency = report["latency"]
+    print(f"{report['ok']} requests in {report['elapsed_s']:.1f} s: {report['requests_per_s']:.1f} req/s, "
+          f"p50 {latency.get('p50_ms', 0):.1f} ms, p99 {latency.get('p99_ms', 0):.1f} ms, "
+          f"{report['rejected']} rejected (503), {report['errors']} errors")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Load test report saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
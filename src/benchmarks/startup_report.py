@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Startup Time Report
+
+This script measures how long the application takes to start and where the import time
+goes, using the `-X importtime` output of the interpreter. Each target runs in a fresh
+interpreter:
+- controller: main.py until its window is shown (it quits right away with --startup-probe),
+- detection: importing the real-time detection script with all its modules,
+- model: importing DeepFace and loading the emotion model.
+
+The report lists the wall time of every target, the slowest imports by cumulative time
+and the import time per top-level package. It is written as JSON, so the startup can be
+tracked across releases.
+
+Examples:
+    python src/benchmarks/startup_report.py -o startup.json
+    python src/benchmarks/startup_report.py --targets controller --top 30
+    python src/benchmarks/startup_report.py --compare before.json after.json
+"""
+
+import argparse
+import subprocess
+import platform
+import json
+import time
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "..")
+detection_dir = os.path.join(src_dir, "detection")
+
+# Command line and working directory of every target
+TARGETS = {
+    "controller": (["main.py", "--startup-probe"], src_dir),
+    "detection": (["-c", "import emotion_detection_realtime"], detection_dir),
+    "model": (["-c", "from emotion_model import EmotionModel; EmotionModel().load()"], detection_dir),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parses the `-X importtime` lines of a process.
+
+    Returns:
+    - list: One dict per imported module (module, self_ms, cumulative_ms, depth), in import order.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue  # Skip other output and the header line
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            imports.append({
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return imports
+
+
+def summarize_imports(imports, top):
+    """Sums the import time per top-level package and picks the slowest imports."""
+    packages = {}
+    for entry in imports:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + entry["self_ms"]
+    slowest = sorted(imports, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+    return {
+        "total_import_ms": sum(entry["self_ms"] for entry in imports),
+        "module_count": len(imports),
+        "slowest": [{key: entry[key] for key in ("module", "self_ms", "cumulative_ms")} for entry in slowest],
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]),
+    }
+
+
+def measure_target(name, top, timeout):
+    """
+    Runs one target in a fresh interpreter with `-X importtime`.
+
+    Returns:
+    - dict: Wall time, exit code, the time until the window was shown (controller only) and the import summary.
+    """
+    arguments, cwd = TARGETS[name]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=cwd,
+                                 capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout} s"}
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    result = {"wall_ms": wall_ms, "returncode": process.returncode}
+    for line in process.stdout.splitlines():
+        if line.startswith("STARTUP_MS"):
+            result["window_shown_ms"] = float(line.split()[1])
+    if process.returncode != 0:
+        # Keep the last line of the traceback (e.g. a missing package or no display)
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        result["error"] = errors[-1] if errors else f"exit code {process.returncode}"
+    result.update(summarize_imports(parse_importtime(process.stderr), top))
+    return result
+
+
+def run_metadata():
+    """Collects information identifying the run (commit, versions)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=current_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare_reports(before_path, after_path):
+    """Prints the relative change of the startup times between two reports."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def rows(report):
+        values = {}
+        for name, data in report.get("targets", {}).items():
+            for key in ("wall_ms", "window_shown_ms", "total_import_ms"):
+                if key in data:
+                    values[f"{name}.{key}"] = data[key]
+            for package, value in data.get("packages_ms", {}).items():
+                values[f"{name}.{package}"] = value
+        return values
+
+    before_rows, after_rows = rows(before), rows(after)
+    print(f"{'metric':40} {'before':>10} {'after':>10} {'change':>9}")
+    for key in sorted(before_rows.keys() & after_rows.keys()):
+        old, new = before_rows[key], after_rows[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:40} {old:10.1f} {new:10.1f} {change:>9}")
+
+
+def main():
+    """Parses the command line and measures the selected targets."""
+    parser = argparse.ArgumentParser(description="Startup time and import time report.")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS),
+                        help="Startup paths to measure.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per target; the fastest run is reported.")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest imports and packages listed.")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before a target is aborted.")
+    parser.add_argument("-o", "--output", default="startup_report.json", help="JSON report file.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two JSON reports.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    report = {"meta": run_metadata(), "targets": {}}
+    for name in args.targets:
+        # The first run also fills the file system cache; the fastest run is the most stable number
+        runs = [measure_target(name, args.top, args.timeout) for _ in range(max(args.repeat, 1))]
+        result = min(runs, key=lambda run: run.get("wall_ms", float("inf")))
+        report["targets"][name] = result
+        if "error" in result:
+            print(f"{name}: failed ({result['error']})")
+        shown = f", window shown after {result['window_shown_ms']:.0f} ms" if "window_shown_ms" in result else ""
+        if "wall_ms" in result:
+            print(f"{name}: {result['wall_ms']:.0f} ms wall{shown}, {result['total_import_ms']:.0f} ms imports "
+                  f"in {result['module_count']} modules")
+            for package, value in list(result["packages_ms"].items())[:5]:
+                print(f"    {package:24} {value:8.1f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Startup report saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
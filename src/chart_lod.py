@@ -0,0 +1,170 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Level of Detail for Line Charts
+
+Helpers that keep the emotion line chart fast for long sessions:
+- decimation of a series to about the pixel width of the chart (min/max pre-pass + LTTB),
+- a cache of the smoothed series per session, so zooming and redrawing never re-smooth,
+- a hover hit-test that only looks at the points next to the mouse position.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Selects n_out points of a series with the Largest-Triangle-Three-Buckets algorithm,
+    which preserves the visual shape (peaks and troughs) of the line.
+
+    Parameters:
+    - x, y: NumPy arrays of the series (x sorted ascending).
+    - n_out: Number of points to keep.
+
+    Returns:
+    - np.ndarray: Sorted indices of the selected points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    selected = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+
+        # Average point of the next bucket
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Point of this bucket forming the largest triangle with the previous selection and the average
+        areas = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Keeps the minimum and the maximum of each of n_buckets equally sized buckets.
+    Cheap, fully vectorized pre-reduction for very long series.
+
+    Returns:
+    - np.ndarray: Sorted unique indices of the selected points.
+    """
+    n = len(y)
+    size = -(-n // n_buckets)
+    rows = -(-n // size)
+    padded = np.pad(y, (0, rows * size - n), mode="edge").reshape(rows, size)
+    offsets = np.arange(rows) * size
+    indices = np.concatenate((offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)))
+    return np.unique(np.minimum(indices, n - 1))
+
+
+def decimate(x, y, n_out):
+    """
+    Reduces a series to about n_out points for drawing.
+    Very long series are first reduced with min/max buckets, then LTTB picks the final points.
+
+    Returns:
+    - tuple: (x, y) arrays of the decimated series.
+    """
+    if len(x) <= n_out:
+        return x, y
+    if len(x) > 8 * n_out:
+        keep = minmax_indices(y, 2 * n_out)
+        x, y = x[keep], y[keep]
+    keep = lttb_indices(x, y, n_out)
+    return x[keep], y[keep]
+
+
+def visible_slice(x, x_min, x_max):
+    """Returns the slice of a sorted x array that lies within the view (plus one point on each side)."""
+    start = max(int(np.searchsorted(x, x_min, side="left")) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side="right")) + 1, len(x))
+    return slice(start, stop)
+
+
+class SeriesCache:
+    """
+    Bounded cache of precomputed (smoothed) series per session.
+
+    Attributes:
+    - max_sessions (int): Number of sessions kept before the least recently used one is evicted.
+    """
+
+    def __init__(self, max_sessions=8):
+        """Initialize an empty cache."""
+        self.max_sessions = max_sessions
+        self.entries = OrderedDict()
+
+    def get(self, key, compute):
+        """
+        Returns the cached value for a session, computing it on the first request.
+
+        Parameters:
+        - key: Hashable key identifying the session data (e.g. file names, sizes and modification times).
+        - compute: Callable producing the value if it is not cached.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.max_sessions:
+            self.entries.popitem(last=False)
+        return value
+
+
+def _segment_distance(p, a, b):
+    """Distance in pixels between point p and the segment a-b."""
+    ab = b - a
+    length = float(ab @ ab)
+    t = 0.0 if length == 0 else min(max(float((p - a) @ ab) / length, 0.0), 1.0)
+    return float(np.hypot(*(p - (a + t * ab))))
+
+
+def nearest_line(ax, lines, event, tolerance=5.0):
+    """
+    Finds the line closest to the mouse position.
+    Only the drawn segment under the mouse x position is tested per line, so the cost
+    does not depend on the number of points.
+
+    Parameters:
+    - ax: The axes of the lines.
+    - lines: Dict of name to Line2D with sorted x data.
+    - event: The matplotlib mouse event.
+    - tolerance: Maximum distance in pixels to count as a hit.
+
+    Returns:
+    - The name of the nearest line, or None if no line is within the tolerance.
+    """
+    if event.xdata is None or event.ydata is None:
+        return None
+
+    mouse = np.array([event.x, event.y], dtype=float)
+    best_name, best_distance = None, tolerance
+    for name, line in lines.items():
+        x_data, y_data = line.get_xdata(), line.get_ydata()
+        if len(x_data) == 0:
+            continue
+        i = int(np.searchsorted(x_data, event.xdata))
+        first, last = max(i - 1, 0), min(i, len(x_data) - 1)
+        a, b = ax.transData.transform([(x_data[first], y_data[first]), (x_data[last], y_data[last])])
+        distance = _segment_distance(mouse, a, b)
+        if distance <= best_distance:
+            best_name, best_distance = name, distance
+    return best_name
@@ -0,0 +1,311 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Headless Batch Emotion Detection
+
+This script analyzes many images without a GUI. Inputs can be directories, glob
+patterns or single files. The images are distributed over a pool of worker processes
+(each loads the emotion model of the selected backend once) and the results are streamed to a CSV file or a
+Parquet dataset as soon as they complete. An interrupted run can be resumed: images
+that already appear in the output are skipped.
+
+Example:
+    python src/detection/emotion_detection_batch.py photos/ "survey/**/*.jpg" -o results.csv --workers 8
+    python src/detection/emotion_detection_batch.py photos/ -o results.parquet --backend onnx-int8
+"""
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import argparse
+import glob
+import time
+import csv
+import os
+
+from emotion_model import EMOTION_LABELS, INFERENCE_BACKENDS, analyze_image, create_local_model
+
+# Image types picked up when a directory is given as input
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Columns of the batch results
+BATCH_FIELDNAMES = ["file", "face_index", "dominant_emotion", *EMOTION_LABELS, "error"]
+
+# Emotion model of a pool worker, created by init_worker
+_emotion_model = None
+
+
+def collect_images(inputs):
+    """
+    Expands directories, glob patterns and file paths into a sorted list of image files.
+
+    Parameters:
+    - inputs: List of directories, glob patterns or files.
+
+    Returns:
+    - list: Absolute paths of the images, without duplicates.
+    """
+    images = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                images.update(os.path.join(dirpath, name) for name in filenames
+                              if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif os.path.isfile(item):
+            images.add(item)
+        else:
+            images.update(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in images)
+
+
+def init_worker(backend=None):
+    """
+    Initializes a pool worker: creates and loads the emotion model once,
+    so that every following image of this worker reuses the loaded model.
+
+    Parameters:
+    - backend: Inference backend; None uses the MCQ_INFERENCE_BACKEND environment variable or "tf".
+    """
+    global _emotion_model
+    _emotion_model = create_local_model(backend)
+    _emotion_model.load()
+
+
+def analyze_file(file_path):
+    """
+    Analyzes one image in a pool worker.
+
+    Parameters:
+    - file_path: Path of the image.
+
+    Returns:
+    - list: One result row per detected face, or a single row describing the error.
+    """
+    try:
+        analysis = analyze_image(file_path, model=_emotion_model)
+    except Exception as e:
+        return [{"file": file_path, "face_index": "", "dominant_emotion": "", "error": str(e)}]
+
+    rows = []
+    for face_index, face in enumerate(analysis):
+        rows.append({
+            "file": file_path,
+            "face_index": face_index,
+            "dominant_emotion": face['dominant_emotion'],
+            **{label: float(face['emotion'][label]) for label in EMOTION_LABELS},
+            "error": "",
+        })
+    return rows
+
+
+class CsvResultSink:
+    """
+    Appends result rows to a CSV file and flushes them immediately.
+
+    Attributes:
+    - path (str): Path of the CSV file.
+    """
+
+    def __init__(self, path, resume=True):
+        """
+        Opens the CSV file and writes the header for new files.
+
+        Parameters:
+        - path: Path of the CSV file.
+        - resume: Append to existing results; with False, the file is overwritten.
+        """
+        self.path = path
+        new_file = not resume or not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            self._drop_partial_line()
+        self.file = open(path, "w" if new_file else "a", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=BATCH_FIELDNAMES)
+        if new_file:
+            self.writer.writeheader()
+
+    def _drop_partial_line(self):
+        """Removes a row that was only partially written when a previous run crashed."""
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def completed_files(self):
+        """Returns the files that already have results in the CSV file."""
+        with open(self.path, newline="") as f:
+            return {row["file"] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        """Appends rows and flushes them to disk."""
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        """Closes the CSV file."""
+        self.file.close()
+
+
+class ParquetResultSink:
+    """
+    Writes result rows as a Parquet dataset (a directory of part files).
+    Every chunk becomes a complete part file, so a crash never corrupts earlier results.
+    Requires pandas and pyarrow.
+
+    Attributes:
+    - path (str): Directory of the Parquet dataset.
+    - chunk_size (int): Number of rows per part file.
+    """
+
+    def __init__(self, path, chunk_size=1000, resume=True):
+        """
+        Creates the dataset directory.
+
+        Parameters:
+        - path: Directory of the Parquet dataset.
+        - chunk_size: Number of rows per part file.
+        - resume: Add to existing part files; with False, they are deleted first.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+        if not resume:
+            for part_file in self._part_files():
+                os.remove(part_file)
+        self.next_part = len(self._part_files())
+
+    def _part_files(self):
+        """Returns the part files of the dataset."""
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def completed_files(self):
+        """Returns the files that already have results in the dataset."""
+        import pandas as pd
+
+        completed = set()
+        for part_file in self._part_files():
+            completed.update(pd.read_parquet(part_file, columns=["file"])["file"])
+        return completed
+
+    def write(self, rows):
+        """Buffers rows and writes a part file once a chunk is complete."""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        """Writes the buffered rows as a new part file."""
+        if not self.pending:
+            return
+        import pandas as pd
+
+        part_path = os.path.join(self.path, f"part-{self.next_part:05d}.parquet")
+        frame = pd.DataFrame(self.pending, columns=BATCH_FIELDNAMES)
+        frame["face_index"] = pd.to_numeric(frame["face_index"], errors="coerce").astype("Int16")
+        # Write to a temporary name first so a crash never leaves a truncated part file
+        frame.to_parquet(part_path + ".tmp", index=False, engine="pyarrow")
+        os.replace(part_path + ".tmp", part_path)
+        self.next_part += 1
+        self.pending = []
+
+    def close(self):
+        """Writes the remaining rows."""
+        self._flush()
+
+
+def open_sink(output_path, resume=True):
+    """Returns the result sink matching the output file extension (resume=False discards existing results)."""
+    if output_path.lower().endswith(".parquet"):
+        return ParquetResultSink(output_path, resume=resume)
+    return CsvResultSink(output_path, resume=resume)
+
+
+def run_batch(images, sink, workers=None, report_interval=5.0, backend=None):
+    """
+    Analyzes the images with a process pool and streams the results to the sink.
+
+    Parameters:
+    - images: List of image paths to analyze.
+    - sink: CsvResultSink or ParquetResultSink receiving the result rows.
+    - workers: Number of worker processes (defaults to the number of CPUs).
+    - report_interval: Seconds between two progress reports.
+    - backend: Inference backend of the workers (see emotion_model.INFERENCE_BACKENDS).
+
+    Returns:
+    - int: Number of analyzed images.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4  # Keep the workers busy without queueing every image at once
+    total = len(images)
+    done = errors = 0
+    start_time = last_report = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(backend,)) as executor:
+        remaining = iter(images)
+        in_flight = set()
+        while True:
+            for file_path in remaining:
+                in_flight.add(executor.submit(analyze_file, file_path))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows = future.result()
+                errors += any(row["error"] for row in rows)
+                sink.write(rows)
+                done += 1
+
+            now = time.perf_counter()
+            if now - last_report >= report_interval or done == total:
+                rate = done / max(now - start_time, 1e-9)
+                eta = (total - done) / rate if rate else float("inf")
+                print(f"{done}/{total} images ({errors} errors), {rate:.1f} images/s, ETA {eta:.0f} s", flush=True)
+                last_report = now
+
+    return done
+
+
+def main():
+    """Parses the command line and runs the batch analysis."""
+    parser = argparse.ArgumentParser(description="Headless batch emotion analysis of images.")
+    parser.add_argument("inputs", nargs="+", help="Image directories, glob patterns or files.")
+    parser.add_argument("-o", "--output", default="batch_results.csv",
+                        help="Output CSV file or Parquet dataset directory (*.parquet).")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--no-resume", action="store_true", help="Discard existing results and analyze every image again.")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=None,
+                        help="Inference backend (default: MCQ_INFERENCE_BACKEND or tf).")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between progress reports.")
+    args = parser.parse_args()
+
+    images = collect_images(args.inputs)
+    sink = open_sink(args.output, resume=not args.no_resume)
+    try:
+        if not args.no_resume:
+            completed = sink.completed_files()
+            if completed:
+                print(f"Resuming: skipping {len(completed)} already analyzed images.")
+            images = [path for path in images if path not in completed]
+
+        if not images:
+            print("No images to analyze.")
+            return
+
+        start_time = time.perf_counter()
+        done = run_batch(images, sink, workers=args.workers, report_interval=args.report_interval,
+                         backend=args.backend)
+        elapsed = time.perf_counter() - start_time
+        print(f"Analyzed {done} images in {elapsed:.1f} s ({done / max(elapsed, 1e-9):.1f} images/s). "
+              f"Results saved to {args.output}.")
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,143 +7,771 @@
 """
 Real-Time Emotion Detection GUI
 
-This script uses a webcam to detect faces in real-time, analyze emotions
+This script uses one or more cameras to detect faces in real-time, analyze emotions
 using the DeepFace library, and display results in a Tkinter GUI.
 Emotion data is saved to a CSV file for further analysis.
+
+Several capture sources (e.g. participant face and side angle) can run in one process.
+Each source has its own capture and render thread, while a shared pool of inference
+workers micro-batches the faces of all streams into one model invocation, so the model
+and the TensorFlow runtime are loaded only once.
 """
 
 from tkinter import *
-from threading import Thread
+from threading import Thread, Lock, Condition
+from itertools import zip_longest
+from queue import Queue, Empty, Full
 import cv2
+import numpy as np
 from PIL import Image, ImageTk
-from deepface import DeepFace
-import csv
+from emotion_model import create_emotion_model, INFERENCE_BACKENDS
+from emotion_stats import EmotionAggregator, STATS_FILENAME
+from face_tracker import FaceTracker
+from face_detector import create_face_detector, DETECTOR_BACKENDS, DEFAULT_DETECTION_WIDTH
+from result_writer import ResultWriter, BinaryResultWriter
+from session_buffer import epoch_ms_now, format_time_of_day
+from session_store import results_directory
+from frame_pool import FramePool, FrameBuffer, FrameSlot
+from frame_recorder import FrameRecorder, ReplayCapture, is_recording, REPLAY_PACINGS
+from result_cache import CropCache, dhash
+from quality_controller import QualityController, QUALITY_FIELDNAMES
+from metrics import NULL_METRICS, add_metrics_arguments, metrics_from_args
+import argparse
+import math
 import time
 import os
 
 # Define directories for results
 current_dir = os.path.dirname(os.path.abspath(__file__))
-results_dir = os.path.join(current_dir, "..", "results")
+results_dir = results_directory(os.path.join(current_dir, "..", "results"))  # Session directory when started from main.py
 csv_path = os.path.join(results_dir, "emotions_results.csv")
+binary_path = os.path.join(results_dir, "emotions_results.emo")
+quality_log_path = os.path.join(results_dir, "quality_adjustments.csv")
+stats_path = os.path.join(results_dir, STATS_FILENAME)
+STATS_SAVE_INTERVAL = 1.0  # Seconds between two saves of the streaming statistics (read by the live dashboard)
+
+
+def put_latest(stage_queue, item, on_drop=None):
+    """
+    Puts an item into a bounded stage queue without blocking.
+    If the queue is full, the oldest entry is discarded ("latest frame wins").
+
+    Parameters:
+    - stage_queue: The bounded Queue connecting two pipeline stages.
+    - item: The item to publish to the next stage.
+    - on_drop: Optional callable receiving every discarded item (e.g. to release a pooled frame).
+
+    Returns:
+    - int: Number of stale items that were dropped to make room.
+    """
+    dropped = 0
+    while True:
+        try:
+            stage_queue.put_nowait(item)
+            return dropped
+        except Full:
+            try:
+                stale = stage_queue.get_nowait()
+                dropped += 1
+                if on_drop is not None:
+                    on_drop(stale)
+            except Empty:
+                pass
+
+
+def parse_source(value):
+    """Converts a command line source into a camera index or a video file / stream URL."""
+    return int(value) if value.isdigit() else value
+
+
+def recording_path(path, stream_id, stream_count):
+    """Returns the recording file of a stream; with several streams the stream ID is added to the name."""
+    if stream_count == 1:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.stream{stream_id}{extension}"
+
+
+def display_rate_name(stream_id):
+    """Name of the display rate meter of a stream ("display" for the first stream)."""
+    return "display" if stream_id == 0 else f"display_{stream_id}"
+
+
+def draw_results(frame, results):
+    """
+    Draws a rectangle around every face and displays its ID and dominant emotion.
+
+    Parameters:
+    - frame: RGB or RGBA frame to draw on (modified in place).
+    - results: List of (face_id, x, y, w, h, dominant_emotion) tuples.
+    """
+    color = (0, 0, 255, 255) if frame.shape[2] == 4 else (0, 0, 255)  # Keep RGBA overlays opaque
+    for (face_id, x, y, w, h, dominant_emotion) in results:
+        cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+        cv2.putText(frame, f"#{face_id} {dominant_emotion}", (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+
+class VideoStream:
+    """
+    State of one capture source of a (multi-camera) session.
+
+    Attributes:
+    - stream_id (int): ID written to every emotion record of this source.
+    - source: Camera index, video file, stream URL or raw frame recording (*.mcqraw).
+    - mirror (bool): Whether frames are flipped horizontally (for cameras, and for recordings of cameras).
+    - cap (cv2.VideoCapture): Capture object (or ReplayCapture for recordings), opened on start.
+    - recorder (FrameRecorder): Records the raw captured frames (None unless recording is enabled).
+    - active (bool): False once the source delivered no more frames.
+    - busy (bool): True while an inference worker processes a frame of this stream.
+    - frame_pool (FramePool): Reusable buffers the captured frames are written into.
+    - inference_queue (Queue): Latest captured frame (FrameBuffer) waiting for the inference workers.
+    - render_queue (Queue): Latest captured frame (FrameBuffer) waiting for the render stage.
+    - latest_results (list): Face IDs, boxes and dominant emotions of the most recent finished inference.
+    - dropped_frames (int): Number of stale frames the inference workers never saw.
+    - tracker (FaceTracker): Keeps stable face IDs so the full detection only runs on keyframes.
+    - face_detector (FaceDetector): Detection front-end of this stream, created on start.
+    - display_slot (FrameSlot): Newest rendered frame, handed from the render stage to the Tk main thread.
+    - video_label (Label): Label widget displaying this stream (only touched by the Tk main thread).
+    - capture_size (tuple): Requested capture resolution, applied by the capture stage.
+    - lossless (bool): Hand every frame to the inference and render stages instead of dropping stale
+      ones (fast replay of recordings, so every recorded frame is processed exactly once).
+    """
+
+    def __init__(self, stream_id, source, queue_size=1, detection_interval=5):
+        """Initialize the per-stream queues and tracker."""
+        self.stream_id = stream_id
+        self.source = source
+        self.mirror = isinstance(source, int)
+        self.cap = None
+        self.recorder = None
+        self.active = True
+        self.busy = False
+        self.lossless = False
+        # Frames in flight: one being captured, one per queue slot and one per consuming stage
+        self.frame_pool = FramePool(size=2 * queue_size + 3)
+        self.inference_queue = Queue(maxsize=queue_size)  # Capture -> inference
+        self.render_queue = Queue(maxsize=queue_size)  # Capture -> render
+        self.results_lock = Lock()  # Guards latest_results between inference and render
+        self.latest_results = []  # (face_id, x, y, w, h, dominant_emotion)
+        self.dropped_frames = 0
+        self.tracker = FaceTracker(detection_interval=detection_interval)
+        self.face_detector = None
+        self.video_label = None
+        self.capture_size = None
+        self.frame_shape = None  # Resolution of the last processed frame
+        self.gray_frame = None  # Reused grayscale buffer of the inference stage
+        self.display_slot = FrameSlot()  # Render stage -> Tk main thread
+        self.shown_sequence = 0  # Sequence number of the frame displayed last
+        self.display_frame = None  # Frame scaled to the label size (Tk main thread)
+        self.display_image = None  # PIL image sharing the memory of display_frame
+        self.photo = None  # Single PhotoImage updated with paste()
+
+    def detect_faces(self, gray_frame, frame=None):
+        """
+        Runs the face detection on a frame. Once faces are tracked, the detector only
+        searches the regions around them (with a periodic full-frame scan for new faces).
+
+        Parameters:
+        - gray_frame: Grayscale version of the frame.
+        - frame: BGR frame, needed by color backends such as YuNet.
+
+        Returns:
+        - list: Face boxes in (x, y, w, h) format.
+        """
+        rois = [track.box for track in self.tracker.tracks]
+        return self.face_detector.detect(gray_frame, frame, rois)
 
 
 class RealTimeDetection:
     """
-    Class for real-time emotion detection via webcam.
+    Class for real-time emotion detection via one or more cameras.
+
+    The detection runs as pipeline stages connected by bounded queues:
+    capture (reads and mirrors frames, one thread per stream), inference (face detection
+    and emotion analysis, a shared pool of workers) and render (draws the most recent
+    inference results onto the newest frame, one thread per stream).
+    The render stages never touch Tk: they publish their frames to a double-buffered slot,
+    and the Tk main thread picks up the newest frame of every stream at a fixed refresh rate.
+    The video and the controls therefore stay responsive independently of the inference speed.
+
+    The inference workers pick streams in round-robin order, so every stream gets its turn
+    even if one camera delivers more faces, and analyze the due faces of all picked streams
+    with a single model invocation.
 
     Attributes:
     - running (bool): Indicates whether the real-time detection is active.
-    - cap (cv2.VideoCapture): Webcam capture object.
+    - streams (list): VideoStream objects of the capture sources.
     - root (Tk): Tkinter GUI root window.
-    - video_label (Label): Label widget to display the video feed.
-    - emotions_data (list): List to store detected emotions and their intensities.
+    - result_writer (ResultWriter): Streams detected emotions and their intensities to the results file.
+    - stats (EmotionAggregator): Streaming statistics of the session, saved to stats.json for the main GUI.
+    - storage_format (str): "csv" for emotions_results.csv or "binary" for the compact emotions_results.emo.
+    - emotion_model (EmotionModel): Batched emotion model shared by all streams and faces
+      (or a client of the warm inference worker started by main.py).
+    - inference_interval (int): Re-analyze the emotions of a tracked face every N processed frames.
+    - inference_workers (int): Number of threads processing frames of the streams.
+    - max_batch (int): Maximum number of faces per model invocation; further due faces wait for the next round.
+    - metrics (Metrics): Hot-path instrumentation (disabled unless enabled on the command line).
+    - quality (QualityController): Adapts resolution and cadence to a target FPS / CPU budget (None keeps them fixed).
+    - backend (str): Explicit inference backend ("tf", "onnx", "onnx-int8"), or None for the worker / environment default.
+    - crop_cache (CropCache): Reuses the analysis of nearly identical face crops (None disables it).
+    - refresh_rate (float): Frames per second the Tk main thread displays at most.
+    - record_path (str): Raw frame recording written during the session (None disables recording).
+    - record_frames (int): Number of most recent frames kept per recorded stream.
+    - replay_pacing (str): "original" or "fast" pacing of replayed recordings.
+    - display_visible (bool): False while the window is minimized or hidden; rendering is skipped then.
+    - rotate_bytes (int): Rotate the results file once it exceeds this size (None disables it).
+    - rotate_interval (float): Rotate the results file after this many seconds (None disables it).
     """
 
-    def __init__(self):
-        """Initialize attributes and default settings."""
+    def __init__(self, sources=(0,), queue_size=1, detection_interval=5, inference_interval=3, storage_format="csv",
+                 metrics=NULL_METRICS, detector="haar", detection_width=DEFAULT_DETECTION_WIDTH, quality=None,
+                 inference_workers=1, max_batch=32, backend=None, crop_cache=None, refresh_rate=30,
+                 record_path=None, record_frames=900, replay_pacing="original", rotate_bytes=None,
+                 rotate_interval=None):
+        """
+        Initialize attributes and default settings.
+
+        Parameters:
+        - sources: Camera indices, video files or stream URLs; the position is the stream ID.
+        - queue_size: Capacity of the queues between the pipeline stages.
+        - detection_interval: Run the full face detection every N processed frames.
+        - inference_interval: Re-analyze the emotions of each tracked face every N processed frames.
+        - storage_format: "csv" or "binary" (compact columnar session file).
+        - metrics: Metrics instance collecting stage timings and counters.
+        - detector: Face detector backend ("haar", "yunet" or "skip" for pre-aligned face crops).
+        - detection_width: Frames are downscaled to this width for the face detection (None keeps full resolution).
+        - quality: QualityController adjusting the settings at runtime, or None for fixed settings.
+        - inference_workers: Number of inference worker threads shared by all streams.
+        - max_batch: Maximum number of faces analyzed per model invocation.
+        - backend: Inference backend; None uses the warm worker or the MCQ_INFERENCE_BACKEND default.
+        - crop_cache: CropCache answering repeated (still) faces without inference, or None.
+        - refresh_rate: Display refresh rate of the GUI in frames per second.
+        - record_path: Record the raw captured frames into this memory-mapped ring file (*.mcqraw).
+        - record_frames: Ring capacity of the recording in frames.
+        - replay_pacing: Pacing of recording sources: "original" capture times or "fast".
+        - rotate_bytes: Start a new part of the results file once it exceeds this many bytes.
+        - rotate_interval: Start a new part of the results file after this many seconds.
+        """
         self.running = True  # The detection runs by default
-        self.cap = None  # Video capture object
+        self.streams = [VideoStream(stream_id, source, queue_size, detection_interval)
+                        for stream_id, source in enumerate(sources)]
         self.root = None  # Root Tkinter window
-        self.video_label = None  # Label for video feed
-        self.emotions_data = []  # List to store detected emotions and their intensities
+        self.result_writer = None  # Streams the emotion records to disk, created on start
+        self.stats = EmotionAggregator()  # Updated with every record, so no statistic is recomputed from scratch
+        self.storage_format = storage_format
+        self.session_start = None  # Monotonic start time for the millisecond timestamps
+        self.start_epoch_ms = None  # Wall-clock start time of the session
+        self.emotion_model = None  # Created on start
+        self.model_lock = Lock()  # One model invocation at a time
+        self.schedule = Condition()  # Guards the stream selection, notified when a frame arrives
+        self.next_stream = 0  # Round-robin start position of the next selection
+        self.detector_name = detector
+        self.detection_width = detection_width
+        self.inference_interval = inference_interval
+        self.inference_workers = inference_workers
+        self.max_batch = max_batch
+        self.backend = backend
+        self.crop_cache = crop_cache
+        self.streams_per_batch = max(1, -(-len(self.streams) // inference_workers))
+        self.metrics = metrics
+        self.quality = quality
+        self.quality_lock = Lock()  # The workers share the controller
+        self.quality_log = None  # Sidecar CSV recording every quality adjustment
+        self.refresh_rate = refresh_rate
+        self.refresh_job = None  # Pending root.after() callback of the display refresh
+        self.display_visible = True
+        self.frame_image = None  # Container of the video labels, used for the tile size
+        self.grid_columns = 1
+        self.record_path = record_path
+        self.record_frames = record_frames
+        self.replay_pacing = replay_pacing
+        self.rotate_bytes = rotate_bytes
+        self.detection_thread = None  # Runs the session; it finishes the results file after all stages ended
+        self.exit_button = None
+        self.rotate_interval = rotate_interval
 
     def start_realtime_detection(self):
         """
-        Starts real-time emotion detection using the webcam.
-        Detected faces are analyzed using DeepFace, and results are displayed on the GUI.
+        Starts real-time emotion detection on all capture sources.
+        Launches the capture, inference and render stages and waits until they have finished.
+        """
+        # Use the warm inference worker if available, otherwise load the model locally (once for all streams)
+        self.emotion_model = create_emotion_model(self.backend)
+
+        # Open the capture sources, each with its own detection front-end (downscaled and ROI-restricted search)
+        for stream in self.streams:
+            stream.face_detector = create_face_detector(self.detector_name, self.detection_width)
+            if is_recording(stream.source):
+                # Replayed frames go through the same pipeline, including the mirroring of the recorded camera
+                stream.cap = ReplayCapture(stream.source, self.replay_pacing)
+                stream.mirror = stream.cap.isOpened() and stream.cap.mirror
+                # Fast replays wait for the pipeline instead of dropping frames, so runs are reproducible
+                stream.lossless = self.replay_pacing == "fast"
+            else:
+                stream.cap = cv2.VideoCapture(stream.source)
+            if not stream.cap.isOpened():
+                print(f"Cannot open video source {stream.source}.")
+
+        # Start the background writer for the results
+        self.session_start = time.monotonic()
+        self.start_epoch_ms = epoch_ms_now()
+        rotation = {"max_bytes": self.rotate_bytes, "rotate_interval": self.rotate_interval}
+        if self.storage_format == "binary":
+            self.result_writer = BinaryResultWriter(binary_path, start_epoch_ms=self.start_epoch_ms,
+                                                    metrics=self.metrics, **rotation)
+        else:
+            self.result_writer = ResultWriter(csv_path, metrics=self.metrics, **rotation)
+        self.result_writer.start()
+        self.stats.start_autosave(stats_path, STATS_SAVE_INTERVAL)
+        if self.record_path:
+            for stream in self.streams:
+                stream.recorder = FrameRecorder(recording_path(self.record_path, stream.stream_id, len(self.streams)),
+                                                self.record_frames, stream.mirror, self.start_epoch_ms)
+        if self.quality is not None:
+            self.quality_log = ResultWriter(quality_log_path, fieldnames=QUALITY_FIELDNAMES,
+                                            label="quality adjustments").start()
+            self.apply_quality_level(self.quality.level, "start")
+
+        self.run_stages()
+
+        # Release the video captures when detection stops
+        for stream in self.streams:
+            stream.cap.release()
+            if stream.recorder is not None:
+                stream.recorder.close()
+        self.save_results_to_file()
+        if self.crop_cache is not None:
+            print(self.crop_cache.report("Face crop cache"))
+        if self.quality_log is not None:
+            self.quality_log.close()
+        self.metrics.stop()
+
+    def run_stages(self):
+        """
+        Runs the capture and render stage of every stream and the shared inference workers
+        until all sources have ended or the detection is stopped. The captures, the emotion
+        model, the result writer and the session start must be set up before.
+        """
+        stages = []
+        for stream in self.streams:
+            stages.append(Thread(target=self.capture_stage, args=(stream,), name=f"capture-{stream.stream_id}", daemon=True))
+            stages.append(Thread(target=self.render_stage, args=(stream,), name=f"render-{stream.stream_id}", daemon=True))
+        for worker_index in range(self.inference_workers):
+            stages.append(Thread(target=self.inference_stage, name=f"inference-{worker_index}", daemon=True))
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+    def capture_stage(self, stream):
         """
-        # Load the pre-trained face detection model (Haar Cascade)
-        cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        face_cascade = cv2.CascadeClassifier(cascade_path)
+        Capture stage: reads frames of one source at camera rate and publishes
+        the newest frame to the inference workers and the render stage, dropping stale ones.
+        Lossless streams (fast replays) instead wait until the stages have room, so every
+        frame is processed exactly once. The session ends when no source delivers frames anymore.
 
-        # Start video capture
-        self.cap = cv2.VideoCapture(0)
+        Parameters:
+        - stream: The VideoStream to capture.
+        """
+        applied_size = None
+        raw_frame = None  # Decoded camera image, reused by cap.read()
+        while self.running:
+            # Switch the camera resolution when the quality controller requested it
+            if stream.capture_size != applied_size:
+                applied_size = stream.capture_size
+                stream.cap.set(cv2.CAP_PROP_FRAME_WIDTH, applied_size[0])
+                stream.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, applied_size[1])
+
+            with self.metrics.span("capture"):
+                ret, raw_frame = stream.cap.read(raw_frame)
+                if not ret:
+                    print(f"Error capturing video feed of stream {stream.stream_id}.")
+                    break
+
+                # Record the raw frame before any processing, so a replay feeds the pipeline the same input
+                if stream.recorder is not None:
+                    with self.metrics.span("record"):
+                        stream.recorder.write(raw_frame)
+
+                # Both consumers still hold older frames: skip this one instead of allocating
+                buffer = stream.frame_pool.acquire(raw_frame.shape, users=2)
+                while buffer is None and stream.lossless and self.running:
+                    buffer = stream.frame_pool.acquire(raw_frame.shape, users=2, timeout=0.5)
+                if buffer is None:
+                    stream.dropped_frames += 1
+                    self.metrics.increment("dropped_frames")
+                    continue
+
+                # Flip camera frames horizontally for a mirrored view, directly into the pooled buffer
+                if stream.mirror:
+                    cv2.flip(raw_frame, 1, dst=buffer.image)
+                else:
+                    np.copyto(buffer.image, raw_frame)
+
+            if stream.lossless:
+                if not self.put_waiting(stream.inference_queue, buffer):
+                    buffer.release()
+                    buffer.release()
+                    break
+                with self.schedule:
+                    self.schedule.notify()
+                if not self.put_waiting(stream.render_queue, buffer):
+                    buffer.release()
+                    break
+                continue
+
+            with self.schedule:
+                dropped = put_latest(stream.inference_queue, buffer, FrameBuffer.release)
+                self.schedule.notify()
+            stream.dropped_frames += dropped
+            self.metrics.increment("dropped_frames", dropped)
+            put_latest(stream.render_queue, buffer, FrameBuffer.release)
+
+        # A lossless stream ends only after its last frame has been analyzed
+        while stream.lossless and self.running:
+            with self.schedule:
+                if stream.inference_queue.empty() and not stream.busy:
+                    break
+            time.sleep(0.01)
+        stream.active = False
+        if not any(other.active for other in self.streams):
+            self.running = False
+
+    def put_waiting(self, stage_queue, item):
+        """
+        Puts an item into a stage queue, waiting until there is room (lossless streams).
 
+        Returns:
+        - bool: False if the detection was stopped before the item could be queued.
+        """
         while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Error capturing video feed.")
-                break
+            try:
+                stage_queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        return False
+
+    def apply_quality_level(self, level, reason):
+        """
+        Applies the settings of a quality level to all streams and records the adjustment.
 
-            # Flip the frame horizontally for a mirrored view
-            frame = cv2.flip(frame, 1)
+        Parameters:
+        - level: Settings dict from quality_controller.QUALITY_LEVELS.
+        - reason: Why the level was chosen (written to the adjustment log).
+        """
+        self.inference_interval = level["inference_interval"]
+        for stream in self.streams:
+            stream.capture_size = (level["width"], level["height"])
+            stream.tracker.detection_interval = level["detection_interval"]
+            backend = stream.face_detector.backend
+            if hasattr(backend, "min_size"):
+                backend.min_size = level["min_size"]
+            if hasattr(backend, "scale_factor"):
+                backend.scale_factor = level["scale_factor"]
+
+        t_ms = int((time.monotonic() - self.session_start) * 1000)
+        record = self.quality.log_record(reason, t_ms, format_time_of_day(self.start_epoch_ms + t_ms))
+        self.quality_log.write(record)
+        print(f"Quality level {record['level']} ({level['width']}x{level['height']}): {reason}")
+
+    def claim_streams(self):
+        """
+        Selects the streams for the next micro-batch in round-robin order: streams with a new
+        frame that no other worker is processing, up to streams_per_batch. The start position
+        advances on every call, so no stream is starved. Must be called with self.schedule held.
 
-            # Convert the frame to grayscale for face detection
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray_frame, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+        Returns:
+        - list: (stream, FrameBuffer) pairs; the streams are marked busy.
+        """
+        claimed = []
+        count = len(self.streams)
+        for offset in range(count):
+            stream = self.streams[(self.next_stream + offset) % count]
+            if stream.busy:
+                continue
+            try:
+                frame = stream.inference_queue.get_nowait()
+            except Empty:
+                continue
+            stream.busy = True
+            claimed.append((stream, frame))
+            if len(claimed) == self.streams_per_batch:
+                break
+        self.next_stream = (self.next_stream + 1) % count
+        return claimed
 
-            # Get the current timestamp
-            current_time = time.strftime('%H:%M:%S')
+    def inference_stage(self):
+        """
+        Inference worker: repeatedly takes the newest frames of the next streams, detects
+        and tracks their faces, analyzes the due faces of all of them in one batch and
+        publishes the results for the render stages.
+        """
+        while self.running:
+            with self.schedule:
+                claimed = self.claim_streams()
+                if not claimed:
+                    self.schedule.wait(timeout=0.5)
+                    continue
+
+            stage_start = time.perf_counter()
+            try:
+                self.process_frames(claimed)
+            finally:
+                with self.schedule:
+                    for stream, buffer in claimed:
+                        buffer.release()
+                        stream.busy = False
+                    self.schedule.notify()  # A released stream may already hold a newer frame
+
+            if self.quality is not None:
+                with self.quality_lock:
+                    self.quality.observe_stage(time.perf_counter() - stage_start)
+                    change = self.quality.update()
+                    if change is not None:
+                        self.apply_quality_level(*change)
+
+    def track_faces(self, stream, frame):
+        """
+        Detects and tracks the faces of a stream frame and crops the faces that are due for inference.
 
-            for (x, y, w, h) in faces:
-                # Extract the face region
-                face_frame = frame[y:y+h, x:x+w]
+        Returns:
+        - tuple: (active FaceTrack objects, list of (stream, track, face crop) that need an analysis)
+        """
+        # Keep the tracks when the capture resolution changed
+        if stream.frame_shape is not None and frame.shape[:2] != stream.frame_shape:
+            stream.tracker.rescale(frame.shape[1] / stream.frame_shape[1], frame.shape[0] / stream.frame_shape[0])
+        stream.frame_shape = frame.shape[:2]
+
+        # Convert the frame to grayscale for face detection and tracking (into the reused buffer)
+        with self.metrics.span("detection"):
+            if stream.gray_frame is None or stream.gray_frame.shape != frame.shape[:2]:
+                stream.gray_frame = np.empty(frame.shape[:2], dtype=np.uint8)
+            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=stream.gray_frame)
+            tracks = stream.tracker.step(gray_frame, lambda gray: stream.detect_faces(gray, frame))
+
+        due = []
+        for track in tracks:
+            track.frames_since_analysis += 1
+            if track.analysis is not None and track.frames_since_analysis < self.inference_interval:
+                continue
+
+            # Extract the face region
+            x, y, w, h = track.box
+            face_frame = frame[max(0, y):y+h, max(0, x):x+w]
+
+            # Skip if the extracted face frame is empty
+            if face_frame is None or face_frame.size == 0:
+                continue
+            due.append((stream, track, face_frame))
+        return tracks, due
+
+    def process_frames(self, claimed):
+        """
+        Processes one frame of each claimed stream and analyzes their due faces as one micro-batch.
 
-                # Skip if the extracted face frame is empty
-                if face_frame is None or face_frame.size == 0:
+        Parameters:
+        - claimed: (stream, FrameBuffer) pairs selected by claim_streams().
+        """
+        tracked = []
+        due_per_stream = []
+        for stream, buffer in claimed:
+            tracks, due = self.track_faces(stream, buffer.image)
+            tracked.append((stream, tracks))
+            due_per_stream.append(due)
+        self.metrics.set_gauge("faces_per_frame", sum(len(tracks) for _, tracks in tracked))
+
+        # Get the current timestamp (milliseconds since the session start)
+        t_ms = int((time.monotonic() - self.session_start) * 1000)
+        current_time = format_time_of_day(self.start_epoch_ms + t_ms)
+
+        # Interleave the due faces of the streams, so a full batch is shared fairly
+        due = [item for group in zip_longest(*due_per_stream) for item in group if item is not None]
+
+        # Nearly identical crops of the same face (e.g. a still face) reuse the cached analysis
+        finished = []
+        pending = []
+        for stream, track, face_frame in due:
+            crop_hash = None
+            if self.crop_cache is not None:
+                crop_hash = dhash(face_frame)
+                analysis = self.crop_cache.get_similar((stream.stream_id, track.face_id), crop_hash)
+                if analysis is not None:
+                    finished.append((stream, track, analysis))
                     continue
+            pending.append((stream, track, face_frame, crop_hash))
+        if self.crop_cache is not None:
+            self.metrics.set_gauge("crop_cache_hit_rate", round(self.crop_cache.hit_rate(), 3))
+
+        # Faces that do not fit into the batch stay due and are analyzed with the next frame
+        batch = pending[:self.max_batch]
+        self.metrics.set_gauge("batch_size", len(batch))
+
+        try:
+            # Perform emotion analysis for all due faces with a single model invocation
+            with self.model_lock:
+                inference_start = time.perf_counter()
+                with self.metrics.span("inference"):
+                    analyses = self.emotion_model.predict_batch([face_frame for _, _, face_frame, _ in batch])
+            if batch:
+                self.metrics.observe("inference_per_face", (time.perf_counter() - inference_start) / len(batch))
+        except Exception as e:
+            print(f"Error during emotion analysis: {e}")
+            self.metrics.increment("analysis_errors")
+            analyses = []
+
+        for (stream, track, _, crop_hash), analysis in zip(batch, analyses):
+            if self.crop_cache is not None:
+                self.crop_cache.put_similar((stream.stream_id, track.face_id), crop_hash, analysis)
+            finished.append((stream, track, analysis))
+
+        for stream, track, analysis in finished:
+            track.analysis = analysis
+            track.frames_since_analysis = 0
+
+            # Save the results (timestamp, stream, face ID, dominant emotion, and all intensities)
+            emotions_record = {
+                "time": current_time,
+                "t_ms": t_ms,
+                "stream_id": stream.stream_id,
+                "face_id": track.face_id,
+                "dominant_emotion": analysis['dominant_emotion'],
+                **analysis['emotion']  # Include all emotions and their intensities
+            }
+            self.result_writer.write(emotions_record)
+            self.stats.update(emotions_record)
+
+        # Overlays carry the last analysis of every track forward between inferences
+        for stream, tracks in tracked:
+            results = [
+                (track.face_id, *track.box, track.analysis['dominant_emotion'])
+                for track in tracks if track.analysis is not None
+            ]
+            with stream.results_lock:
+                stream.latest_results = results
+
+    def render_stage(self, stream):
+        """
+        Render stage: draws the most recent inference results onto the newest captured
+        frame of a stream and publishes it to the display slot of the stream.
+        Nothing is drawn while the window is minimized or hidden.
 
-                try:
-                    # Perform emotion analysis using DeepFace
-                    analysis = DeepFace.analyze(face_frame, actions=['emotion'], enforce_detection=False)
-
-                    if isinstance(analysis, list):
-                        analysis = analysis[0]
-
-                    # Extract emotions and the dominant emotion
-                    emotions = analysis['emotion']
-                    dominant_emotion = analysis['dominant_emotion']
-
-                    # Save the results (timestamp, dominant emotion, and all intensities)
-                    emotions_record = {
-                        "time": current_time,
-                        "dominant_emotion": dominant_emotion,
-                        **emotions  # Include all emotions and their intensities
-                    }
-                    self.emotions_data.append(emotions_record)
-
-                    # Draw a rectangle around the face and display the dominant emotion
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-                    cv2.putText(frame, f"{dominant_emotion}", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-
-                except Exception as e:
-                    print(f"Error during emotion analysis: {e}")
-
-            # Display the video feed in the Tkinter GUI
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-
-        # Release the video capture when detection stops
-        self.cap.release()
-        self.save_results_to_file()
+        Parameters:
+        - stream: The VideoStream to render.
+        """
+        rate_name = display_rate_name(stream.stream_id)
+        while self.running:
+            try:
+                buffer = stream.render_queue.get(timeout=0.5)
+            except Empty:
+                continue
+
+            if self.display_visible:
+                with stream.results_lock:
+                    results = stream.latest_results
+
+                with self.metrics.span("draw"):
+                    # Convert into the back buffer so the overlays never modify the frame seen by the inference stage
+                    frame = stream.display_slot.back((*buffer.image.shape[:2], 4))
+                    cv2.cvtColor(buffer.image, cv2.COLOR_BGR2RGBA, dst=frame)
+                    buffer.release()
+
+                    draw_results(frame, results)
+
+                    if self.metrics.overlay:
+                        cv2.putText(frame, self.metrics.overlay_text(rate_name), (10, 25), cv2.FONT_HERSHEY_SIMPLEX,
+                                    0.6, (0, 255, 0, 255), 2)
+                stream.display_slot.publish()
+            else:
+                buffer.release()
+
+            # The quality controller follows the render rate of the first stream, which does not depend on the window state
+            if self.quality is not None and stream is self.streams[0]:
+                self.quality.tick_display()
+
+    def tile_size(self):
+        """
+        Returns the space available to one video label in the grid.
 
-    def save_results_to_file(self):
+        Returns:
+        - tuple: (width, height) in pixels, or None before the window is laid out.
         """
-        Saves the collected emotion data to a CSV file.
-        If no data has been collected, a message is printed to the console.
+        width = self.frame_image.winfo_width()
+        height = self.frame_image.winfo_height()
+        if width <= 1 or height <= 1:
+            return None
+        rows = max(1, math.ceil(len(self.streams) / self.grid_columns))
+        return max(1, width // self.grid_columns - 10), max(1, height // rows - 10)
+
+    def scale_to_tile(self, stream, frame, tile):
+        """
+        Scales a rendered frame once to the label size, keeping the aspect ratio.
+        Called with the display slot locked, so it copies the frame into the reused display buffer.
+
+        Parameters:
+        - stream: The VideoStream the frame belongs to.
+        - frame: Rendered RGBA frame (front buffer of the display slot).
+        - tile: (width, height) available to the label, or None to keep the frame size.
         """
-        if not self.emotions_data:
-            print("No emotions data collected.")
+        height, width = frame.shape[:2]
+        scale = min(tile[0] / width, tile[1] / height) if tile else 1.0
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        # Reallocate the display buffers only when the frame or label size changes
+        if stream.display_frame is None or stream.display_frame.shape[:2] != (size[1], size[0]):
+            stream.display_frame = np.empty((size[1], size[0], 4), dtype=np.uint8)
+            # The PIL image shares the memory of display_frame, so it never has to be rebuilt
+            stream.display_image = Image.frombuffer("RGBA", size, stream.display_frame, "raw", "RGBA", 0, 1)
+            stream.photo = None
+
+        if size == (width, height):
+            np.copyto(stream.display_frame, frame)
+        else:
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            cv2.resize(frame, size, dst=stream.display_frame, interpolation=interpolation)
+
+    def refresh_display(self):
+        """
+        Displays the newest rendered frame of every stream in the Tkinter GUI.
+        Runs in the Tk main thread and reschedules itself with root.after() at the refresh rate.
+        """
+        if not self.running:
             return
 
-        # Ensure the results directory exists
-        if not os.path.exists(results_dir):
-            os.makedirs(results_dir)
+        # Skip the scaling and the Tk update while the window is minimized or hidden
+        self.display_visible = self.root.state() not in ("iconic", "withdrawn") and bool(self.root.winfo_viewable())
+        if self.display_visible:
+            tile = self.tile_size()
+            for stream in self.streams:
+                sequence = stream.display_slot.read(stream.shown_sequence,
+                                                    lambda frame, stream=stream: self.scale_to_tile(stream, frame, tile))
+                if sequence == stream.shown_sequence:
+                    continue
+                stream.shown_sequence = sequence
 
-        # Define CSV headers
-        fieldnames = ["time", "dominant_emotion", "angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+                with self.metrics.span("tk_handoff"):
+                    if stream.photo is None:
+                        stream.photo = ImageTk.PhotoImage(image=stream.display_image)
+                        stream.video_label.imgtk = stream.photo
+                        stream.video_label.configure(image=stream.photo)
+                    else:
+                        # Update the existing Tk image in place instead of creating a new one per frame
+                        stream.photo.paste(stream.display_image)
+                self.metrics.tick(display_rate_name(stream.stream_id))
 
-        # Write data to the CSV file
-        with open(csv_path, "w", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(self.emotions_data)
+        self.refresh_job = self.root.after(max(1, int(1000 / self.refresh_rate)), self.refresh_display)
 
-        print(f"Saved {len(self.emotions_data)} emotion records to {csv_path}.")
+    def save_results_to_file(self):
+        """
+        Writes the remaining queued emotion records, closes the results file and saves
+        the final statistics. The records are streamed to disk during the session, so this
+        only has to finish the writer. Calling it more than once writes the file only once.
+        """
+        if self.result_writer is not None:
+            self.result_writer.close()
+            self.stats.stop_autosave()
+            self.stats.save(stats_path, final=True)
 
     def stop_realtime_detection(self):
         """Stops the real-time emotion detection loop."""
@@ -151,16 +779,31 @@ class RealTimeDetection:
 
     def exit_to_main_gui(self):
         """
-        Stops the detection, saves results to a file, and closes the GUI.
+        Stops the detection and closes the GUI once the session is finished.
+        The detection thread finishes the results file and the statistics after all stages
+        have ended, so the records of analyses still running are not lost.
         """
         self.stop_realtime_detection()
-        self.save_results_to_file()
+        if self.exit_button is not None:
+            self.exit_button.config(text="Saving...", state=DISABLED)
+        self.close_when_finished()
+
+    def close_when_finished(self):
+        """Closes the GUI after the detection thread has finished; checks again every 50 ms until then."""
+        if self.detection_thread is not None and self.detection_thread.is_alive():
+            self.root.after(50, self.close_when_finished)
+            return
+        if self.detection_thread is None:
+            self.save_results_to_file()
         if self.root:
+            if self.refresh_job is not None:
+                self.root.after_cancel(self.refresh_job)
             self.root.destroy()
 
     def start_gui(self):
         """
         Initializes and starts the Tkinter GUI for real-time emotion detection.
+        Multiple streams are arranged in a grid.
         """
         self.root = Tk()
         self.root.title("Real-Time Emotion Detection")
@@ -175,30 +818,101 @@ class RealTimeDetection:
         frame_main = Frame(self.root)
         frame_main.pack(fill=BOTH, expand=True, padx=10, pady=10)
 
-        frame_image = Frame(frame_main, width=450, height=450)
-        frame_image.pack(side=LEFT, fill=BOTH, expand=True, padx=10, pady=10)
-        self.video_label = Label(frame_image)
-        self.video_label.pack()
+        self.frame_image = Frame(frame_main, width=450, height=450)
+        self.frame_image.pack(side=LEFT, fill=BOTH, expand=True, padx=10, pady=10)
+        self.frame_image.grid_propagate(False)  # The labels are scaled to the frame, not the other way round
+        self.grid_columns = columns = max(1, math.ceil(math.sqrt(len(self.streams))))
+        for stream in self.streams:
+            stream.video_label = Label(self.frame_image)
+            stream.video_label.grid(row=stream.stream_id // columns, column=stream.stream_id % columns, padx=5, pady=5)
 
         # Create a label for displaying status messages
         lbl_result = Label(self.root, text="", font=("Arial", 12))
         lbl_result.pack(pady=5)
 
         # Start the detection in a separate thread to avoid blocking the GUI
-        detection_thread = Thread(target=self.start_realtime_detection)
-        detection_thread.daemon = True
-        detection_thread.start()
+        self.detection_thread = Thread(target=self.start_realtime_detection)
+        self.detection_thread.daemon = True
+        self.detection_thread.start()
 
         # Add an Exit button to stop detection and close the GUI
         control_frame = Frame(self.root, bg="lightgray", width=200)
         control_frame.pack(side=RIGHT, fill=Y)
-        btn_exit = Button(control_frame, text="Exit", font=("Arial", 10), bg="red", fg="white", command=self.exit_to_main_gui)
-        btn_exit.pack(pady=15, padx=20, fill=X)
+        self.exit_button = Button(control_frame, text="Exit", font=("Arial", 10), bg="red", fg="white",
+                                  command=self.exit_to_main_gui)
+        self.exit_button.pack(pady=15, padx=20, fill=X)
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_to_main_gui)
+
+        # Display the rendered frames from the Tk main thread
+        self.refresh_display()
 
         # Start the Tkinter main loop
         self.root.mainloop()
 
 
 if __name__ == "__main__":
-    detector = RealTimeDetection()
-    detector.start_gui()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Real-time emotion detection via one or more cameras.")
+    parser.add_argument("--sources", nargs="+", default=["0"],
+                        help="Camera indices, video files or stream URLs; each source becomes one stream ID.")
+    parser.add_argument("--inference-workers", type=int, default=1,
+                        help="Number of inference worker threads shared by all streams.")
+    parser.add_argument("--max-batch", type=int, default=32, help="Maximum number of faces per model invocation.")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=None,
+                        help="Inference backend (default: the warm worker or MCQ_INFERENCE_BACKEND).")
+    parser.add_argument("--storage", choices=["csv", "binary"], default="csv",
+                        help="Session storage format: emotions_results.csv or the compact emotions_results.emo.")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="haar",
+                        help="Face detector backend; 'skip' treats every frame as a pre-aligned face crop.")
+    parser.add_argument("--detection-width", type=int, default=DEFAULT_DETECTION_WIDTH,
+                        help="Downscale frames to this width for the face detection (0 keeps full resolution).")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="Adapt the quality to sustain this display frame rate (at most the camera rate).")
+    parser.add_argument("--cpu-budget", type=float, default=None,
+                        help="Adapt the quality to keep the CPU usage below this percentage of all cores.")
+    parser.add_argument("--inference-budget-ms", type=float, default=None,
+                        help="Inference stage p90 budget of the quality control "
+                             "(default: inference interval of the level / target FPS).")
+    parser.add_argument("--no-cache", action="store_true", help="Analyze every due face crop, even if unchanged.")
+    parser.add_argument("--cache-threshold", type=int, default=4,
+                        help="Maximum differing bits of the 64-bit crop hash to reuse a cached analysis.")
+    parser.add_argument("--cache-ttl", type=float, default=2.0, help="Seconds a cached face analysis stays valid.")
+    parser.add_argument("--cache-size", type=int, default=512, help="Maximum number of cached face analyses.")
+    parser.add_argument("--record", default=None, metavar="PATH",
+                        help="Record the raw captured frames into a memory-mapped ring file (*.mcqraw).")
+    parser.add_argument("--record-frames", type=int, default=900,
+                        help="Number of most recent frames kept in the recording of each stream.")
+    parser.add_argument("--replay", nargs="+", default=None, metavar="PATH",
+                        help="Replay raw frame recordings instead of the capture sources.")
+    parser.add_argument("--replay-pacing", choices=REPLAY_PACINGS, default="original",
+                        help="Replay at the recorded capture times (stale frames are dropped depending on the "
+                             "timing) or as fast as possible with every frame processed exactly once.")
+    parser.add_argument("--rotate-mb", type=float, default=None,
+                        help="Start a new part of the results file once it exceeds this many megabytes.")
+    parser.add_argument("--rotate-minutes", type=float, default=None,
+                        help="Start a new part of the results file after this many minutes.")
+    parser.add_argument("--refresh-rate", type=float, default=30,
+                        help="Display refresh rate of the GUI in frames per second.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    quality = None
+    if args.target_fps or args.cpu_budget or args.inference_budget_ms:
+        inference_budget = args.inference_budget_ms / 1000 if args.inference_budget_ms else None
+        quality = QualityController(target_fps=args.target_fps, cpu_budget=args.cpu_budget,
+                                    inference_budget=inference_budget)
+
+    crop_cache = None
+    if not args.no_cache:
+        crop_cache = CropCache(max_entries=args.cache_size, ttl=args.cache_ttl, threshold=args.cache_threshold)
+
+    sources = args.replay or [parse_source(source) for source in args.sources]
+    detector = RealTimeDetection(sources=sources,
+                                 storage_format=args.storage, metrics=metrics_from_args(args),
+                                 detector=args.detector, detection_width=args.detection_width or None, quality=quality,
+                                 inference_workers=args.inference_workers, max_batch=args.max_batch,
+                                 backend=args.backend, crop_cache=crop_cache, refresh_rate=args.refresh_rate,
+                                 record_path=args.record, record_frames=args.record_frames,
+                                 replay_pacing=args.replay_pacing,
+                                 rotate_bytes=int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None,
+                                 rotate_interval=args.rotate_minutes * 60 if args.rotate_minutes else None)
+    detector.start_gui()
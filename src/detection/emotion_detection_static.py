@@ -7,83 +7,203 @@
 """
 Static Emotion Detection GUI
 
-This script allows users to upload an image, analyze the emotions in it using the DeepFace library,
+This script allows users to upload images, analyze the emotions in them using the DeepFace library,
 and display the dominant emotion along with a bar chart of emotion probabilities.
-The interface is built using Tkinter.
+The interface is built using Tkinter; the analysis runs in a background thread.
 """
 
 from tkinter import *
 from tkinter import filedialog
+from tkinter.ttk import Progressbar
+from threading import Thread
+from queue import Queue, Empty
 from PIL import Image, ImageTk
-from deepface import DeepFace
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from inference_worker import connect_worker
+from emotion_model import analyze_image, create_local_model, EMOTION_LABELS, INFERENCE_BACKENDS, INFERENCE_BACKEND_ENV
+from result_cache import ResultCache, file_digest
+from metrics import NULL_METRICS, add_metrics_arguments, metrics_from_args
+import argparse
+import os
 
-def start_gui():
+# Maximum size of the displayed image
+MAX_IMAGE_SIZE = (450, 450)
+
+
+def load_thumbnail(file_path, max_size=MAX_IMAGE_SIZE):
+    """
+    Decodes an image file at display size.
+    For JPEG files, Pillow's draft mode lets the decoder skip most of the pixels
+    (DCT scaling), so large camera images are not decoded at full resolution.
+
+    Parameters:
+    - file_path: Path of the image file.
+    - max_size: Maximum (width, height) of the thumbnail.
+
+    Returns:
+    - Image: The decoded thumbnail.
+    """
+    img = Image.open(file_path)
+    img.draft("RGB", max_size)  # Only has an effect for JPEG files
+    img.thumbnail(max_size)
+    img.load()
+    return img
+
+
+def start_gui(metrics=NULL_METRICS, backend=None, cache=None):
     """
     Launches the GUI for static emotion detection.
-    The interface provides options to upload an image, analyze its emotions, and display the results.
+    The interface provides options to upload images, analyze their emotions, and display the results.
+    Decoding and analysis run in a background thread, so the window stays responsive;
+    several selected images are analyzed back to back.
+
+    Parameters:
+    - metrics: Metrics instance collecting the inference, decode and draw timings.
+    - backend: Explicit inference backend ("tf", "onnx", "onnx-int8"); None uses the warm worker
+      or the MCQ_INFERENCE_BACKEND default.
+    - cache: ResultCache keyed by the image content, so re-uploaded images are not analyzed again (None disables it).
     """
-    
+    backend_name = backend or os.environ.get(INFERENCE_BACKEND_ENV, "tf")  # Results differ per backend
+    jobs = Queue()  # (generation, file path) waiting for the analysis thread; None stops it
+    results = Queue()  # Finished analyses, displayed by the Tk main thread
+    state = {"generation": 0, "pending": 0, "busy": False}  # Cancel increments the generation; older jobs are discarded
+
+    def analysis_thread():
+        """
+        Analyzes the queued images one after another and decodes their thumbnails.
+        Runs outside the Tk main thread and never touches the widgets.
+        If the model cannot be created, every queued image is answered with that error.
+        """
+        worker = model = setup_error = None
+        try:
+            # Use the warm inference worker started by main.py if it is available and no backend was requested
+            worker = connect_worker() if backend is None else None
+            model = create_local_model(backend) if worker is None else None
+            if model is not None:
+                model.load()  # Fail here (e.g. missing ONNX model file) instead of at every image
+        except Exception as e:
+            print(f"Error loading the emotion model: {e}")
+            setup_error = e
+
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            generation, file_path = job
+            if generation != state["generation"]:
+                results.put((generation, file_path, None, None, None))  # Cancelled before it started
+                continue
+            if setup_error is not None:
+                metrics.increment("analysis_errors")
+                results.put((generation, file_path, None, None, setup_error))
+                continue
+            try:
+                # Identical image content is answered from the cache
+                cache_key = f"{backend_name}:{file_digest(file_path)}" if cache is not None else None
+                analysis = cache.get(cache_key) if cache is not None else None
+                if analysis is None:
+                    with metrics.span("inference"):
+                        analysis = analyze_image(file_path, worker, model)
+                    if cache is not None:
+                        cache.put(cache_key, analysis)
+                if cache is not None:
+                    print(cache.report())
+                    metrics.set_gauge("result_cache_hit_rate", round(cache.hit_rate(), 3))
+
+                with metrics.span("decode"):
+                    img = load_thumbnail(file_path)
+                results.put((generation, file_path, analysis, img, None))
+            except Exception as e:
+                metrics.increment("analysis_errors")
+                results.put((generation, file_path, None, None, e))
+
     def upload_and_analyze():
         """
-        Handles the upload and emotion analysis of an image.
-        It uses the DeepFace library to analyze the uploaded image and displays
-        the dominant emotion along with a bar chart of emotion probabilities.
+        Lets the user select one or more images and queues them for the analysis thread.
         """
         # Open a file dialog for image selection
-        file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
-        if not file_path:
+        file_paths = filedialog.askopenfilenames(filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
+        if not file_paths:
             lbl_result.config(text="No file selected.", fg="red")
             return
 
-        try:
-            # Analyze the emotions in the image using DeepFace
-            analysis = DeepFace.analyze(img_path=file_path, actions=['emotion'])
-            emotions = analysis[0]['emotion']
-            dominant_emotion = analysis[0]['dominant_emotion']
-
-            # Display the dominant emotion as a status label
-            lbl_result.config(text=f"Dominant Emotion: {dominant_emotion}", fg="green")
-
-            # Open and resize the uploaded image
-            img = Image.open(file_path)
-
-            # Define the maximum size for display
-            max_size = (450, 450)
-            img.thumbnail(max_size)
-
-            # Convert the image to a format compatible with Tkinter
-            img_tk = ImageTk.PhotoImage(img)
-            lbl_image.config(image=img_tk)
-            lbl_image.image = img_tk
-
-            # Create a bar chart for emotion probabilities
-            figure = plt.Figure(figsize=(6, 5), dpi=100)
-            ax = figure.add_subplot(111)
-            ax.bar(emotions.keys(), emotions.values(), color='skyblue')
-            ax.set_ylim(0, 100)
-            ax.set_xlabel("Emotions", fontsize=12)
-            ax.set_ylabel("Probability (%)", fontsize=12)
-            ax.tick_params(axis='x', rotation=45, labelsize=10)
-            ax.tick_params(axis='y', labelsize=10)
-
-            plt.tight_layout()
-
-            # Clear any existing charts in the frame and display the new one
-            for widget in frame_chart.winfo_children():
-                widget.destroy()
-            canvas = FigureCanvasTkAgg(figure, master=frame_chart)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=BOTH, expand=True, pady=0)
+        for file_path in file_paths:
+            jobs.put((state["generation"], file_path))
+        state["pending"] += len(file_paths)
+        set_busy(True)
 
-        except Exception as e:
-            lbl_result.config(text=f"Error during analysis: {e}", fg="red")
+    def cancel_analysis():
+        """
+        Discards the queued images. An analysis that is already running finishes, but its result is ignored.
+        """
+        state["generation"] += 1
+        lbl_result.config(text="Analysis cancelled.", fg="red")
+
+    def set_busy(busy):
+        """Shows or hides the busy indicator and the number of remaining images."""
+        if busy:
+            lbl_status.config(text=f"Analyzing... {state['pending']} image(s) remaining")
+        if busy == state["busy"]:
+            return
+        state["busy"] = busy
+        if busy:
+            progress.start(15)
+            btn_cancel.config(state=NORMAL)
+        else:
+            progress.stop()
+            btn_cancel.config(state=DISABLED)
+            lbl_status.config(text="")
+
+    def show_result(file_path, analysis, img):
+        """
+        Displays the dominant emotion, the image and the emotion probabilities of one analysis.
+        The bar chart is created once; only the bar heights are updated.
+        """
+        emotions = analysis[0]['emotion']
+        dominant_emotion = analysis[0]['dominant_emotion']
+
+        # Display the dominant emotion as a status label
+        lbl_result.config(text=f"{os.path.basename(file_path)}: Dominant Emotion: {dominant_emotion}", fg="green")
+
+        # Convert the image to a format compatible with Tkinter
+        img_tk = ImageTk.PhotoImage(img)
+        lbl_image.config(image=img_tk)
+        lbl_image.image = img_tk
+
+        with metrics.span("draw"):
+            for bar, label in zip(bars, EMOTION_LABELS):
+                bar.set_height(emotions.get(label, 0))
+            canvas.draw_idle()
+
+    def poll_results():
+        """
+        Displays the finished analyses. Runs in the Tk main thread every 50 ms.
+        """
+        try:
+            while True:
+                generation, file_path, analysis, img, error = results.get_nowait()
+                state["pending"] -= 1
+                if generation != state["generation"]:
+                    continue
+                if error is not None:
+                    lbl_result.config(text=f"Error during analysis of {os.path.basename(file_path)}: {error}", fg="red")
+                else:
+                    show_result(file_path, analysis, img)
+        except Empty:
+            pass
+        set_busy(state["pending"] > 0)
+        root.after(50, poll_results)
 
     def exit_to_main_gui():
         """
         Closes the current GUI and exits the application.
         """
+        state["generation"] += 1
+        jobs.put(None)
+        metrics.stop()
+        if cache is not None:
+            cache.save()
         root.quit()
         root.destroy()
 
@@ -111,14 +231,38 @@ def start_gui():
     frame_chart = Frame(frame_main, width=450, height=450)
     frame_chart.pack(side=RIGHT, fill=BOTH, expand=True, padx=10, pady=10)
 
+    # Create the bar chart for emotion probabilities once; uploads only update the bar heights
+    figure = plt.Figure(figsize=(6, 5), dpi=100)
+    ax = figure.add_subplot(111)
+    bars = ax.bar(EMOTION_LABELS, [0] * len(EMOTION_LABELS), color='skyblue')
+    ax.set_ylim(0, 100)
+    ax.set_xlabel("Emotions", fontsize=12)
+    ax.set_ylabel("Probability (%)", fontsize=12)
+    ax.tick_params(axis='x', rotation=45, labelsize=10)
+    ax.tick_params(axis='y', labelsize=10)
+    figure.tight_layout()
+    canvas = FigureCanvasTkAgg(figure, master=frame_chart)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill=BOTH, expand=True, pady=0)
+
     # Label for displaying the dominant emotion or status messages
     lbl_result = Label(root, text="", font=("Arial", 12))
     lbl_result.pack(pady=5)
 
-    # Button for uploading an image and analyzing emotions
-    btn_upload = Button(root, text="Upload Image", command=upload_and_analyze, width=20, height=2, font=("Arial", 12))
+    # Button for uploading images and analyzing emotions
+    btn_upload = Button(root, text="Upload Images", command=upload_and_analyze, width=20, height=2, font=("Arial", 12))
     btn_upload.pack(pady=5)
 
+    # Busy indicator and cancel button for the background analysis
+    frame_busy = Frame(root, bg="white")
+    frame_busy.pack(pady=5)
+    progress = Progressbar(frame_busy, mode="indeterminate", length=200)
+    progress.pack(side=LEFT, padx=5)
+    lbl_status = Label(frame_busy, text="", font=("Arial", 10), bg="white")
+    lbl_status.pack(side=LEFT, padx=5)
+    btn_cancel = Button(frame_busy, text="Cancel", command=cancel_analysis, state=DISABLED, font=("Arial", 10))
+    btn_cancel.pack(side=LEFT, padx=5)
+
     # Frame for the Exit button at the bottom
     frame_exit = Frame(root, bg="white") 
     frame_exit.pack(side=BOTTOM, fill=X, padx=10, pady=10)
@@ -127,9 +271,26 @@ def start_gui():
     btn_exit = Button(frame_exit, text="Exit", command=exit_to_main_gui, width=10, height=2, font=("Arial", 12), bg="red", fg="white")
     btn_exit.pack(anchor="w")
 
+    # Load the model and analyze the images in the background
+    Thread(target=analysis_thread, name="static-analysis", daemon=True).start()
+    poll_results()
+
     # Start the Tkinter main loop
     root.mainloop()
 
 # Launch the application when the script is run
 if __name__ == "__main__":
-    start_gui()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Static emotion detection for single images.")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=None,
+                        help="Inference backend (default: the warm worker or MCQ_INFERENCE_BACKEND).")
+    parser.add_argument("--no-cache", action="store_true", help="Analyze every upload, even if the image is unchanged.")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Maximum number of cached image results.")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds a cached result stays valid.")
+    parser.add_argument("--cache-file", default=None, help="JSON file persisting the cache between runs.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(max_entries=args.cache_size, ttl=args.cache_ttl, path=args.cache_file)
+    start_gui(metrics=metrics_from_args(args), backend=args.backend, cache=cache)
\ No newline at end of file
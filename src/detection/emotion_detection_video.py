@@ -0,0 +1,261 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Offline Video Emotion Detection
+
+This script analyzes recorded video files as fast as the hardware allows instead of
+at wall-clock speed. Frames are sampled at a configurable rate (optionally only when
+the scene changes), the video is split into segments that are processed in parallel
+by worker processes, and the records of every segment are appended to the
+emotions_results.csv schema with real media timestamps as soon as the segment is done
+(so the live dashboard follows the analysis and an interrupted run keeps the finished segments).
+
+Example:
+    python src/detection/emotion_detection_video.py session.mp4 --sample-fps 2 --workers 8
+When started without a video path (e.g. from main.py), a file dialog is shown.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import count
+import argparse
+import time
+import csv
+import os
+import cv2
+import numpy as np
+
+from emotion_model import create_local_model, CSV_FIELDNAMES, INFERENCE_BACKENDS
+from face_tracker import FaceTracker
+from session_store import results_directory
+
+# Define directories for results
+current_dir = os.path.dirname(os.path.abspath(__file__))
+results_dir = results_directory(os.path.join(current_dir, "..", "results"))  # Session directory when started from main.py
+csv_path = os.path.join(results_dir, "emotions_results.csv")
+
+# Face IDs of different segments are kept apart by this offset
+FACE_ID_STRIDE = 10000
+
+# Resolution of the thumbnails compared for scene/motion changes
+MOTION_THUMBNAIL_SIZE = (64, 36)
+
+# Per-process state of the pool workers (model and detector are loaded once per worker)
+_emotion_model = None
+_face_cascade = None
+
+
+def format_media_time(seconds):
+    """Formats a media position as HH:MM:SS.mmm."""
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
+
+
+def init_worker(backend=None):
+    """
+    Loads the face detector and the emotion model once per worker process.
+
+    Parameters:
+    - backend: Inference backend; None uses the MCQ_INFERENCE_BACKEND environment variable or "tf".
+    """
+    global _emotion_model, _face_cascade
+    _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    _emotion_model = create_local_model(backend)
+    _emotion_model.load()
+
+
+def split_segments(frame_count, segments):
+    """
+    Splits the frame range of a video into contiguous segments.
+    Without a known frame count (streams and some containers report 0 or less), the whole
+    video is read sequentially as one segment until its end.
+
+    Returns:
+    - list: (start_frame, end_frame) tuples, end exclusive (None reads until the end of the video).
+    """
+    if frame_count <= 0:
+        return [(0, None)]
+    segments = max(1, min(segments, frame_count))
+    bounds = np.linspace(0, frame_count, segments + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def process_segment(video_path, segment_index, start_frame, end_frame, sample_fps, scene_threshold):
+    """
+    Analyzes one segment of a video in a worker process.
+
+    Parameters:
+    - video_path: Path of the video file.
+    - segment_index: Index of the segment, used to keep face IDs unique.
+    - start_frame, end_frame: Frame range of the segment (end exclusive, None reads until the end of the video).
+    - sample_fps: Number of frames per second of media time considered for analysis.
+    - scene_threshold: If set, a sampled frame is only analyzed when its mean absolute
+      difference to the last analyzed frame (0-255) reaches this value.
+
+    Returns:
+    - list: Emotion records with media timestamps.
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    # Every sampled frame runs a detection; the tracker only keeps the face IDs stable
+    tracker = FaceTracker(detection_interval=0)
+    sample_step = max(fps / sample_fps, 1.0) if sample_fps else 1.0
+    next_sample = float(start_frame)
+    last_thumbnail = None
+    records = []
+
+    for frame_index in range(start_frame, end_frame) if end_frame is not None else count(start_frame):
+        # Skip unsampled frames with grab(): no conversion or copy, although most backends
+        # (e.g. FFmpeg) still decode them because later frames depend on them
+        if frame_index < next_sample:
+            if not cap.grab():
+                break
+            continue
+        next_sample += sample_step
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if scene_threshold is not None:
+            thumbnail = cv2.resize(gray_frame, MOTION_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+            if last_thumbnail is not None and cv2.absdiff(thumbnail, last_thumbnail).mean() < scene_threshold:
+                continue
+            last_thumbnail = thumbnail
+
+        tracks = tracker.step(
+            gray_frame,
+            lambda gray: _face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)),
+        )
+        crops = []
+        face_ids = []
+        for track in tracks:
+            if track.missed:
+                continue
+            x, y, w, h = track.box
+            face_frame = frame[max(0, y):y+h, max(0, x):x+w]
+            if face_frame.size:
+                crops.append(face_frame)
+                face_ids.append(track.face_id + segment_index * FACE_ID_STRIDE)
+
+        try:
+            analyses = _emotion_model.predict_batch(crops)
+        except Exception as e:
+            print(f"Error during emotion analysis: {e}")
+            continue
+
+        media_seconds = frame_index / fps
+        for face_id, analysis in zip(face_ids, analyses):
+            records.append({
+                "time": format_media_time(media_seconds),
+                "stream_id": 0,
+                "face_id": face_id,
+                "dominant_emotion": analysis['dominant_emotion'],
+                **analysis['emotion']
+            })
+
+    cap.release()
+    return records
+
+
+def analyze_video(video_path, output_path=csv_path, sample_fps=2.0, scene_threshold=None, workers=None, segments=None,
+                  backend=None):
+    """
+    Analyzes a video file with parallel segment workers. The records of a segment are appended
+    to the results file as soon as the segment is done; segments appear in the order they finish,
+    and the records of each segment in media order.
+
+    Parameters:
+    - video_path: Path of the video file.
+    - output_path: CSV file receiving the results (emotions_results.csv schema).
+    - sample_fps: Frames per second of media time considered for analysis.
+    - scene_threshold: Optional minimum scene change for a sampled frame to be analyzed.
+    - workers: Number of worker processes (defaults to the number of CPUs).
+    - segments: Number of segments (defaults to the number of workers).
+    - backend: Inference backend of the workers (defaults to MCQ_INFERENCE_BACKEND or "tf").
+
+    Returns:
+    - int: Number of emotion records written.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    segment_ranges = split_segments(frame_count, segments or workers)
+    workers = min(workers, len(segment_ranges))  # Every worker loads its own model
+    media_duration = frame_count / fps if frame_count > 0 else None
+    if media_duration is None:
+        print("The video does not report its length; reading it sequentially in one segment...")
+    else:
+        print(f"Analyzing {media_duration:.0f} s of video in {len(segment_ranges)} segments with {workers} workers...")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    start_time = time.perf_counter()
+    written = 0
+    with open(output_path, "w", newline="") as csvfile, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(backend,)) as executor:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        csvfile.flush()
+        futures = [
+            executor.submit(process_segment, video_path, index, start, end, sample_fps, scene_threshold)
+            for index, (start, end) in enumerate(segment_ranges)
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            records = future.result()
+            writer.writerows(records)
+            csvfile.flush()  # Visible to the live dashboard and kept if the run is interrupted
+            written += len(records)
+            print(f"Segment {futures.index(future) + 1} done ({done}/{len(futures)}).", flush=True)
+    elapsed = time.perf_counter() - start_time
+
+    speed = f", {media_duration / max(elapsed, 1e-9):.1f}x real time" if media_duration is not None else ""
+    print(f"Saved {written} emotion records to {output_path} ({elapsed:.1f} s{speed}).")
+    return written
+
+
+def main():
+    """Parses the command line (or asks for a video file) and runs the analysis."""
+    parser = argparse.ArgumentParser(description="Offline emotion analysis of a recorded video file.")
+    parser.add_argument("video", nargs="?", help="Video file to analyze (a file dialog is shown if omitted).")
+    parser.add_argument("-o", "--output", default=csv_path, help="Output CSV file.")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="Analyzed frames per second of media time.")
+    parser.add_argument("--scene-threshold", type=float, default=None,
+                        help="Only analyze sampled frames that differ from the last analyzed one by this "
+                             "mean absolute difference (0-255).")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--segments", type=int, default=None, help="Number of parallel segments.")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=None,
+                        help="Inference backend (default: MCQ_INFERENCE_BACKEND or tf).")
+    args = parser.parse_args()
+
+    video_path = args.video
+    if not video_path:
+        from tkinter import Tk, filedialog
+
+        root = Tk()
+        root.withdraw()
+        video_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4 *.avi *.mov *.mkv")])
+        root.destroy()
+        if not video_path:
+            print("No file selected.")
+            return
+
+    analyze_video(video_path, args.output, args.sample_fps, args.scene_threshold, args.workers, args.segments,
+                  args.backend)
+
+
+if __name__ == "__main__":
+    main()
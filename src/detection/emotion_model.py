@@ -0,0 +1,266 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Batched Emotion Model
+
+This module wraps the DeepFace emotion model so that all faces of a frame can be
+analyzed with a single model invocation. The faces are expected to be already
+cropped (e.g. by the Haar Cascade), so DeepFace's own detection stage is skipped.
+
+The inference backend is selectable: "tf" runs the DeepFace model with TensorFlow,
+"onnx" and "onnx-int8" run the exported model with ONNX Runtime (see onnx_backend.py),
+"remote" sends the faces to the local inference service (see inference_service.py).
+"""
+
+import cv2
+import numpy as np
+import os
+
+# Output order of the DeepFace emotion model
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+# Columns of the emotion records written to the results CSV. The CSV keeps the wall-clock
+# "time" only; the millisecond "t_ms" of the records is stored by the binary format (.emo)
+CSV_FIELDNAMES = ["time", "stream_id", "face_id", "dominant_emotion", *EMOTION_LABELS]
+
+# Input resolution of the DeepFace emotion model (grayscale)
+EMOTION_INPUT_SIZE = (48, 48)
+
+# Inference backends and the environment variable selecting the default one
+INFERENCE_BACKENDS = ["tf", "onnx", "onnx-int8", "remote"]
+INFERENCE_BACKEND_ENV = "MCQ_INFERENCE_BACKEND"
+
+
+def preprocess_faces(face_frames):
+    """
+    Converts BGR face crops into one input tensor for the emotion model.
+
+    Parameters:
+    - face_frames: List of BGR face crops (NumPy arrays) of arbitrary size.
+
+    Returns:
+    - np.ndarray: Float32 tensor of shape (N, 48, 48, 1) with values in [0, 1].
+    """
+    batch = np.empty((len(face_frames), *EMOTION_INPUT_SIZE, 1), dtype=np.float32)
+    for i, face_frame in enumerate(face_frames):
+        gray_face = cv2.cvtColor(face_frame, cv2.COLOR_BGR2GRAY)
+        gray_face = cv2.resize(gray_face, EMOTION_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+        batch[i, :, :, 0] = gray_face
+    batch /= 255.0
+    return batch
+
+
+def scores_to_result(scores):
+    """
+    Converts raw model scores into the result format of DeepFace.analyze.
+
+    Parameters:
+    - scores: Sequence of seven model outputs in the order of EMOTION_LABELS.
+
+    Returns:
+    - dict: {"emotion": {label: percentage}, "dominant_emotion": label}
+    """
+    total = float(np.sum(scores)) or 1.0
+    emotions = {label: 100 * float(score) / total for label, score in zip(EMOTION_LABELS, scores)}
+    dominant_emotion = EMOTION_LABELS[int(np.argmax(scores))]
+    return {"emotion": emotions, "dominant_emotion": dominant_emotion}
+
+
+class EmotionModel:
+    """
+    Batched access to the DeepFace emotion model.
+
+    Attributes:
+    - keras_model: The underlying Keras model, or None if it could not be loaded.
+    - batched (bool): Whether the batched path is available. Otherwise every face
+      is analyzed individually with DeepFace.analyze.
+    """
+
+    def __init__(self):
+        """Initialize attributes. The model is loaded lazily on first use."""
+        self.keras_model = None
+        self.batched = False
+        self.loaded = False
+
+    def load(self):
+        """
+        Loads the DeepFace emotion model.
+        Falls back to per-face DeepFace.analyze if the model cannot be accessed directly.
+        """
+        if self.loaded:
+            return
+        from deepface import DeepFace
+
+        try:
+            try:
+                client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+            except TypeError:
+                # Older DeepFace versions only take the model name
+                client = DeepFace.build_model("Emotion")
+            self.keras_model = client.model
+            self.batched = True
+        except Exception as e:
+            print(f"Batched emotion model unavailable, analyzing faces individually: {e}")
+        self.loaded = True
+
+    def predict_batch(self, face_frames):
+        """
+        Analyzes the emotions of several face crops with one model invocation.
+
+        Parameters:
+        - face_frames: List of BGR face crops.
+
+        Returns:
+        - list: One result dict per face crop, in the same order
+          ({"emotion": {...}, "dominant_emotion": ...}).
+        """
+        if not face_frames:
+            return []
+        self.load()
+
+        if not self.batched:
+            return [self._analyze_individually(face_frame) for face_frame in face_frames]
+
+        predictions = self.keras_model.predict_on_batch(preprocess_faces(face_frames))
+        return [scores_to_result(scores) for scores in np.asarray(predictions)]
+
+    def _analyze_individually(self, face_frame):
+        """Analyzes a single face crop with DeepFace.analyze."""
+        from deepface import DeepFace
+
+        # The crop already contains the face, so DeepFace must not run its own detector again
+        analysis = DeepFace.analyze(face_frame, actions=['emotion'], enforce_detection=False, detector_backend="skip")
+        if isinstance(analysis, list):
+            analysis = analysis[0]
+        return {"emotion": analysis['emotion'], "dominant_emotion": analysis['dominant_emotion']}
+
+    def analyze_image(self, file_path):
+        """Analyzes the faces of an image file with DeepFace.analyze (including its face detection)."""
+        from deepface import DeepFace
+
+        return DeepFace.analyze(img_path=file_path, actions=['emotion'])
+
+
+def analyze_image_faces(file_path, model):
+    """
+    Detects the faces of an image file with the Haar Cascade and analyzes them with one
+    model invocation. Used by backends that do not go through DeepFace.analyze.
+
+    Parameters:
+    - file_path: Path of the image to analyze.
+    - model: Object with a predict_batch method (e.g. OnnxEmotionModel).
+
+    Returns:
+    - list: One dict per face in the format of DeepFace.analyze ("emotion", "dominant_emotion", "region").
+
+    Raises:
+    - ValueError: If the image cannot be read or contains no face (like DeepFace.analyze).
+    """
+    # imdecode also handles non-ASCII paths on Windows
+    image = cv2.imdecode(np.fromfile(file_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot read image: {file_path}")
+    return analyze_faces_in_image(image, model)
+
+
+def analyze_faces_in_image(image, model, detector=None):
+    """
+    Detects the faces of a decoded BGR image and analyzes them with one model invocation.
+
+    Parameters:
+    - image: BGR image.
+    - model: Object with a predict_batch method.
+    - detector: Face detector backend with a detect(gray_image) method; a new Haar Cascade by default.
+      Detector backends are not thread-safe, so concurrent callers pass one detector per thread.
+
+    Returns:
+    - list: One dict per face in the format of DeepFace.analyze ("emotion", "dominant_emotion", "region").
+
+    Raises:
+    - ValueError: If the image contains no face (like DeepFace.analyze).
+    """
+    if detector is None:
+        from face_detector import HaarBackend
+
+        detector = HaarBackend()
+    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    boxes = detector.detect(gray_image)
+    if not boxes:
+        raise ValueError("Face could not be detected in the image.")
+
+    boxes = [tuple(int(v) for v in box) for box in boxes]
+    analyses = model.predict_batch([image[y:y+h, x:x+w] for (x, y, w, h) in boxes])
+    return [
+        {**analysis, "region": {"x": x, "y": y, "w": w, "h": h}}
+        for (x, y, w, h), analysis in zip(boxes, analyses)
+    ]
+
+
+def analyze_image(file_path, worker=None, model=None):
+    """
+    Analyzes the emotions of the faces in an image file.
+    This is the analysis function shared by the static GUI and the batch CLI.
+
+    Parameters:
+    - file_path: Path of the image to analyze.
+    - worker: Optional WorkerClient of the warm inference worker.
+    - model: Optional local model (EmotionModel or OnnxEmotionModel). Without worker and
+      model, DeepFace is imported and the model is loaded in this process.
+
+    Returns:
+    - list: The DeepFace.analyze result (one dict per detected face).
+    """
+    if worker is not None:
+        return worker.analyze(img_path=file_path, actions=['emotion'])
+    if model is not None:
+        return model.analyze_image(file_path)
+
+    from deepface import DeepFace
+    return DeepFace.analyze(img_path=file_path, actions=['emotion'])
+
+
+def create_local_model(backend=None):
+    """
+    Creates an emotion model in this process.
+
+    Parameters:
+    - backend: One of INFERENCE_BACKENDS; defaults to the MCQ_INFERENCE_BACKEND environment variable or "tf".
+      "remote" returns a client of the inference service instead of a model in this process.
+
+    Returns:
+    - EmotionModel, OnnxEmotionModel or RemoteEmotionModel: The model, loaded lazily on first use.
+    """
+    backend = backend or os.environ.get(INFERENCE_BACKEND_ENV, "tf")
+    if backend == "remote":
+        from inference_client import RemoteEmotionModel
+
+        return RemoteEmotionModel()
+    if backend in ("onnx", "onnx-int8"):
+        from onnx_backend import OnnxEmotionModel, ONNX_MODEL_PATH, INT8_MODEL_PATH
+
+        return OnnxEmotionModel(INT8_MODEL_PATH if backend == "onnx-int8" else ONNX_MODEL_PATH)
+    if backend != "tf":
+        raise ValueError(f"Unknown inference backend: {backend}")
+    return EmotionModel()
+
+
+def create_emotion_model(backend=None):
+    """
+    Returns the emotion model for a front-end: a client of the warm inference worker
+    if main.py started one, otherwise a local model.
+
+    Parameters:
+    - backend: Explicitly requested inference backend. The worker runs the backend of
+      the environment, so an explicit backend always uses a local model.
+    """
+    if backend is not None:
+        return create_local_model(backend)
+
+    from inference_worker import connect_worker
+
+    client = connect_worker()
+    return client if client is not None else create_local_model()
@@ -0,0 +1,337 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Streaming Emotion Statistics
+
+This module keeps the statistics of a session up to date while the records arrive,
+with constant work per record, instead of recomputing them from all records:
+- dominant emotion counts,
+- running mean and variance of every emotion (Welford's algorithm),
+- exponentially smoothed (EMA) and rolling-window averages of the intensities,
+- intensity histograms (0.5 percentage point bins), from which the percentiles are read,
+- the rolling-window series for the line chart, downsampled on the fly by merging
+  neighbouring buckets whenever the series is full,
+- per-face record counts, dominant emotion counts and mean intensities of the most
+  recently seen faces (older tracks are evicted, so the state does not grow with the session).
+
+The real-time detection saves the aggregator as stats.json next to the results of the
+session, from a background thread once per second. The file contains the summary in the layout of session_store.summarize_records,
+which the main GUI draws directly, and the full state, so an aggregator can be restored.
+"""
+
+from threading import Thread, Lock, Event
+import json
+import os
+import numpy as np
+
+from emotion_model import EMOTION_LABELS
+
+STATS_FILENAME = "stats.json"
+STATS_VERSION = 1
+
+# Summary settings
+SUMMARY_POINTS = 2000  # Maximum number of points of the line chart series
+SUMMARY_PERCENTILES = [10, 25, 50, 75, 90]
+SMOOTHING_WINDOW = 5  # Records per rolling average (the smoothing of the line chart)
+EMA_ALPHA = 0.1  # Weight of the newest record in the exponential moving average
+HISTOGRAM_BINS = 200  # Intensity bins over 0-100 %
+MAX_FACES = 256  # Faces with per-face statistics; the face seen longest ago is evicted first
+
+
+class EmotionAggregator:
+    """
+    Incremental statistics of the emotion records of a session.
+    All methods are thread-safe, so several inference workers can update the same aggregator.
+
+    Attributes:
+    - records (int): Number of records aggregated.
+    - counts (np.ndarray): Dominant emotion counts, in the order of EMOTION_LABELS.
+    - mean (np.ndarray): Running mean intensity of every emotion.
+    - ema (np.ndarray): Exponentially smoothed intensity of every emotion (None before the first record).
+    - window (int): Number of records of the rolling average.
+    - series_points (int): Maximum number of points of the line chart series.
+    - faces (dict): Per-face statistics keyed by (stream ID, face ID), ordered from the least to the most recently seen face.
+    - max_faces (int): Maximum number of faces in `faces`.
+    - evicted_faces (int): Number of faces whose statistics were evicted.
+    """
+
+    def __init__(self, window=SMOOTHING_WINDOW, ema_alpha=EMA_ALPHA, series_points=SUMMARY_POINTS,
+                 max_faces=MAX_FACES):
+        """
+        Initialize empty statistics.
+
+        Parameters:
+        - window: Number of records of the rolling average.
+        - ema_alpha: Weight of the newest record in the exponential moving average.
+        - series_points: Maximum number of points of the line chart series (rounded down to an even number).
+        - max_faces: Maximum number of faces with per-face statistics.
+        """
+        emotions = len(EMOTION_LABELS)
+        self.window = window
+        self.ema_alpha = ema_alpha
+        self.series_points = max(2, series_points - series_points % 2)
+        self.max_faces = max_faces
+        self.lock = Lock()  # Guards the statistics
+        self.save_lock = Lock()  # One writer of the stats file at a time
+        self.saved_records = 0  # Records contained in the last saved file
+        self.closed = False  # Set by the final save; later intermediate saves are skipped
+        self.autosave_stop = Event()
+        self.autosave_thread = None
+
+        self.records = 0
+        self.counts = np.zeros(emotions, dtype=np.int64)
+        self.mean = np.zeros(emotions)
+        self.m2 = np.zeros(emotions)  # Sum of squared deviations from the mean (Welford)
+        self.ema = None
+        self.histogram = np.zeros((emotions, HISTOGRAM_BINS), dtype=np.int64)
+
+        # Rolling window as a ring of the last `window` records with a running sum
+        self.recent = np.zeros((window, emotions))
+        self.recent_sum = np.zeros(emotions)
+
+        # Line chart series: means of buckets of `bucket_size` rolling averages
+        self.series = np.zeros((self.series_points, emotions))
+        self.series_length = 0
+        self.bucket_size = 1
+        self.bucket_sum = np.zeros(emotions)
+        self.bucket_fill = 0
+
+        self.faces = {}  # (stream_id, face_id) -> [records, dominant counts, mean intensities, first t_ms, last t_ms]
+        self.evicted_faces = 0
+        self.streams = set()
+
+    def update(self, record):
+        """
+        Adds one emotion record as produced by the detection scripts.
+
+        Parameters:
+        - record: Dict with the dominant emotion, the intensity of every emotion and
+          optionally the stream ID, face ID and t_ms.
+        """
+        values = np.array([float(record[emotion]) for emotion in EMOTION_LABELS])
+        dominant = EMOTION_LABELS.index(record["dominant_emotion"])
+        bins = np.clip((values * (HISTOGRAM_BINS / 100)).astype(int), 0, HISTOGRAM_BINS - 1)
+        face_key = (int(record.get("stream_id", 0)), int(record.get("face_id", 0)))
+        t_ms = record.get("t_ms")
+
+        with self.lock:
+            self.records += 1
+            self.counts[dominant] += 1
+
+            delta = values - self.mean
+            self.mean += delta / self.records
+            self.m2 += delta * (values - self.mean)
+            self.ema = values.copy() if self.ema is None else self.ema + self.ema_alpha * (values - self.ema)
+            self.histogram[np.arange(len(values)), bins] += 1
+
+            slot = (self.records - 1) % self.window
+            self.recent_sum += values - self.recent[slot]
+            self.recent[slot] = values
+            self._append_series(self.recent_sum / min(self.records, self.window))
+
+            # Re-inserting keeps the faces ordered by their last record, so the stalest one is evicted first
+            face = self.faces.pop(face_key, None)
+            if face is None:
+                face = [0, np.zeros(len(values), dtype=np.int64), np.zeros(len(values)), t_ms, t_ms]
+                if len(self.faces) >= self.max_faces:
+                    del self.faces[next(iter(self.faces))]
+                    self.evicted_faces += 1
+                self.streams.add(face_key[0])
+            self.faces[face_key] = face
+            face[0] += 1
+            face[1][dominant] += 1
+            face[2] += (values - face[2]) / face[0]
+            face[4] = t_ms
+
+    def _append_series(self, rolling):
+        """Adds a rolling average to the series; a full series is halved by merging neighbouring buckets."""
+        self.bucket_sum += rolling
+        self.bucket_fill += 1
+        if self.bucket_fill < self.bucket_size:
+            return
+        if self.series_length == self.series_points:
+            # Amortized constant cost: this happens once per series_points / 2 buckets
+            half = self.series_points // 2
+            self.series[:half] = (self.series[0::2] + self.series[1::2]) / 2
+            self.series_length = half
+            self.bucket_size *= 2
+            if self.bucket_fill < self.bucket_size:
+                return
+        self.series[self.series_length] = self.bucket_sum / self.bucket_fill
+        self.series_length += 1
+        self.bucket_sum[:] = 0
+        self.bucket_fill = 0
+
+    def _percentiles(self, emotion_index):
+        """Reads the summary percentiles of an emotion from its histogram (interpolated within the bin)."""
+        histogram = self.histogram[emotion_index]
+        cumulative = np.cumsum(histogram)
+        bin_width = 100 / HISTOGRAM_BINS
+        result = {}
+        for p in SUMMARY_PERCENTILES:
+            target = p / 100 * self.records
+            i = min(int(np.searchsorted(cumulative, target)), HISTOGRAM_BINS - 1)
+            below = cumulative[i - 1] if i else 0
+            fraction = (target - below) / histogram[i] if histogram[i] else 0.0
+            result[f"p{p}"] = float((i + fraction) * bin_width)
+        return result
+
+    def summary(self):
+        """
+        Returns the statistics in the layout of session_store.summarize_records, extended by the
+        standard deviation, EMA and rolling average of every emotion and the per-face statistics
+        (of the most recently seen faces only). The percentiles are read from the histograms and are exact to half a percentage point.
+        """
+        with self.lock:
+            records = self.records
+            summary = {"records": records, "faces": len(self.faces) + self.evicted_faces, "streams": len(self.streams),
+                       "distribution": {}, "percentiles": {}, "series": {}, "ema": {}, "rolling": {}, "per_face": []}
+            if records == 0:
+                return summary
+
+            variance = self.m2 / records
+            series = self.series[:self.series_length]
+            if self.bucket_fill:
+                series = np.vstack([series, self.bucket_sum / self.bucket_fill])  # Include the unfinished bucket
+            rolling = self.recent_sum / min(records, self.window)
+            for i, emotion in enumerate(EMOTION_LABELS):
+                summary["distribution"][emotion] = 100 * float(self.counts[i]) / records
+                summary["percentiles"][emotion] = {"mean": float(self.mean[i]), "std": float(np.sqrt(variance[i])),
+                                                   **self._percentiles(i)}
+                summary["series"][emotion] = [round(float(v), 3) for v in series[:, i]]
+                summary["ema"][emotion] = float(self.ema[i])
+                summary["rolling"][emotion] = float(rolling[i])
+
+            for (stream_id, face_id), (face_records, counts, mean, first_t_ms, last_t_ms) in self.faces.items():
+                summary["per_face"].append({
+                    "stream_id": stream_id, "face_id": face_id, "records": face_records,
+                    "dominant_emotion": EMOTION_LABELS[int(np.argmax(counts))],
+                    "distribution": {emotion: 100 * float(counts[i]) / face_records
+                                     for i, emotion in enumerate(EMOTION_LABELS)},
+                    "mean": {emotion: float(mean[i]) for i, emotion in enumerate(EMOTION_LABELS)},
+                    "first_t_ms": first_t_ms, "last_t_ms": last_t_ms,
+                })
+        return summary
+
+    def to_dict(self, final=False):
+        """
+        Serializes the aggregator.
+
+        Parameters:
+        - final: True once the session has ended and no further records follow.
+
+        Returns:
+        - dict: Version, settings, the summary and the full state (see from_dict).
+        """
+        summary = self.summary()
+        with self.lock:
+            state = {
+                "records": self.records, "counts": self.counts.tolist(), "mean": self.mean.tolist(),
+                "m2": self.m2.tolist(), "ema": None if self.ema is None else self.ema.tolist(),
+                "histogram": self.histogram.tolist(), "recent": self.recent.tolist(),
+                "recent_sum": self.recent_sum.tolist(), "series": self.series[:self.series_length].tolist(),
+                "bucket_size": self.bucket_size, "bucket_sum": self.bucket_sum.tolist(), "bucket_fill": self.bucket_fill,
+                "faces": [[stream_id, face_id, face[0], face[1].tolist(), face[2].tolist(), face[3], face[4]]
+                          for (stream_id, face_id), face in self.faces.items()],
+                "evicted_faces": self.evicted_faces, "streams": sorted(self.streams),
+            }
+        return {"version": STATS_VERSION, "final": final, "emotions": list(EMOTION_LABELS),
+                "settings": {"window": self.window, "ema_alpha": self.ema_alpha, "series_points": self.series_points,
+                             "max_faces": self.max_faces},
+                "summary": summary, "state": state}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restores an aggregator serialized with to_dict, so further records can be added."""
+        if data.get("version") != STATS_VERSION or data.get("emotions") != list(EMOTION_LABELS):
+            raise ValueError("Unsupported emotion statistics format.")
+        aggregator = cls(**data["settings"])
+        state = data["state"]
+        aggregator.records = state["records"]
+        aggregator.counts = np.array(state["counts"], dtype=np.int64)
+        aggregator.mean = np.array(state["mean"])
+        aggregator.m2 = np.array(state["m2"])
+        aggregator.ema = None if state["ema"] is None else np.array(state["ema"])
+        aggregator.histogram = np.array(state["histogram"], dtype=np.int64)
+        aggregator.recent = np.array(state["recent"])
+        aggregator.recent_sum = np.array(state["recent_sum"])
+        aggregator.series_length = len(state["series"])
+        if aggregator.series_length:
+            aggregator.series[:aggregator.series_length] = state["series"]
+        aggregator.bucket_size = state["bucket_size"]
+        aggregator.bucket_sum = np.array(state["bucket_sum"])
+        aggregator.bucket_fill = state["bucket_fill"]
+        aggregator.faces = {(stream_id, face_id): [face_records, np.array(counts, dtype=np.int64), np.array(mean),
+                                                   first_t_ms, last_t_ms]
+                            for stream_id, face_id, face_records, counts, mean, first_t_ms, last_t_ms in state["faces"]}
+        aggregator.evicted_faces = state.get("evicted_faces", 0)
+        aggregator.streams = set(state.get("streams", [stream_id for stream_id, _ in aggregator.faces]))
+        aggregator.saved_records = aggregator.records
+        return aggregator
+
+    def save(self, path, final=False):
+        """
+        Writes the aggregator to a JSON file atomically, so readers never see a partially written file.
+        After the final save, intermediate saves no longer replace the file.
+        """
+        data = self.to_dict(final)
+        with self.save_lock:
+            if self.closed and not final:
+                return
+            self.closed = self.closed or final
+            self.saved_records = data["state"]["records"]
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temporary_path, path)
+
+    def start_autosave(self, path, interval=1.0):
+        """
+        Saves the aggregator every `interval` seconds from a background thread, whenever new
+        records were added, so the serialization never runs on the threads adding records.
+
+        Parameters:
+        - path: Path of the stats file.
+        - interval: Seconds between two saves.
+        """
+        def run():
+            while not self.autosave_stop.wait(interval):
+                if self.records != self.saved_records:
+                    self.save(path)
+
+        self.autosave_stop.clear()
+        self.autosave_thread = Thread(target=run, name="stats-autosave", daemon=True)
+        self.autosave_thread.start()
+        return self
+
+    def stop_autosave(self):
+        """Stops the background saves (waits for a save in progress)."""
+        self.autosave_stop.set()
+        if self.autosave_thread is not None:
+            self.autosave_thread.join()
+            self.autosave_thread = None
+
+    @classmethod
+    def load(cls, path):
+        """Restores an aggregator from a stats file."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def read_stats(path):
+    """
+    Reads a stats file without restoring the aggregator.
+
+    Returns:
+    - dict: The serialized aggregator (with "summary" and "final"), or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get("version") == STATS_VERSION else None
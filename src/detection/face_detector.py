@@ -0,0 +1,207 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Pluggable Face Detection Front-End
+
+This module separates the face detection from the real-time pipeline so that the
+detector backend can be exchanged (Haar Cascade, OpenCV DNN/YuNet, or "skip" for
+pre-aligned face crops). The FaceDetector wrapper makes every backend cheaper:
+- frames are downscaled to a fixed detection width and the boxes are mapped back,
+- once faces are known, only regions of interest around them are searched, with a
+  full-frame scan every few detections to pick up new faces.
+"""
+
+import os
+import cv2
+
+from face_tracker import iou
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+YUNET_MODEL_PATH = os.path.join(current_dir, "..", "models", "face_detection_yunet_2023mar.onnx")
+DETECTOR_BACKENDS = ["haar", "yunet", "skip"]
+DEFAULT_DETECTION_WIDTH = 640
+
+
+def load_face_cascade():
+    """Loads the pre-trained face detection model (Haar Cascade)."""
+    cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    return cv2.CascadeClassifier(cascade_path)
+
+
+class HaarBackend:
+    """
+    Haar Cascade face detector working on grayscale images.
+
+    Attributes:
+    - color (bool): Whether the backend needs the BGR frame instead of the grayscale frame.
+    - scale_factor, min_neighbors, min_size: Parameters of detectMultiScale (min_size at full resolution).
+    """
+
+    color = False
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        """Load the cascade and store the detection parameters."""
+        self.cascade = load_face_cascade()
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image, scale=1.0):
+        """
+        Detects faces in an image.
+
+        Parameters:
+        - image: Grayscale image, possibly downscaled.
+        - scale: Factor by which the image was downscaled (used to scale min_size).
+
+        Returns:
+        - list: Face boxes in (x, y, w, h) format in image coordinates.
+        """
+        min_size = tuple(max(1, int(v * scale)) for v in self.min_size)
+        return list(self.cascade.detectMultiScale(image, scaleFactor=self.scale_factor,
+                                                  minNeighbors=self.min_neighbors, minSize=min_size))
+
+
+class YuNetBackend:
+    """
+    OpenCV DNN face detector (YuNet) working on BGR images.
+    Requires OpenCV 4.5.4 or newer and the ONNX model file.
+
+    Attributes:
+    - color (bool): Whether the backend needs the BGR frame instead of the grayscale frame.
+    - min_size (tuple): Smallest face size at full resolution that is reported.
+    """
+
+    color = True
+
+    def __init__(self, model_path=YUNET_MODEL_PATH, score_threshold=0.8, nms_threshold=0.3, min_size=(30, 30)):
+        """Load the YuNet model."""
+        self.model = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, nms_threshold)
+        self.min_size = min_size
+
+    def detect(self, image, scale=1.0):
+        """
+        Detects faces in an image.
+
+        Parameters:
+        - image: BGR image, possibly downscaled.
+        - scale: Factor by which the image was downscaled (used to scale min_size).
+
+        Returns:
+        - list: Face boxes in (x, y, w, h) format in image coordinates.
+        """
+        height, width = image.shape[:2]
+        self.model.setInputSize((width, height))
+        _, faces = self.model.detect(image)
+        if faces is None:
+            return []
+        min_w, min_h = (v * scale for v in self.min_size)
+        return [tuple(int(v) for v in face[:4]) for face in faces if face[2] >= min_w and face[3] >= min_h]
+
+
+class SkipBackend:
+    """
+    Pass-through backend for pre-aligned face crops: the whole frame is treated as one face,
+    so the crop goes straight to the emotion model.
+    """
+
+    color = False
+
+    def detect(self, image, scale=1.0):
+        """Returns a single box covering the whole image."""
+        height, width = image.shape[:2]
+        return [(0, 0, width, height)]
+
+
+class FaceDetector:
+    """
+    Detection front-end adding downscaling and ROI-restricted search to a backend.
+
+    Attributes:
+    - backend: HaarBackend, YuNetBackend or SkipBackend.
+    - detection_width (int): Frames wider than this are downscaled before detection (None disables it).
+    - roi_margin (float): Size of the search region around a known face relative to the face size.
+    - full_scan_interval (int): Scan the whole frame every N detections to find new faces (None disables ROIs).
+    """
+
+    def __init__(self, backend, detection_width=DEFAULT_DETECTION_WIDTH, roi_margin=0.5, full_scan_interval=3):
+        """Initialize the front-end settings."""
+        self.backend = backend
+        self.detection_width = detection_width
+        self.roi_margin = roi_margin
+        self.full_scan_interval = full_scan_interval
+        self.detections = 0
+
+    def detect(self, gray_frame, frame=None, rois=None):
+        """
+        Detects the faces of a frame.
+
+        Parameters:
+        - gray_frame: Grayscale version of the frame.
+        - frame: BGR frame (required by color backends such as YuNet).
+        - rois: Boxes of previously found faces; if given, only their surroundings are searched
+          except on every full_scan_interval-th detection.
+
+        Returns:
+        - list: Face boxes in (x, y, w, h) format in full-resolution frame coordinates.
+        """
+        image = frame if self.backend.color else gray_frame
+        height, width = image.shape[:2]
+        scale = min(1.0, self.detection_width / width) if self.detection_width else 1.0
+
+        full_scan = not rois or self.full_scan_interval is None or self.detections % self.full_scan_interval == 0
+        self.detections += 1
+        if full_scan:
+            return self._detect_region(image, (0, 0, width, height), scale)
+
+        boxes = []
+        for (x, y, w, h) in rois:
+            margin_x, margin_y = int(w * self.roi_margin), int(h * self.roi_margin)
+            region = (max(0, x - margin_x), max(0, y - margin_y),
+                      min(width, x + w + margin_x), min(height, y + h + margin_y))
+            for box in self._detect_region(image, region, scale):
+                # Neighbouring regions can overlap and find the same face twice
+                if all(iou(box, other) < 0.5 for other in boxes):
+                    boxes.append(box)
+        return boxes
+
+    def _detect_region(self, image, region, scale):
+        """Runs the backend on a (downscaled) region and maps the boxes back to frame coordinates."""
+        x0, y0, x1, y1 = region
+        patch = image[y0:y1, x0:x1]
+        if patch.size == 0:
+            return []
+        if scale < 1.0:
+            patch = cv2.resize(patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return [
+            (x0 + int(round(x / scale)), y0 + int(round(y / scale)), int(round(w / scale)), int(round(h / scale)))
+            for (x, y, w, h) in self.backend.detect(patch, scale)
+        ]
+
+
+def create_face_detector(name="haar", detection_width=DEFAULT_DETECTION_WIDTH, yunet_model=YUNET_MODEL_PATH):
+    """
+    Creates the detection front-end for a backend name.
+    YuNet falls back to the Haar Cascade if the model or a recent OpenCV is not available.
+
+    Parameters:
+    - name: One of DETECTOR_BACKENDS.
+    - detection_width: Width frames are downscaled to before detection (None keeps the full resolution).
+    - yunet_model: Path of the YuNet ONNX model.
+
+    Returns:
+    - FaceDetector: The configured front-end.
+    """
+    if name == "skip":
+        # Pre-aligned crops: no search at all, the whole frame is the face
+        return FaceDetector(SkipBackend(), detection_width=None, full_scan_interval=None)
+    if name == "yunet":
+        try:
+            return FaceDetector(YuNetBackend(yunet_model), detection_width=detection_width)
+        except (AttributeError, cv2.error) as e:
+            print(f"YuNet detector not available ({e}), using the Haar Cascade.")
+    return FaceDetector(HaarBackend(), detection_width=detection_width)
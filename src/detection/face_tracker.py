@@ -0,0 +1,203 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Lightweight Face Tracker
+
+This module keeps stable IDs for the faces in a video stream so that the full face
+detection only has to run on keyframes. Detections are associated with existing
+tracks by their overlap (IoU). Between keyframes every track is followed by
+template matching in a small search window around its last position.
+"""
+
+import cv2
+
+
+def iou(box_a, box_b):
+    """
+    Computes the intersection over union of two boxes.
+
+    Parameters:
+    - box_a, box_b: Boxes in (x, y, w, h) format.
+
+    Returns:
+    - float: Overlap between 0 (disjoint) and 1 (identical).
+    """
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+
+class FaceTrack:
+    """
+    State of a single tracked face.
+
+    Attributes:
+    - face_id (int): Stable ID of the face for the whole session.
+    - box (tuple): Last known position in (x, y, w, h) format.
+    - template (np.ndarray): Grayscale patch of the face from the last detection.
+    - confidence (float): Template matching score of the last follow step (1.0 after a detection).
+    - missed (int): Number of consecutive detections in which the face was not found.
+    - analysis (dict): Most recent emotion analysis result, carried forward between inferences.
+    - frames_since_analysis (int): Processed frames since the last emotion inference.
+    """
+
+    def __init__(self, face_id, box, template):
+        """Initialize a new track from a detection."""
+        self.face_id = face_id
+        self.box = tuple(int(v) for v in box)
+        self.template = template
+        self.confidence = 1.0
+        self.missed = 0
+        self.analysis = None
+        self.frames_since_analysis = 0
+
+
+class FaceTracker:
+    """
+    IoU-based face tracker with template following between keyframes.
+
+    Attributes:
+    - detection_interval (int): Run the full face detection every N processed frames.
+    - iou_threshold (float): Minimum overlap to associate a detection with a track.
+    - max_missed (int): Number of keyframes a track may be missing before it is removed.
+    - min_confidence (float): Template matching score below which a new detection is forced.
+    - search_margin (float): Size of the follow search window relative to the face size.
+    - tracks (list): Currently active FaceTrack objects.
+    """
+
+    def __init__(self, detection_interval=5, iou_threshold=0.3, max_missed=2, min_confidence=0.6, search_margin=0.25):
+        """Initialize the tracker settings and an empty track list."""
+        self.detection_interval = detection_interval
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_confidence = min_confidence
+        self.search_margin = search_margin
+        self.tracks = []
+        self.next_face_id = 1
+        self.frames_since_detection = None  # None forces a detection on the first frame
+
+    def needs_detection(self):
+        """
+        Checks whether the next frame has to run the full face detection.
+        This is the case on every keyframe and whenever a track lost confidence.
+        """
+        if self.frames_since_detection is None or self.frames_since_detection >= self.detection_interval:
+            return True
+        return any(track.confidence < self.min_confidence for track in self.tracks)
+
+    def step(self, gray_frame, detect_faces):
+        """
+        Advances the tracker by one frame.
+
+        Parameters:
+        - gray_frame: Grayscale version of the current frame.
+        - detect_faces: Callable returning the face boxes of a grayscale frame. It is
+          only called on keyframes or when the tracking confidence dropped.
+
+        Returns:
+        - list: The active FaceTrack objects with updated positions.
+        """
+        if self.needs_detection():
+            self.update_detections(detect_faces(gray_frame), gray_frame)
+        else:
+            self.follow(gray_frame)
+        return self.tracks
+
+    def update_detections(self, boxes, gray_frame):
+        """
+        Associates fresh detections with the existing tracks (greedy by IoU).
+        Unmatched detections start new tracks, tracks missing too often are removed.
+
+        Parameters:
+        - boxes: Detected face boxes in (x, y, w, h) format.
+        - gray_frame: Grayscale frame the boxes were detected in.
+        """
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        candidates = sorted(
+            ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True,
+        )
+
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, b in candidates:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+            track = self.tracks[t]
+            track.box = boxes[b]
+            track.template = self._crop(gray_frame, track.box)
+            track.confidence = 1.0
+            track.missed = 0
+
+        active_tracks = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            active_tracks.append(track)
+
+        for b, box in enumerate(boxes):
+            if b not in matched_boxes:
+                active_tracks.append(FaceTrack(self.next_face_id, box, self._crop(gray_frame, box)))
+                self.next_face_id += 1
+
+        self.tracks = active_tracks
+        self.frames_since_detection = 0
+
+    def follow(self, gray_frame):
+        """
+        Moves every track to the best template match within a small search window.
+
+        Parameters:
+        - gray_frame: Grayscale version of the current frame.
+        """
+        frame_h, frame_w = gray_frame.shape[:2]
+        for track in self.tracks:
+            x, y, w, h = track.box
+            margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+            x1, y1 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+            window = gray_frame[y0:y1, x0:x1]
+            template = track.template
+
+            if template is None or window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                track.confidence = 0.0
+                continue
+
+            result = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            track.box = (x0 + max_loc[0], y0 + max_loc[1], w, h)
+            track.confidence = float(max_val)
+
+        self.frames_since_detection += 1
+
+    def rescale(self, scale_x, scale_y):
+        """
+        Maps the tracks to a new frame resolution (e.g. after the capture size changed).
+        The templates no longer fit, so the next frame runs a full detection.
+        """
+        for track in self.tracks:
+            x, y, w, h = track.box
+            track.box = (int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y))
+            track.template = None
+        self.frames_since_detection = None
+
+    @staticmethod
+    def _crop(gray_frame, box):
+        """Returns a copy of the face patch, or None if the box lies outside the frame."""
+        x, y, w, h = box
+        patch = gray_frame[max(0, y):y+h, max(0, x):x+w]
+        return patch.copy() if patch.size else None
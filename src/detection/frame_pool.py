@@ -0,0 +1,155 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Reusable Frame Buffers
+
+This module provides a small pool of preallocated frame buffers for the real-time
+pipeline. The capture stage writes every frame into a free buffer with in-place OpenCV
+operations (dst=) and hands the same buffer to the inference and render stages. Each
+stage releases the buffer when it is done, and the buffer returns to the pool once all
+of them have released it. In steady state no frame memory is allocated.
+
+FrameSlot hands the rendered frames from the render thread to the Tk main thread: the
+render thread draws into the back buffer and publishes it, and the main thread reads the
+front buffer whenever its refresh timer fires.
+"""
+
+from threading import Lock, Condition
+import numpy as np
+
+
+class FrameBuffer:
+    """
+    A pooled frame shared by several pipeline stages.
+
+    Attributes:
+    - image (np.ndarray): The preallocated BGR frame.
+    - refs (int): Number of stages that still use the frame.
+    """
+
+    __slots__ = ("image", "refs", "pool")
+
+    def __init__(self, image, pool):
+        """Wrap a preallocated image."""
+        self.image = image
+        self.refs = 0
+        self.pool = pool
+
+    def release(self):
+        """Called by a stage when it no longer needs the frame."""
+        self.pool.release(self)
+
+
+class FramePool:
+    """
+    Fixed-size pool of frame buffers of one resolution.
+    When the resolution changes, a new set of buffers is allocated and the old ones are
+    dropped as soon as their last user released them.
+
+    Attributes:
+    - size (int): Number of buffers. It must cover every frame that can be in flight at once:
+      the one being captured, one per queue slot and one per consuming stage.
+    - shape (tuple): Frame shape of the current buffers.
+    """
+
+    def __init__(self, size=5):
+        """Initialize an empty pool; the buffers are allocated for the first frame shape."""
+        self.size = size
+        self.shape = None
+        self.free = []
+        self.lock = Lock()
+        self.released = Condition(self.lock)  # Notified when a buffer returns to the pool
+
+    def acquire(self, shape, users, timeout=0):
+        """
+        Takes a free buffer for a new frame.
+
+        Parameters:
+        - shape: Shape of the frame to store.
+        - users: Number of stages the frame will be handed to.
+        - timeout: Seconds to wait for a buffer to be released if all are in use (0 returns at once).
+
+        Returns:
+        - FrameBuffer: A buffer with the given shape, or None if all buffers are in use.
+        """
+        with self.lock:
+            if shape != self.shape:
+                self.shape = shape
+                self.free = [FrameBuffer(np.empty(shape, dtype=np.uint8), self) for _ in range(self.size)]
+            if not self.free and timeout:
+                self.released.wait_for(lambda: self.free, timeout)
+            if not self.free:
+                return None
+            buffer = self.free.pop()
+            buffer.refs = users
+            return buffer
+
+    def release(self, buffer):
+        """Returns a buffer to the pool once all of its users have released it."""
+        with self.lock:
+            buffer.refs -= 1
+            if buffer.refs == 0 and buffer.image.shape == self.shape:
+                self.free.append(buffer)
+                self.released.notify()
+
+
+class FrameSlot:
+    """
+    Double-buffered slot holding the newest rendered frame of one stream.
+    A single writer draws into the back buffer and publishes it by swapping the buffers;
+    a single reader copies the front buffer while holding the lock, so the writer never
+    overwrites a frame that is being read. Frames the reader did not pick up in time are
+    simply replaced.
+
+    Attributes:
+    - sequence (int): Number of published frames; readers use it to skip frames they already showed.
+    """
+
+    def __init__(self):
+        """Initialize an empty slot; the buffers are allocated for the first frame shape."""
+        self.buffers = [None, None]
+        self.front = 0
+        self.sequence = 0
+        self.lock = Lock()
+
+    def back(self, shape):
+        """
+        Returns the back buffer for the next frame (writer only).
+
+        Parameters:
+        - shape: Shape of the frame to render.
+
+        Returns:
+        - np.ndarray: The buffer to draw into, reallocated only when the shape changes.
+        """
+        index = 1 - self.front
+        if self.buffers[index] is None or self.buffers[index].shape != shape:
+            self.buffers[index] = np.empty(shape, dtype=np.uint8)
+        return self.buffers[index]
+
+    def publish(self):
+        """Makes the back buffer the newest frame (writer only)."""
+        with self.lock:
+            self.front = 1 - self.front
+            self.sequence += 1
+
+    def read(self, since, consumer):
+        """
+        Passes the newest frame to a consumer if it is newer than the given sequence number.
+
+        Parameters:
+        - since: Sequence number of the frame the reader showed last.
+        - consumer: Callable receiving the front buffer; it must copy what it needs before returning.
+
+        Returns:
+        - int: Sequence number of the consumed frame (equal to since if there was no new frame).
+        """
+        with self.lock:
+            if self.sequence == since or self.buffers[self.front] is None:
+                return since
+            consumer(self.buffers[self.front])
+            return self.sequence
@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Raw Frame Recorder and Replay Source
+
+This module records the raw captured frames of a real-time session into a memory-mapped
+ring file and feeds them back through the same pipeline later, so a slowdown or a
+misdetection can be reproduced and pipeline changes can be compared on exactly the same
+input, without a camera. The frames are stored uncompressed, so neither re-encoding
+artifacts nor decoding costs distort the comparison.
+
+File layout ("*.mcqraw"):
+- a fixed-size header (magic, version, frame shape, mirror flag, ring capacity,
+  number of frames written, session start in epoch ms),
+- an index with the sequence number and the capture time (microseconds since the first
+  frame) of every ring slot,
+- the ring of raw uint8 frames, starting at a page boundary.
+
+Once the ring is full the oldest frames are overwritten, so a recording always holds the
+last `capacity` frames. The header count is updated after each frame, so a file of a
+crashed session can still be replayed.
+
+    python src/detection/emotion_detection_realtime.py --record session.mcqraw --record-frames 1800
+    python src/detection/emotion_detection_realtime.py --replay session.mcqraw --replay-pacing fast
+
+With "fast" pacing the pipeline processes every recorded frame exactly once: the capture
+stage waits for the inference and render stages instead of dropping frames, so two runs
+see exactly the same input. With "original" pacing the frames arrive at the recorded
+capture times and the pipeline drops stale frames like with a live camera, so which
+frames are analyzed depends on the timing of the machine.
+"""
+
+import struct
+import time
+import os
+import numpy as np
+
+RECORDING_EXTENSION = ".mcqraw"
+REPLAY_PACINGS = ["original", "fast"]
+
+# File header: magic, version, header size, height, width, channels, mirror flag, capacity,
+# frames written, session start (epoch ms)
+FILE_MAGIC = b"MCQRAW01"
+FORMAT_VERSION = 1
+HEADER_FORMAT = "<8sIIIIIIIQQ"
+HEADER_SIZE = 64
+COUNT_OFFSET = struct.calcsize("<8sIIIIIII")  # Position of the frames-written counter
+PAGE_SIZE = 4096
+
+# One index entry per ring slot
+INDEX_DTYPE = np.dtype([("sequence", "<u8"), ("t_us", "<u8")])
+
+
+def _data_offset(capacity):
+    """Offset of the first frame: after the header and the index, rounded up to a page boundary."""
+    end = HEADER_SIZE + capacity * INDEX_DTYPE.itemsize
+    return -(-end // PAGE_SIZE) * PAGE_SIZE
+
+
+def is_recording(source):
+    """Returns True if a capture source names a raw frame recording."""
+    return isinstance(source, str) and source.lower().endswith(RECORDING_EXTENSION)
+
+
+class FrameRecorder:
+    """
+    Writes raw frames of one resolution into a memory-mapped ring file.
+
+    Attributes:
+    - path (str): Path of the recording.
+    - capacity (int): Number of frames kept; older frames are overwritten.
+    - shape (tuple): Frame shape, taken from the first frame.
+    - count (int): Number of frames written so far.
+    - skipped (int): Frames not recorded because their resolution differs from the first frame.
+    """
+
+    def __init__(self, path, capacity=900, mirror=False, start_epoch_ms=0):
+        """
+        Initialize the recorder. The file is created with the first frame, when the resolution is known.
+
+        Parameters:
+        - path: Path of the recording.
+        - capacity: Number of frames kept in the ring.
+        - mirror: Whether the pipeline mirrors the frames of this source (stored for the replay).
+        - start_epoch_ms: Wall-clock start of the session.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.mirror = mirror
+        self.start_epoch_ms = start_epoch_ms
+        self.shape = None
+        self.count = 0
+        self.skipped = 0
+        self.first_time = None
+        self.file_map = None
+
+    def _create(self, shape):
+        """Creates the ring file for the given frame shape and maps it into memory."""
+        height, width, channels = shape if len(shape) == 3 else (*shape, 1)
+        frame_bytes = height * width * channels
+        data_offset = _data_offset(self.capacity)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file_map = np.memmap(self.path, dtype=np.uint8, mode="w+",
+                                  shape=(data_offset + self.capacity * frame_bytes,))
+        struct.pack_into(HEADER_FORMAT, self.file_map, 0, FILE_MAGIC, FORMAT_VERSION, HEADER_SIZE,
+                         height, width, channels, int(self.mirror), self.capacity, 0, self.start_epoch_ms)
+        self.index = self.file_map[HEADER_SIZE:HEADER_SIZE + self.capacity * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        self.frames = self.file_map[data_offset:].reshape((self.capacity, *shape))
+        self.shape = shape
+
+    def write(self, frame, timestamp=None):
+        """
+        Copies a frame into the next ring slot.
+
+        Parameters:
+        - frame: Raw captured frame (uint8).
+        - timestamp: Monotonic capture time in seconds (defaults to now).
+        """
+        if self.shape is None:
+            self._create(frame.shape)
+        elif frame.shape != self.shape:
+            self.skipped += 1
+            if self.skipped == 1:
+                print(f"Frame recorder: resolution changed to {frame.shape}, only {self.shape} frames are recorded.")
+            return
+
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self.first_time is None:
+            self.first_time = timestamp
+        slot = self.count % self.capacity
+        np.copyto(self.frames[slot], frame)
+        self.index[slot] = (self.count, int((timestamp - self.first_time) * 1_000_000))
+        self.count += 1
+        # Publish the frame only after its data and index entry are in place
+        struct.pack_into("<Q", self.file_map, COUNT_OFFSET, self.count)
+
+    def close(self):
+        """Flushes the recording to disk."""
+        if self.file_map is not None:
+            self.file_map.flush()
+            del self.frames, self.index
+            self.file_map = None
+            print(f"Recorded {min(self.count, self.capacity)} of {self.count} frames to {self.path}.")
+
+
+class ReplayCapture:
+    """
+    Capture source replaying a raw frame recording, with the interface of cv2.VideoCapture
+    used by the real-time pipeline. The frames are returned as read-only views of the
+    memory-mapped file (zero-copy).
+
+    Attributes:
+    - pacing (str): "original" reproduces the recorded capture times, "fast" returns frames as fast as they are read.
+    - loop (bool): Start again at the first frame at the end of the recording.
+    - mirror (bool): Whether the recorded source was mirrored by the pipeline.
+    - frame_count (int): Number of frames in the recording.
+    """
+
+    def __init__(self, path, pacing="original", loop=False):
+        """Map the recording and order its ring slots by sequence number."""
+        self.pacing = pacing
+        self.loop = loop
+        self.file_map = None
+        try:
+            self.file_map = np.memmap(path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Cannot open recording {path}: {e}")
+            return
+
+        (magic, version, header_size, height, width, channels, mirror, capacity, count,
+         self.start_epoch_ms) = struct.unpack_from(HEADER_FORMAT, self.file_map, 0)
+        if magic != FILE_MAGIC or header_size != HEADER_SIZE or version != FORMAT_VERSION:
+            print(f"Not a raw frame recording: {path}")
+            self.file_map = None
+            return
+
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        index = self.file_map[HEADER_SIZE:HEADER_SIZE + capacity * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        self.frames = self.file_map[_data_offset(capacity):].reshape((capacity, *shape))
+        self.mirror = bool(mirror)
+        self.shape = shape
+
+        # The oldest frame still in the ring comes first
+        valid = min(count, capacity)
+        self.slots = np.argsort(index["sequence"][:valid]) if count > capacity else np.arange(valid)
+        self.times = (index["t_us"][self.slots].astype(np.int64) - int(index["t_us"][self.slots[0]])) / 1e6 \
+            if valid else np.zeros(0)
+        self.frame_count = valid
+        self.position = 0
+        self.replay_start = None
+
+    def isOpened(self):
+        """Returns True if the recording could be mapped."""
+        return self.file_map is not None
+
+    def read(self, image=None):
+        """
+        Returns the next recorded frame, waiting for its capture time with original pacing.
+
+        Parameters:
+        - image: Ignored; accepted for compatibility with cv2.VideoCapture.read(image).
+
+        Returns:
+        - tuple: (True, read-only frame view) or (False, None) at the end of the recording.
+        """
+        if self.file_map is None or self.frame_count == 0:
+            return False, None
+        if self.position >= self.frame_count:
+            if not self.loop:
+                return False, None
+            self.position = 0
+            self.replay_start = None
+
+        if self.pacing == "original":
+            now = time.monotonic()
+            if self.replay_start is None:
+                self.replay_start = now
+            delay = self.replay_start + self.times[self.position] - now
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = self.frames[self.slots[self.position]]
+        self.position += 1
+        return True, frame
+
+    def set(self, property_id, value):
+        """The recorded resolution cannot be changed; returns False like an unsupported camera property."""
+        return False
+
+    def get(self, property_id):
+        """Reports the frame size, frame count and the average recorded frame rate."""
+        import cv2
+
+        if property_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.shape[1])
+        if property_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.shape[0])
+        if property_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if property_id == cv2.CAP_PROP_FPS and self.frame_count > 1 and self.times[-1] > 0:
+            return float((self.frame_count - 1) / self.times[-1])
+        return 0.0
+
+    def release(self):
+        """Unmaps the recording."""
+        if self.file_map is not None:
+            del self.frames
+            self.file_map = None
@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Inference Service Clients
+
+Clients of the local emotion inference service (inference_service.py):
+- AsyncInferenceClient: small asyncio client for other programs, with a pool of keep-alive connections.
+- RemoteEmotionModel: blocking client with the predict_batch/analyze_image interface of the
+  local models, used by the GUIs with `--backend remote`.
+
+The service address is "host:port" or "unix:/path/to/socket"; by default it is read from
+the MCQ_SERVICE_ADDRESS environment variable (falling back to 127.0.0.1:8765).
+
+    async with AsyncInferenceClient() as client:
+        analyses = await client.analyze_image_file("face.jpg")
+"""
+
+from threading import Lock
+import http.client
+import asyncio
+import socket
+import json
+import os
+import numpy as np
+
+SERVICE_ADDRESS_ENV = "MCQ_SERVICE_ADDRESS"
+DEFAULT_SERVICE_ADDRESS = "127.0.0.1:8765"
+
+
+class ServiceError(RuntimeError):
+    """Raised when the service answers with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(f"Inference service error {status}: {message}")
+        self.status = status
+
+
+class ServiceBusy(ServiceError):
+    """Raised when the service rejected a request because its queue is full (503)."""
+
+    def __init__(self, status, message, retry_after=1.0):
+        super().__init__(status, message)
+        self.retry_after = retry_after
+
+
+def service_address(address=None):
+    """Returns the service address: the given one, MCQ_SERVICE_ADDRESS or the default."""
+    return address or os.environ.get(SERVICE_ADDRESS_ENV) or DEFAULT_SERVICE_ADDRESS
+
+
+def parse_service_address(address):
+    """
+    Splits a service address.
+
+    Returns:
+    - tuple: ("unix", socket path, None) or ("tcp", host, port).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):], None
+    address = address.split("://", 1)[-1].rstrip("/")
+    host, port = address.rsplit(":", 1)
+    return "tcp", host, int(port)
+
+
+def encode_buffers(images):
+    """
+    Encodes raw BGR images for the /v1/frame and /v1/faces endpoints.
+
+    Returns:
+    - tuple: (request body, value of the X-Shapes header)
+    """
+    images = [np.ascontiguousarray(image, dtype=np.uint8) for image in images]
+    shapes = [list(image.shape) for image in images]
+    return b"".join(image.tobytes() for image in images), json.dumps(shapes)
+
+
+def parse_response(status, headers, body):
+    """
+    Decodes a service response.
+
+    Raises:
+    - ValueError: For 400 responses (e.g. no face found), like DeepFace.analyze.
+    - ServiceBusy: For 503 responses.
+    - ServiceError: For any other error status.
+    """
+    value = json.loads(body) if body else None
+    if status == 200:
+        return value
+    message = value.get("error", "") if isinstance(value, dict) else ""
+    if status == 400:
+        raise ValueError(message)
+    if status == 503:
+        raise ServiceBusy(status, message, float(headers.get("retry-after", 1)))  # Header names are case-insensitive
+    raise ServiceError(status, message)
+
+
+class AsyncInferenceClient:
+    """
+    asyncio client of the inference service.
+    Concurrent requests use separate connections (at most max_connections); idle
+    connections are kept open and reused.
+
+    Attributes:
+    - address (str): Service address ("host:port" or "unix:/path").
+    - timeout (float): Seconds to wait for a response.
+    """
+
+    def __init__(self, address=None, max_connections=8, timeout=30.0):
+        """Initialize the client; connections are opened on demand."""
+        self.address = service_address(address)
+        self.kind, self.host, self.port = parse_service_address(self.address)
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.idle = []  # (reader, writer) of open keep-alive connections
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _open(self):
+        """Opens a new connection to the service."""
+        if self.kind == "unix":
+            return await asyncio.open_unix_connection(self.host)
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=b"", headers=None):
+        """
+        Sends one request and returns the decoded JSON response.
+
+        Parameters:
+        - method: "GET" or "POST".
+        - path: Endpoint path, e.g. "/v1/image".
+        - body: Request body.
+        - headers: Additional request headers.
+        """
+        async with self.semaphore:
+            reader, writer = self.idle.pop() if self.idle else await self._open()
+            try:
+                status, response_headers, response_body = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, path, body, headers or {}), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            if response_headers.get("connection", "").lower() == "close":
+                writer.close()
+            else:
+                self.idle.append((reader, writer))
+        return parse_response(status, response_headers, response_body)
+
+    async def _exchange(self, reader, writer, method, path, body, headers):
+        """Writes a request and reads the response of a keep-alive connection."""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host if self.kind == 'tcp' else 'localhost'}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("The inference service closed the connection.")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            response_headers[name.strip().lower()] = value.strip()
+        response_body = await reader.readexactly(int(response_headers.get("content-length", 0)))
+        return status, response_headers, response_body
+
+    async def health(self):
+        """Returns the status, backend and queue length of the service."""
+        return await self.request("GET", "/health")
+
+    async def analyze_image_bytes(self, data):
+        """Analyzes an encoded image (JPEG/PNG bytes); returns one analysis per detected face."""
+        return await self.request("POST", "/v1/image", data, {"Content-Type": "application/octet-stream"})
+
+    async def analyze_image_file(self, path):
+        """Analyzes an image file; returns one analysis per detected face."""
+        with open(path, "rb") as f:
+            data = f.read()
+        return await self.analyze_image_bytes(data)
+
+    async def analyze_frame(self, frame):
+        """Analyzes a raw BGR frame (NumPy array); returns one analysis per detected face."""
+        body, shapes = encode_buffers([frame])
+        return await self.request("POST", "/v1/frame", body, {"X-Shapes": shapes})
+
+    async def analyze_faces(self, face_frames):
+        """Analyzes raw BGR face crops without detection; returns one analysis per crop."""
+        if not face_frames:
+            return []
+        body, shapes = encode_buffers(face_frames)
+        return await self.request("POST", "/v1/faces", body, {"X-Shapes": shapes})
+
+    async def close(self):
+        """Closes all idle connections."""
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, path, timeout=30.0):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class RemoteEmotionModel:
+    """
+    Emotion model running in the inference service.
+    Offers the same interface as EmotionModel, so the GUIs can use it as a backend.
+
+    Attributes:
+    - address (str): Service address ("host:port" or "unix:/path").
+    - timeout (float): Seconds to wait for a response.
+    """
+
+    def __init__(self, address=None, timeout=30.0):
+        """Initialize the client; the connection is opened on first use."""
+        self.address = service_address(address)
+        self.timeout = timeout
+        self.connection = None
+        self.lock = Lock()  # One request at a time on the keep-alive connection
+
+    def _connect(self):
+        """Opens the keep-alive connection to the service."""
+        kind, host, port = parse_service_address(self.address)
+        if kind == "unix":
+            return UnixHTTPConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Sends one request and returns the decoded JSON response.
+        A connection the service closed in the meantime is reopened once.
+        """
+        with self.lock:
+            for attempt in range(2):
+                if self.connection is None:
+                    self.connection = self._connect()
+                try:
+                    self.connection.request(method, path, body=body, headers=headers or {})
+                    response = self.connection.getresponse()
+                    status, response_headers, response_body = response.status, response.headers, response.read()
+                    break
+                except (OSError, http.client.HTTPException):
+                    self.connection.close()
+                    self.connection = None
+                    if attempt:
+                        raise
+            if response.will_close:
+                self.connection.close()
+                self.connection = None
+        return parse_response(status, response_headers, response_body)
+
+    def load(self):
+        """Checks that the service is reachable."""
+        try:
+            self.request("GET", "/health")
+        except OSError as e:
+            raise ConnectionError(f"Inference service at {self.address} is not reachable: {e}") from e
+
+    def predict_batch(self, face_frames):
+        """Analyzes several BGR face crops with one request; the service batches them with other clients."""
+        if not face_frames:
+            return []
+        body, shapes = encode_buffers(face_frames)
+        return self.request("POST", "/v1/faces", body, {"X-Shapes": shapes})
+
+    def analyze_image(self, file_path):
+        """Sends an image file to the service, which detects and analyzes its faces."""
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return self.request("POST", "/v1/image", data, {"Content-Type": "application/octet-stream"})
+
+    def close(self):
+        """Closes the connection to the service."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,392 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Local Emotion Inference Service
+
+This script runs a headless HTTP service on localhost (or a Unix socket) that exposes the
+emotion analysis to other programs, e.g. survey software or a recording rig. Requests of
+all clients are combined into micro-batches: the batcher waits at most `--max-wait-ms`
+for further faces and runs at most `--max-batch` faces per model invocation. When more
+than `--max-queue` faces are waiting, new requests are rejected with 503 and a
+Retry-After header instead of queueing without bound. A request with more faces than
+`--max-queue` could never be queued and is rejected with 413.
+
+    python src/detection/inference_service.py --port 8765 --backend onnx-int8
+    python src/detection/inference_service.py --unix /tmp/mcq-emotion.sock
+
+Endpoints (all responses are JSON):
+- GET  /health          status, backend and current queue length
+- POST /v1/image        an encoded image file (JPEG/PNG); faces are detected with the Haar Cascade
+- POST /v1/frame        a raw BGR frame (uint8); faces are detected with the Haar Cascade
+- POST /v1/faces        one or more raw BGR face crops, analyzed without detection
+
+Raw buffers are sent as the concatenated pixel data; the X-Shapes header holds their
+shapes as a JSON list, e.g. [[480, 640, 3]]. The analyses follow the DeepFace.analyze
+format ("emotion", "dominant_emotion" and, with detection, "region").
+"""
+
+from concurrent.futures import Future, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Thread, Condition, local
+from urllib.parse import urlparse
+import argparse
+import json
+import time
+import os
+import cv2
+import numpy as np
+
+from emotion_model import create_local_model, analyze_faces_in_image, INFERENCE_BACKENDS, INFERENCE_BACKEND_ENV
+from face_detector import HaarBackend
+from metrics import NULL_METRICS, add_metrics_arguments, metrics_from_args
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024  # Upper bound for one request body
+
+
+class ServiceOverloaded(Exception):
+    """Raised when the batcher queue is full or the service is shutting down; answered with 503."""
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request has more faces than the batcher queue can ever hold; answered with 413."""
+
+
+class MicroBatcher:
+    """
+    Combines the face crops of concurrent requests into single model invocations.
+
+    Attributes:
+    - model: Batched emotion model (predict_batch).
+    - max_batch (int): Maximum number of faces per model invocation.
+    - max_wait (float): Seconds the first waiting face waits for further faces.
+    - max_queue (int): Maximum number of waiting faces; further requests are rejected.
+    - result_timeout (float): Seconds a request waits for its analyses before it fails.
+    """
+
+    def __init__(self, model, max_batch=32, max_wait=0.005, max_queue=256, metrics=NULL_METRICS,
+                 result_timeout=30.0):
+        """Initialize the queue. The batching thread is started by start()."""
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.result_timeout = result_timeout
+        self.metrics = metrics
+        self.pending = []  # (face crop, Future) in arrival order
+        self.condition = Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Starts the batching thread."""
+        self.running = True
+        self.thread = Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the batching thread after the current batch and fails the faces still waiting."""
+        with self.condition:
+            self.running = False
+            pending, self.pending = self.pending, []
+            self.condition.notify()
+        for _, future in pending:
+            future.set_exception(ServiceOverloaded("The service is shutting down."))
+        if self.thread is not None:
+            self.thread.join()
+
+    def queue_length(self):
+        """Number of faces waiting for a batch."""
+        with self.condition:
+            return len(self.pending)
+
+    def predict_batch(self, face_frames):
+        """
+        Analyzes face crops together with the crops of other concurrent requests.
+        Blocks until the results are available.
+
+        Raises:
+        - RequestTooLarge: If there are more crops than the queue can hold.
+        - ServiceOverloaded: If the queue cannot take the crops now, the service is stopping
+          or the analyses are not available within result_timeout.
+        """
+        if not face_frames:
+            return []
+        if len(face_frames) > self.max_queue:
+            self.metrics.increment("rejected_requests")
+            raise RequestTooLarge(f"{len(face_frames)} faces exceed the queue limit of {self.max_queue}")
+        futures = [Future() for _ in face_frames]
+        with self.condition:
+            if not self.running:
+                raise ServiceOverloaded("The service is shutting down.")
+            if len(self.pending) + len(face_frames) > self.max_queue:
+                self.metrics.increment("rejected_requests")
+                raise ServiceOverloaded(f"{len(self.pending)} faces waiting")
+            self.pending.extend(zip(face_frames, futures))
+            self.condition.notify()
+
+        _, not_done = wait(futures, timeout=self.result_timeout)
+        if not_done:
+            # Crops that are still waiting are withdrawn; a batch in progress resolves its futures unread
+            with self.condition:
+                self.pending = [item for item in self.pending if item[1] not in not_done]
+            self.metrics.increment("timed_out_requests")
+            raise ServiceOverloaded(f"No result within {self.result_timeout:g} s")
+        return [future.result() for future in futures]
+
+    def _take_batch(self):
+        """Waits for the first face, then up to max_wait for a full batch, and removes the batch from the queue."""
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while self.running and len(self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch = self.pending[:self.max_batch]
+            del self.pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        """Batching thread: runs one model invocation per batch and resolves the futures."""
+        while self.running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self.metrics.set_gauge("batch_size", len(batch))
+                self.metrics.increment("batches")
+                self.metrics.increment("batched_faces", len(batch))
+                with self.metrics.span("inference"):
+                    analyses = list(self.model.predict_batch([face_frame for face_frame, _ in batch]))
+                if len(analyses) != len(batch):
+                    raise RuntimeError(f"The model returned {len(analyses)} analyses for {len(batch)} faces.")
+            except Exception as e:
+                # Every face of the batch gets an answer, so no request waits for a lost result
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), analysis in zip(batch, analyses):
+                future.set_result(analysis)
+
+
+def json_default(value):
+    """Converts NumPy scalars in the analyses to JSON numbers."""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def split_buffers(body, shapes):
+    """
+    Splits a request body of concatenated raw uint8 buffers.
+
+    Parameters:
+    - body: The request body.
+    - shapes: List of (height, width, channels) shapes.
+
+    Returns:
+    - list: One BGR image per shape (views of the body, no copy).
+    """
+    images = []
+    offset = 0
+    for shape in shapes:
+        if len(shape) != 3 or shape[2] != 3 or min(shape) <= 0:
+            raise ValueError(f"Unsupported buffer shape {shape}, expected [height, width, 3].")
+        size = int(np.prod(shape))
+        if offset + size > len(body):
+            raise ValueError("The body is shorter than the shapes in X-Shapes.")
+        images.append(np.frombuffer(body, dtype=np.uint8, count=size, offset=offset).reshape(shape))
+        offset += size
+    if offset != len(body):
+        raise ValueError("The body is longer than the shapes in X-Shapes.")
+    return images
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """Answers the HTTP requests of the service; the server holds the batcher."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive for clients sending many requests
+
+    def address_string(self):
+        """Unix socket clients have no address."""
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        """Only log requests when the service runs with --verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        """Health check."""
+        if urlparse(self.path).path != "/health":
+            self.send_json(404, {"error": "Not found"})
+            return
+        self.send_json(200, {"status": "ok", "backend": self.server.backend,
+                             "queue": self.server.batcher.queue_length()})
+
+    def do_POST(self):
+        """Analyzes an encoded image, a raw frame or raw face crops."""
+        path = urlparse(self.path).path
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self.close_connection = True  # The unread body would be taken for the next request
+                raise ValueError(f"Content-Length must be between 1 and {MAX_BODY_BYTES} bytes.")
+            body = self.rfile.read(length)
+
+            if path == "/v1/image":
+                image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    raise ValueError("Cannot decode the image.")
+                analyses = analyze_faces_in_image(image, self.server.batcher, self.server.detector())
+            elif path in ("/v1/frame", "/v1/faces"):
+                images = split_buffers(body, json.loads(self.headers.get("X-Shapes", "[]")))
+                if path == "/v1/frame":
+                    if len(images) != 1:
+                        raise ValueError("/v1/frame expects exactly one frame.")
+                    analyses = analyze_faces_in_image(images[0], self.server.batcher, self.server.detector())
+                else:
+                    analyses = self.server.batcher.predict_batch(images)
+            else:
+                self.send_json(404, {"error": "Not found"})
+                return
+        except RequestTooLarge as e:
+            self.send_json(413, {"error": f"Request too large: {e}"})
+            return
+        except ServiceOverloaded as e:
+            self.send_json(503, {"error": f"Service overloaded: {e}"}, {"Retry-After": "1"})
+            return
+        except ValueError as e:
+            # Also raised when no face is found (like DeepFace.analyze)
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, analyses)
+
+    def send_json(self, status, value, headers=None):
+        """Sends a JSON response."""
+        body = json.dumps(value, default=json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, header_value in (headers or {}).items():
+            self.send_header(name, header_value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ServiceMixin:
+    """State shared by the TCP and the Unix socket server."""
+
+    daemon_threads = True
+
+    def setup_service(self, batcher, backend, verbose=False):
+        """Attaches the batcher and prepares one face detector per request thread."""
+        self.batcher = batcher
+        self.backend = backend
+        self.verbose = verbose
+        self.detectors = local()
+
+    def detector(self):
+        """Returns the Haar Cascade of the calling thread (detectors are not thread-safe)."""
+        if not hasattr(self.detectors, "backend"):
+            self.detectors.backend = HaarBackend()
+        return self.detectors.backend
+
+
+class InferenceHTTPServer(ServiceMixin, ThreadingHTTPServer):
+    """Threaded HTTP server on a TCP port."""
+
+
+class UnixInferenceHTTPServer(ServiceMixin, ThreadingMixIn, UnixStreamServer):
+    """Threaded HTTP server on a Unix domain socket."""
+
+    def server_bind(self):
+        """Replaces a stale socket file of a previous run."""
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+def create_server(batcher, backend, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None, verbose=False):
+    """
+    Creates the HTTP server of the service.
+
+    Parameters:
+    - batcher: The MicroBatcher answering the analyses.
+    - backend: Name of the inference backend, reported by /health.
+    - host, port: Local TCP address (ignored if unix_path is given).
+    - unix_path: Path of a Unix domain socket to listen on instead.
+
+    Returns:
+    - The server; call serve_forever() to answer requests.
+    """
+    if unix_path:
+        server = UnixInferenceHTTPServer(unix_path, InferenceRequestHandler)
+    else:
+        server = InferenceHTTPServer((host, port), InferenceRequestHandler)
+    server.setup_service(batcher, backend, verbose)
+    return server
+
+
+def main():
+    """Parses the command line, loads and warms the model and serves requests."""
+    parser = argparse.ArgumentParser(description="Local emotion inference service with request batching.")
+    parser.add_argument("--host", default="127.0.0.1", help="Local address to listen on.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_argument("--unix", default=None, help="Listen on this Unix domain socket instead of a TCP port.")
+    parser.add_argument("--backend", choices=[name for name in INFERENCE_BACKENDS if name != "remote"], default=None,
+                        help="Inference backend (default: MCQ_INFERENCE_BACKEND or tf).")
+    parser.add_argument("--max-batch", type=int, default=32, help="Maximum number of faces per model invocation.")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Milliseconds a face waits for further faces before its batch runs.")
+    parser.add_argument("--max-queue", type=int, default=256,
+                        help="Maximum number of waiting faces; further requests get 503, larger requests 413.")
+    parser.add_argument("--request-timeout", type=float, default=30.0,
+                        help="Seconds a request waits for its analyses before it gets 503.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    backend = args.backend or os.environ.get(INFERENCE_BACKEND_ENV, "tf")
+    if backend == "remote":
+        parser.error("The service cannot use the remote backend itself.")
+
+    metrics = metrics_from_args(args)
+    model = create_local_model(backend)
+    start_time = time.perf_counter()
+    model.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)])  # Load and warm up before the first request
+    print(f"Emotion model ({backend}) warmed up in {time.perf_counter() - start_time:.1f} s.", flush=True)
+
+    batcher = MicroBatcher(model, args.max_batch, args.max_wait_ms / 1000, args.max_queue, metrics,
+                           args.request_timeout).start()
+    server = create_server(batcher, backend, args.host, args.port, args.unix, args.verbose)
+    print(f"Serving emotion inference on {args.unix or f'http://{args.host}:{args.port}'}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        metrics.stop()
+
+
+if __name__ == "__main__":
+    main()
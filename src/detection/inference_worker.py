@@ -0,0 +1,237 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Persistent Inference Worker
+
+This script runs a long-lived local process that imports DeepFace once, loads the
+emotion model, warms it up with a dummy forward pass and then serves the static and
+real-time front-ends over a local socket. It is started once by main.py, so the
+detection windows no longer pay the model import and load on every start.
+
+The worker prints "READY <host>:<port>" to stdout as soon as it accepts requests.
+Clients find it through the MCQ_WORKER_ADDRESS and MCQ_WORKER_AUTHKEY environment variables.
+With --exit-on-stdin-eof (as started by main.py) the worker exits when its stdin pipe
+reaches EOF, i.e. when the process that started it is gone. This also works on Windows,
+where an orphaned process keeps its parent PID.
+
+The model modules are imported by the worker process only, so the GUIs can import the
+constants and the client of this module without loading NumPy or OpenCV.
+"""
+
+from multiprocessing.connection import Listener, Client
+from threading import Thread, Lock
+import argparse
+import time
+import sys
+import os
+
+# Environment variables used to hand the worker address to the front-ends
+WORKER_ADDRESS_ENV = "MCQ_WORKER_ADDRESS"
+WORKER_AUTHKEY_ENV = "MCQ_WORKER_AUTHKEY"
+
+
+def parse_address(address):
+    """Converts a "host:port" string into a (host, port) tuple."""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class InferenceWorker:
+    """
+    Serves emotion analysis requests from a warm, preloaded model.
+
+    Attributes:
+    - emotion_model: Batched emotion model of the configured inference backend (MCQ_INFERENCE_BACKEND).
+    - model_lock (Lock): Serializes model calls of concurrently connected front-ends.
+    """
+
+    def __init__(self):
+        """Initialize the model and the lock guarding it."""
+        from emotion_model import EmotionModel, create_local_model
+
+        self.emotion_model = create_local_model()
+        self.uses_deepface = isinstance(self.emotion_model, EmotionModel)  # The ONNX backends never import DeepFace
+        self.model_lock = Lock()
+
+    def warm_up(self):
+        """
+        Loads the emotion model and runs dummy forward passes through the batched path
+        and DeepFace.analyze, so the first real request does not pay any lazy initialization.
+        The ONNX backends never import DeepFace.
+        """
+        import numpy as np
+
+        start_time = time.perf_counter()
+        dummy_face = np.zeros((64, 64, 3), dtype=np.uint8)
+        self.emotion_model.predict_batch([dummy_face])
+        if self.uses_deepface:
+            from deepface import DeepFace
+
+            DeepFace.analyze(np.zeros((224, 224, 3), dtype=np.uint8), actions=['emotion'], enforce_detection=False)
+        print(f"Inference worker warmed up in {time.perf_counter() - start_time:.1f} s.", flush=True)
+
+    def handle_request(self, operation, payload):
+        """
+        Executes a single request.
+
+        Parameters:
+        - operation: "ping", "predict_batch" (list of BGR face crops) or
+          "analyze" (dict of keyword arguments for DeepFace.analyze).
+        - payload: The request data of the operation.
+
+        Returns:
+        - The result of the operation.
+        """
+        if operation == "ping":
+            return "pong"
+        if operation == "predict_batch":
+            with self.model_lock:
+                return self.emotion_model.predict_batch(payload)
+        if operation == "analyze":
+            with self.model_lock:
+                if self.uses_deepface:
+                    from deepface import DeepFace
+
+                    return DeepFace.analyze(**payload)
+                return self.emotion_model.analyze_image(payload["img_path"])
+        raise ValueError(f"Unknown operation: {operation}")
+
+    def serve_connection(self, connection):
+        """
+        Answers the requests of one front-end until it disconnects.
+        Each reply is a ("ok", result) or ("error", message) tuple.
+        """
+        with connection:
+            while True:
+                try:
+                    operation, payload = connection.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    reply = ("ok", self.handle_request(operation, payload))
+                except Exception as e:
+                    reply = ("error", str(e))
+                try:
+                    connection.send(reply)
+                except OSError:
+                    break
+
+    def serve(self, host, port, authkey):
+        """
+        Accepts front-end connections forever, one thread per connection.
+
+        Parameters:
+        - host, port: Local address to listen on (port 0 picks a free port).
+        - authkey: Shared secret the front-ends have to present.
+        """
+        with Listener((host, port), authkey=authkey) as listener:
+            bound_host, bound_port = listener.address
+            print(f"READY {bound_host}:{bound_port}", flush=True)
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    print(f"Rejected inference worker connection: {e}", flush=True)
+                    continue
+                Thread(target=self.serve_connection, args=(connection,), daemon=True).start()
+
+
+class WorkerClient:
+    """
+    Front-end side of the inference worker. Offers the same predict_batch
+    interface as EmotionModel, so it can be used as a drop-in replacement.
+    """
+
+    def __init__(self, connection):
+        """Initialize the client with an established connection."""
+        self.connection = connection
+        self.lock = Lock()
+
+    def request(self, operation, payload=None):
+        """
+        Sends a request to the worker and waits for the reply.
+
+        Raises:
+        - RuntimeError: If the worker reported an error.
+        """
+        with self.lock:
+            self.connection.send((operation, payload))
+            status, result = self.connection.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def load(self):
+        """The worker model is already loaded and warm; nothing to do."""
+
+    def predict_batch(self, face_frames):
+        """Analyzes several BGR face crops with the worker's batched emotion model."""
+        if not face_frames:
+            return []
+        return self.request("predict_batch", list(face_frames))
+
+    def analyze(self, **kwargs):
+        """Runs DeepFace.analyze in the worker with the given keyword arguments."""
+        return self.request("analyze", kwargs)
+
+    def close(self):
+        """Closes the connection to the worker."""
+        self.connection.close()
+
+
+def connect_worker():
+    """
+    Connects to the inference worker announced by main.py via environment variables.
+
+    Returns:
+    - WorkerClient: A connected client, or None if no worker is running or reachable.
+    """
+    address = os.environ.get(WORKER_ADDRESS_ENV)
+    authkey = os.environ.get(WORKER_AUTHKEY_ENV)
+    if not address or not authkey:
+        return None
+    try:
+        client = WorkerClient(Client(parse_address(address), authkey=bytes.fromhex(authkey)))
+        client.request("ping")
+        return client
+    except Exception as e:
+        print(f"Inference worker unavailable, loading the model locally: {e}")
+        return None
+
+
+def watch_parent():
+    """
+    Terminates the worker as soon as the process that started it is gone.
+    The parent holds the write end of the worker's stdin pipe; the read returns EOF once
+    the parent closed it or exited (also after a crash).
+    """
+    try:
+        while sys.stdin.buffer.read(4096):
+            pass
+    except (OSError, ValueError):
+        pass
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent emotion inference worker.")
+    parser.add_argument("--host", default="127.0.0.1", help="Local address to listen on.")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on (0 picks a free port).")
+    parser.add_argument("--exit-on-stdin-eof", action="store_true",
+                        help="Exit when stdin is closed (the starting process passes a pipe and holds its other end).")
+    args = parser.parse_args()
+
+    authkey = os.environ.get(WORKER_AUTHKEY_ENV)
+    if not authkey:
+        sys.exit(f"{WORKER_AUTHKEY_ENV} must be set.")
+
+    if args.exit_on_stdin_eof and sys.stdin is not None:
+        Thread(target=watch_parent, daemon=True).start()
+
+    worker = InferenceWorker()
+    worker.warm_up()
+    worker.serve(args.host, args.port, bytes.fromhex(authkey))
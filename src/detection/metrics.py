@@ -0,0 +1,254 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Hot-Path Instrumentation
+
+This module provides low-overhead timing spans, counters, gauges and rate meters for
+the detection pipelines. The collected metrics can be shown as an overlay on the video,
+written periodically to a rolling JSON file and served as Prometheus text on a local
+HTTP endpoint.
+
+When instrumentation is disabled, span() returns a shared no-op context manager and all
+other calls return immediately, so the cost on the hot path is a single attribute check.
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import deque
+from threading import Thread, Lock, Event
+import numpy as np
+import json
+import time
+import os
+
+METRICS_PREFIX = "mcquality"
+
+
+class _NullSpan:
+    """No-op context manager returned by disabled metrics."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Context manager measuring the duration of one stage."""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Collects timings, counters, gauges and rates of a detection pipeline.
+
+    Attributes:
+    - enabled (bool): Whether measurements are recorded at all.
+    - overlay (bool): Whether the real-time window draws the overlay text onto the video.
+    - window (int): Number of recent samples per span used for the latency percentiles.
+    """
+
+    def __init__(self, enabled=False, overlay=False, window=300):
+        """Initialize empty metric stores."""
+        self.enabled = enabled
+        self.overlay = overlay and enabled
+        self.window = window
+        self.lock = Lock()
+        self.spans = {}
+        self.counters = {}
+        self.gauges = {}
+        self.ticks = {}
+        self.stop_event = Event()
+        self.http_server = None
+
+    def span(self, name):
+        """Returns a context manager timing the enclosed code as stage `name`."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        """Records a duration in seconds for stage `name`."""
+        if not self.enabled:
+            return
+        with self.lock:
+            samples = self.spans.get(name)
+            if samples is None:
+                samples = self.spans[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def increment(self, name, amount=1):
+        """Increases counter `name`."""
+        if not self.enabled or not amount:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """Sets gauge `name` to its current value."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def tick(self, name):
+        """Records an event for the rate meter `name` (e.g. one displayed frame)."""
+        if not self.enabled:
+            return
+        with self.lock:
+            events = self.ticks.get(name)
+            if events is None:
+                events = self.ticks[name] = deque(maxlen=self.window)
+            events.append(time.perf_counter())
+
+    def rate(self, name):
+        """Returns the events per second of the rate meter `name` over its recent window."""
+        events = self.ticks.get(name)
+        if not events or len(events) < 2:
+            return 0.0
+        duration = events[-1] - events[0]
+        return (len(events) - 1) / duration if duration > 0 else 0.0
+
+    def snapshot(self):
+        """
+        Returns the current metrics as a JSON-serializable dict:
+        latency percentiles per span (ms), counters, gauges and rates.
+        """
+        with self.lock:
+            spans = {name: np.asarray(samples) * 1000 for name, samples in self.spans.items() if samples}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            rates = {name: self.rate(name) for name in self.ticks}
+        latencies = {}
+        for name, values in spans.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            latencies[name] = {"count": len(values), "mean_ms": float(values.mean()),
+                               "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+        return {"timestamp": time.time(), "latency": latencies, "counters": counters,
+                "gauges": gauges, "rates": rates}
+
+    def overlay_text(self, rate_name="display", span_name="inference"):
+        """Returns a short FPS/latency summary for the video overlay."""
+        with self.lock:
+            samples = list(self.spans.get(span_name, ()))
+            fps = self.rate(rate_name)
+        latency = f"{np.percentile(np.asarray(samples) * 1000, 95):.0f} ms" if samples else "-"
+        return f"FPS {fps:.1f} | {span_name} p95 {latency}"
+
+    def prometheus_text(self):
+        """Formats the current metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {METRICS_PREFIX}_stage_latency_seconds summary"]
+        for name, stats in snapshot["latency"].items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'{METRICS_PREFIX}_stage_latency_seconds{{stage="{name}",quantile="{quantile}"}} '
+                             f'{stats[key] / 1000:.6f}')
+            lines.append(f'{METRICS_PREFIX}_stage_latency_seconds_count{{stage="{name}"}} {stats["count"]}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        for name, value in snapshot["gauges"].items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+        for name, value in snapshot["rates"].items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_per_second gauge")
+            lines.append(f"{METRICS_PREFIX}_{name}_per_second {value:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def start_json_export(self, path, interval=5.0):
+        """Writes a snapshot to `path` every `interval` seconds (replacing the file atomically)."""
+        if not self.enabled:
+            return
+
+        def export():
+            while not self.stop_event.wait(interval):
+                self.write_json(path)
+            self.write_json(path)
+
+        Thread(target=export, name="metrics-json", daemon=True).start()
+
+    def write_json(self, path):
+        """Writes the current snapshot to a JSON file."""
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temporary_path, path)
+
+    def start_http_endpoint(self, port, host="127.0.0.1"):
+        """Serves the metrics as Prometheus text on http://host:port/metrics."""
+        if not self.enabled:
+            return
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep the console free of request logs
+
+        self.http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(target=self.http_server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics available at http://{host}:{self.http_server.server_port}/metrics")
+
+    def stop(self):
+        """Stops the exporters (the JSON file receives a final snapshot)."""
+        self.stop_event.set()
+        if self.http_server is not None:
+            self.http_server.shutdown()
+
+
+# Shared disabled instance used when no metrics are configured
+NULL_METRICS = Metrics(enabled=False)
+
+
+def add_metrics_arguments(parser):
+    """Adds the instrumentation options to an argparse parser."""
+    parser.add_argument("--metrics", action="store_true", help="Enable hot-path instrumentation.")
+    parser.add_argument("--metrics-overlay", action="store_true", help="Show FPS and latency on the video.")
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write a rolling JSON metrics file.")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="Serve Prometheus metrics on this port.")
+
+
+def metrics_from_args(args):
+    """
+    Creates and starts the metrics configured on the command line.
+    Any exporter option implicitly enables instrumentation.
+    """
+    enabled = args.metrics or args.metrics_overlay or args.metrics_json or args.metrics_port is not None
+    if not enabled:
+        return NULL_METRICS
+    metrics = Metrics(enabled=True, overlay=args.metrics_overlay)
+    if args.metrics_json:
+        metrics.start_json_export(args.metrics_json)
+    if args.metrics_port is not None:
+        metrics.start_http_endpoint(args.metrics_port)
+    return metrics
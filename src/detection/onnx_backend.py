@@ -0,0 +1,236 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+ONNX Runtime Emotion Backend
+
+This module exports the DeepFace emotion model once to ONNX (optionally quantized to
+INT8) and runs it with ONNX Runtime on the CPU. At inference time neither TensorFlow
+nor DeepFace is imported, which lowers the per-face latency, the memory footprint and
+the startup time. A parity check compares the ONNX model with the TensorFlow path.
+
+    python src/detection/onnx_backend.py export --int8
+    python src/detection/onnx_backend.py parity --images faces/ --int8
+
+Export requires tensorflow and tf2onnx; inference only requires onnxruntime.
+"""
+
+import argparse
+import sys
+import os
+import cv2
+import numpy as np
+
+from emotion_model import EmotionModel, EMOTION_INPUT_SIZE, preprocess_faces, scores_to_result, analyze_image_faces
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(current_dir, "..", "models")
+ONNX_MODEL_PATH = os.path.join(models_dir, "emotion.onnx")
+INT8_MODEL_PATH = os.path.join(models_dir, "emotion.int8.onnx")
+
+
+def int8_model_path(model_path):
+    """Returns the path of the INT8-quantized variant of a model, e.g. emotion.onnx -> emotion.int8.onnx."""
+    return os.path.splitext(model_path)[0] + ".int8.onnx"
+
+
+def default_thread_count():
+    """
+    Intra-op threads for ONNX Runtime. The small emotion model does not scale beyond a
+    few threads, and leaving cores free keeps the capture and render threads responsive.
+    """
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def export_model(output_path=ONNX_MODEL_PATH, opset=13):
+    """
+    Exports the DeepFace emotion model (TensorFlow/Keras) to ONNX.
+
+    Parameters:
+    - output_path: Path of the ONNX file to write.
+    - opset: ONNX opset version.
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    model = EmotionModel()
+    model.load()
+    if not model.batched:
+        raise RuntimeError("The DeepFace emotion model could not be loaded for export.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    input_signature = (tf.TensorSpec((None, *EMOTION_INPUT_SIZE, 1), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model.keras_model, input_signature=input_signature, opset=opset, output_path=output_path)
+    print(f"Exported the emotion model to {output_path}.")
+
+
+def quantize_model(input_path=ONNX_MODEL_PATH, output_path=INT8_MODEL_PATH):
+    """
+    Quantizes the weights of an exported model to INT8 (dynamic quantization).
+    Activations are quantized at runtime, so no calibration data is needed.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {input_path} to {output_path}.")
+
+
+class OnnxEmotionModel:
+    """
+    Batched emotion model running an exported ONNX file with ONNX Runtime.
+    Offers the same interface as EmotionModel.
+
+    Attributes:
+    - model_path (str): Path of the ONNX file (FP32 or INT8).
+    - intra_op_threads (int): Threads used inside one operator.
+    - session: The ONNX Runtime InferenceSession, created on first use.
+    """
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, intra_op_threads=None):
+        """Initialize attributes. The session is created lazily on first use."""
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads or default_thread_count()
+        self.session = None
+        self.input_name = None
+
+    def load(self):
+        """Creates the ONNX Runtime session with CPU-tuned settings."""
+        if self.session is not None:
+            return
+        import onnxruntime as ort
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"{self.model_path} not found. Export it with: python onnx_backend.py export --int8")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1  # The graph is a plain chain, parallel branches do not help
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_scores(self, batch):
+        """Runs the model on a preprocessed (N, 48, 48, 1) tensor and returns the raw scores."""
+        self.load()
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def predict_batch(self, face_frames):
+        """
+        Analyzes the emotions of several face crops with one model invocation.
+
+        Parameters:
+        - face_frames: List of BGR face crops.
+
+        Returns:
+        - list: One result dict per face crop, in the same order
+          ({"emotion": {...}, "dominant_emotion": ...}).
+        """
+        if not face_frames:
+            return []
+        scores = self.predict_scores(preprocess_faces(face_frames))
+        return [scores_to_result(row) for row in scores]
+
+    def analyze_image(self, file_path):
+        """Detects the faces of an image file with the Haar Cascade and analyzes them in one batch."""
+        return analyze_image_faces(file_path, self)
+
+
+def load_face_crops(image_dir):
+    """Reads all images of a directory as face crops (BGR)."""
+    crops = []
+    for name in sorted(os.listdir(image_dir)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            image = cv2.imdecode(np.fromfile(os.path.join(image_dir, name), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is not None:
+                crops.append(image)
+    return crops
+
+
+def parity_check(model_path=ONNX_MODEL_PATH, image_dir=None, samples=256, batch_size=64):
+    """
+    Compares the ONNX model with the TensorFlow model on the same inputs.
+
+    Parameters:
+    - model_path: ONNX file to check.
+    - image_dir: Directory of face crops. Without it, random inputs are used, which only
+      verifies the numerical conversion, not the accuracy on real faces.
+    - samples: Number of random inputs if no image directory is given.
+    - batch_size: Number of inputs per model invocation.
+
+    Returns:
+    - dict: Number of samples, top-1 agreement and absolute score differences (in percent points).
+    """
+    if image_dir:
+        inputs = preprocess_faces(load_face_crops(image_dir))
+    else:
+        inputs = np.random.default_rng(0).random((samples, *EMOTION_INPUT_SIZE, 1), dtype=np.float32)
+    if len(inputs) == 0:
+        raise ValueError(f"No face images found in {image_dir}.")
+
+    reference = EmotionModel()
+    reference.load()
+    if not reference.batched:
+        raise RuntimeError("The TensorFlow emotion model is not available for the parity check.")
+    candidate = OnnxEmotionModel(model_path)
+
+    tf_scores, onnx_scores = [], []
+    for start in range(0, len(inputs), batch_size):
+        batch = inputs[start:start + batch_size]
+        tf_scores.append(np.asarray(reference.keras_model.predict_on_batch(batch)))
+        onnx_scores.append(candidate.predict_scores(batch))
+    tf_scores, onnx_scores = np.concatenate(tf_scores), np.concatenate(onnx_scores)
+
+    # Compare the normalized percentages the GUI shows
+    tf_percent = 100 * tf_scores / tf_scores.sum(axis=1, keepdims=True)
+    onnx_percent = 100 * onnx_scores / onnx_scores.sum(axis=1, keepdims=True)
+    difference = np.abs(tf_percent - onnx_percent)
+    return {
+        "samples": int(len(inputs)),
+        "top1_agreement": float(np.mean(tf_scores.argmax(axis=1) == onnx_scores.argmax(axis=1))),
+        "max_abs_diff": float(difference.max()),
+        "mean_abs_diff": float(difference.mean()),
+    }
+
+
+def main():
+    """Parses the command line and runs the export, quantization or parity check."""
+    parser = argparse.ArgumentParser(description="Export and check the ONNX emotion backend.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export the DeepFace emotion model to ONNX.")
+    export_parser.add_argument("-o", "--output", default=ONNX_MODEL_PATH, help="ONNX file to write.")
+    export_parser.add_argument("--opset", type=int, default=13, help="ONNX opset version.")
+    export_parser.add_argument("--int8", action="store_true", help="Also write an INT8-quantized model.")
+    export_parser.add_argument("--int8-output", default=None,
+                               help="INT8 file to write (default: <output stem>.int8.onnx next to the output).")
+
+    parity_parser = commands.add_parser("parity", help="Compare the ONNX model with the TensorFlow model.")
+    parity_parser.add_argument("--model", default=None, help="ONNX file to check (defaults to the exported model).")
+    parity_parser.add_argument("--int8", action="store_true", help="Check the INT8-quantized model.")
+    parity_parser.add_argument("--images", default=None, help="Directory of face crops (random inputs otherwise).")
+    parity_parser.add_argument("--samples", type=int, default=256, help="Number of random inputs.")
+    parity_parser.add_argument("--min-agreement", type=float, default=0.98,
+                               help="Fail if the top-1 agreement is below this fraction.")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.output, args.opset)
+        if args.int8:
+            quantize_model(args.output, args.int8_output or int8_model_path(args.output))
+        return
+
+    model_path = args.model or (INT8_MODEL_PATH if args.int8 else ONNX_MODEL_PATH)
+    report = parity_check(model_path, args.images, args.samples)
+    print(f"Parity of {model_path} on {report['samples']} inputs: "
+          f"top-1 agreement {report['top1_agreement']:.2%}, "
+          f"score difference mean {report['mean_abs_diff']:.2f} / max {report['max_abs_diff']:.2f} percent points")
+    if report["top1_agreement"] < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Adaptive Quality Controller
+
+This module adapts the real-time pipeline to the machine it runs on. The user sets a
+target display FPS and/or a CPU budget; the controller measures the display rate, the
+CPU usage of the process and the latency of the inference stage, and steps through a
+ladder of quality levels (capture resolution, detection interval, inference cadence per
+face and Haar Cascade parameters). It degrades quickly when the budget is exceeded and
+only upgrades when there is clear headroom, so the level does not oscillate.
+
+Inference runs separately from the display, so its latency is not judged against the
+display frame time but against an inference budget: the time until a tracked face is due
+again (inference interval of the level / target FPS), or an explicit budget. A level whose
+inference budget was exceeded is not retried for a while; otherwise display FPS and CPU
+headroom decide about upgrades.
+"""
+
+from collections import deque
+import numpy as np
+import time
+import os
+
+# Quality ladder from cheapest to most expensive. Level 2 matches the fixed default settings.
+QUALITY_LEVELS = [
+    {"width": 320, "height": 240, "detection_interval": 10, "inference_interval": 8,
+     "scale_factor": 1.3, "min_size": (40, 40)},
+    {"width": 640, "height": 480, "detection_interval": 8, "inference_interval": 5,
+     "scale_factor": 1.2, "min_size": (40, 40)},
+    {"width": 640, "height": 480, "detection_interval": 5, "inference_interval": 3,
+     "scale_factor": 1.1, "min_size": (30, 30)},
+    {"width": 1280, "height": 720, "detection_interval": 3, "inference_interval": 2,
+     "scale_factor": 1.1, "min_size": (30, 30)},
+    {"width": 1920, "height": 1080, "detection_interval": 2, "inference_interval": 1,
+     "scale_factor": 1.05, "min_size": (24, 24)},
+]
+DEFAULT_LEVEL = 2
+
+# Columns of the quality adjustment log written next to the session results
+QUALITY_FIELDNAMES = ["time", "t_ms", "level", "reason", "display_fps", "cpu_percent", "stage_p90_ms",
+                      "width", "height", "detection_interval", "inference_interval", "scale_factor", "min_size"]
+
+
+class QualityController:
+    """
+    Chooses the quality level of the real-time pipeline from runtime measurements.
+
+    Attributes:
+    - target_fps (float): Display frame rate to sustain (None disables the FPS rule).
+    - cpu_budget (float): Maximum CPU usage of the process in percent of all cores (None disables the CPU rule).
+    - levels (list): Quality ladder from cheapest to most expensive.
+    - level_index (int): Index of the active level.
+    - adjust_interval (float): Seconds between two decisions; measurements are reset after every change.
+    - inference_budget (float): Fixed inference stage budget in seconds (None derives it from the level and target FPS).
+    - retry_interval (float): Seconds before a level whose inference budget was exceeded is tried again.
+    """
+
+    def __init__(self, target_fps=None, cpu_budget=None, levels=QUALITY_LEVELS, start_level=DEFAULT_LEVEL,
+                 adjust_interval=2.0, window=120, inference_budget=None, retry_interval=30.0):
+        """Initialize the budget and the measurement windows."""
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.inference_budget = inference_budget
+        self.retry_interval = retry_interval
+        self.blocked_until = {}  # Level index -> monotonic time until which upgrades to it are skipped
+        self.levels = levels
+        self.level_index = min(start_level, len(levels) - 1)
+        self.adjust_interval = adjust_interval
+        self.display_times = deque(maxlen=window)
+        self.stage_times = deque(maxlen=window)
+        self.cpu_count = os.cpu_count() or 1
+        self.last_measurements = (None, None, None)  # Measurements that led to the last decision
+        self._reset_measurements()
+
+    @property
+    def level(self):
+        """Settings of the active quality level."""
+        return self.levels[self.level_index]
+
+    def stage_budget(self, level):
+        """
+        Returns the inference stage budget of a level in seconds, or None without a budget.
+        A tracked face is due again after `inference_interval` frames, so one inference round
+        may take that many frame times without delaying the analyses.
+        """
+        if self.inference_budget:
+            return self.inference_budget
+        if self.target_fps:
+            return level["inference_interval"] / self.target_fps
+        return None
+
+    def tick_display(self):
+        """Records one displayed frame (called by the render stage)."""
+        self.display_times.append(time.monotonic())
+
+    def observe_stage(self, seconds):
+        """Records the processing time of one frame in the inference stage."""
+        self.stage_times.append(seconds)
+
+    def measurements(self):
+        """
+        Returns the measurements since the last change.
+
+        Returns:
+        - tuple: (display FPS, CPU usage in percent of all cores, p90 inference stage latency in seconds);
+          values are None when there is not enough data yet.
+        """
+        now = time.monotonic()
+        display_times = list(self.display_times)
+        stage_times = list(self.stage_times)
+        fps = None
+        if len(display_times) >= 2 and display_times[-1] > display_times[0]:
+            fps = (len(display_times) - 1) / (display_times[-1] - display_times[0])
+        wall = now - self.window_start
+        cpu = (time.process_time() - self.cpu_start) / (wall * self.cpu_count) * 100 if wall > 0 else None
+        stage_p90 = float(np.percentile(stage_times, 90)) if stage_times else None
+        return fps, cpu, stage_p90
+
+    def update(self):
+        """
+        Decides whether the quality level should change. Called regularly by the inference stage.
+
+        Returns:
+        - tuple: (new level settings, reason) after a change, otherwise None.
+        """
+        if time.monotonic() - self.window_start < self.adjust_interval:
+            return None
+
+        fps, cpu, stage_p90 = self.last_measurements = self.measurements()
+        now = time.monotonic()
+        stage_budget = self.stage_budget(self.level)
+        reason = None
+        step = 0
+
+        # Degrade as soon as any budget is exceeded
+        if self.target_fps and fps is not None and fps < 0.9 * self.target_fps:
+            step, reason = -1, f"display {fps:.1f} FPS below target {self.target_fps:g}"
+        elif self.cpu_budget and cpu is not None and cpu > self.cpu_budget:
+            step, reason = -1, f"CPU {cpu:.0f}% above budget {self.cpu_budget:g}%"
+        elif stage_budget and stage_p90 is not None and stage_p90 > stage_budget:
+            step, reason = -1, f"inference stage p90 {stage_p90 * 1000:.0f} ms over budget {stage_budget * 1000:.0f} ms"
+            self.blocked_until[self.level_index] = now + self.retry_interval
+        # Upgrade with clear headroom on the display and CPU budgets; the inference latency only
+        # decides on its own when it is the only budget
+        elif self.blocked_until.get(self.level_index + 1, 0) <= now:
+            fps_ok = not self.target_fps or (fps is not None and fps >= 0.98 * self.target_fps)
+            cpu_ok = not self.cpu_budget or (cpu is not None and cpu < 0.75 * self.cpu_budget)
+            stage_ok = True
+            if not (self.target_fps or self.cpu_budget) and self.level_index + 1 < len(self.levels):
+                next_budget = self.stage_budget(self.levels[self.level_index + 1])
+                stage_ok = stage_p90 is not None and stage_p90 < 0.5 * next_budget
+            if fps_ok and cpu_ok and stage_ok:
+                step, reason = 1, "headroom on all budgets"
+
+        new_index = min(max(self.level_index + step, 0), len(self.levels) - 1)
+        if new_index == self.level_index:
+            self._reset_measurements(keep_samples=True)
+            return None
+
+        self.level_index = new_index
+        self._reset_measurements()
+        return self.level, reason
+
+    def log_record(self, reason, t_ms, current_time):
+        """Builds a row of the quality adjustment log for the active level and the measurements behind it."""
+        fps, cpu, stage_p90 = self.last_measurements
+        level = self.level
+        return {
+            "time": current_time,
+            "t_ms": t_ms,
+            "level": self.level_index,
+            "reason": reason,
+            "display_fps": f"{fps:.2f}" if fps is not None else "",
+            "cpu_percent": f"{cpu:.1f}" if cpu is not None else "",
+            "stage_p90_ms": f"{stage_p90 * 1000:.1f}" if stage_p90 is not None else "",
+            "width": level["width"],
+            "height": level["height"],
+            "detection_interval": level["detection_interval"],
+            "inference_interval": level["inference_interval"],
+            "scale_factor": level["scale_factor"],
+            "min_size": "x".join(str(v) for v in level["min_size"]),
+        }
+
+    def _reset_measurements(self, keep_samples=False):
+        """Starts a new measurement window; samples taken at another level are discarded."""
+        self.window_start = time.monotonic()
+        self.cpu_start = time.process_time()
+        if not keep_samples:
+            self.display_times.clear()
+            self.stage_times.clear()
@@ -0,0 +1,194 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Content-Addressed Result Cache
+
+This module avoids re-running the emotion analysis for inputs that were already analyzed:
+- ResultCache: keyed by exact content (e.g. the SHA-256 of an image file), optionally
+  persisted to a JSON file between runs (used by the static GUI).
+- CropCache: keyed by a perceptual hash (dHash) of a face crop; a crop whose hash differs
+  from a cached one in at most `threshold` bits reuses the cached result (used in real-time
+  mode, where a still face produces nearly identical crops frame after frame).
+
+Both caches are bounded LRU caches with an optional time-to-live and count their hits.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import json
+import time
+import os
+import cv2
+import numpy as np
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dhash(face_frame, hash_size=8):
+    """
+    Computes the difference hash of a BGR face crop: the crop is reduced to a
+    (hash_size + 1) x hash_size grayscale thumbnail and every bit records whether a pixel
+    is brighter than its right neighbour. Small shifts, noise and brightness changes
+    leave most bits unchanged.
+
+    Returns:
+    - int: The hash with hash_size * hash_size bits.
+    """
+    gray_face = cv2.cvtColor(face_frame, cv2.COLOR_BGR2GRAY) if face_frame.ndim == 3 else face_frame
+    thumbnail = cv2.resize(gray_face, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits of two hashes."""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def _json_default(value):
+    """Converts NumPy scalars in analysis results for the JSON file."""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of analysis results keyed by exact content.
+
+    Attributes:
+    - max_entries (int): Number of entries kept before the least recently used one is evicted.
+    - ttl (float): Seconds after which an entry expires (None keeps entries until evicted).
+    - path (str): JSON file the cache is loaded from and saved to (None keeps it in memory only).
+    - hits, misses (int): Lookup statistics.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, path=None):
+        """Initialize an empty cache and load the persisted entries, if any."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()  # key -> (wall-clock time stored, result)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, key):
+        """Returns the cached result for a key, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        """Stores a result, evicting the least recently used entry when the cache is full."""
+        with self.lock:
+            self.entries[key] = (time.time(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self, name="Result cache"):
+        """Returns a one-line summary of the hit statistics for the console."""
+        return f"{name}: {self.hits} hits / {self.hits + self.misses} lookups ({self.hit_rate():.0%})"
+
+    def load(self):
+        """Loads the entries of the JSON file; unreadable files are ignored."""
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring result cache {self.path}: {e}")
+            return
+        for key, stored_at, result in stored[-self.max_entries:]:
+            self.entries[key] = (stored_at, result)
+
+    def save(self):
+        """Writes the entries to the JSON file (replacing it atomically)."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.lock:
+            stored = [[key, stored_at, result] for key, (stored_at, result) in self.entries.items()]
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(stored, f, default=_json_default)
+        os.replace(temporary_path, self.path)
+
+
+class CropCache(ResultCache):
+    """
+    Bounded LRU cache of face analysis results keyed by the perceptual hash of the crop.
+    Lookups are restricted to a namespace (e.g. stream and face ID), so similar-looking
+    faces of different people never share a result.
+
+    Attributes:
+    - threshold (int): Maximum number of differing hash bits to count as the same crop.
+    """
+
+    def __init__(self, max_entries=512, ttl=2.0, threshold=4):
+        """Initialize an empty in-memory cache."""
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.threshold = threshold
+
+    def get_similar(self, namespace, crop_hash):
+        """
+        Returns the result of the most similar cached crop of a namespace.
+
+        Parameters:
+        - namespace: Hashable scope of the lookup (e.g. (stream_id, face_id)).
+        - crop_hash: dHash of the face crop.
+
+        Returns:
+        - The cached result, or None if no crop within the threshold is cached.
+        """
+        with self.lock:
+            now = time.time()
+            best_key, best_distance = None, self.threshold + 1
+            for key, (stored_at, _) in list(self.entries.items()):
+                if key[0] != namespace:
+                    continue
+                if self.ttl is not None and now - stored_at > self.ttl:
+                    del self.entries[key]
+                    continue
+                distance = hamming_distance(key[1], crop_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            return self.entries[best_key][1]
+
+    def put_similar(self, namespace, crop_hash, result):
+        """Stores the result of a crop in a namespace."""
+        self.put((namespace, crop_hash), result)
@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Streaming Result Writer
+
+This module writes emotion records to disk while a session is running instead of
+buffering the whole session in memory. Records are handed to a background thread
+through a bounded queue and appended in batches. The file is flushed and synced
+periodically, so a crash loses at most the last flush interval. Optionally the file
+is rotated once it exceeds a size or age limit.
+"""
+
+from threading import Thread, Event, Lock
+from queue import Queue, Empty, Full
+import glob
+import time
+import csv
+import os
+
+from emotion_model import CSV_FIELDNAMES
+from session_buffer import SessionBuffer, write_header, epoch_ms_now
+from metrics import NULL_METRICS
+
+
+def rotated_path(path, part_number):
+    """Returns the name of a rotated part, e.g. emotions_results.part0001.csv."""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.part{part_number:04d}{extension}"
+
+
+def result_files(path):
+    """
+    Returns all files of a results series in chronological order:
+    the rotated parts followed by the current file (if it exists).
+    """
+    stem, extension = os.path.splitext(path)
+    files = sorted(glob.glob(f"{glob.escape(stem)}.part[0-9][0-9][0-9][0-9]{extension}"))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+class ResultWriter:
+    """
+    Background writer appending records to a CSV file in batches.
+
+    Attributes:
+    - path (str): Path of the current results file.
+    - max_backlog (int): Maximum number of records waiting in memory. Further records are dropped.
+    - batch_size (int): Maximum number of records written per batch.
+    - flush_interval (float): Seconds between two flush/fsync calls.
+    - max_bytes (int): Rotate the file once it exceeds this size (None disables it).
+    - rotate_interval (float): Rotate the file after this many seconds (None disables it).
+    - records_written (int): Number of records written so far.
+    - dropped_records (int): Number of records dropped because the backlog was full.
+    - metrics (Metrics): Receives the batch write timings and the dropped record count.
+    - label (str): Name of the records in the closing message (None closes silently).
+    """
+
+    def __init__(self, path, fieldnames=CSV_FIELDNAMES, max_backlog=10000, batch_size=256,
+                 flush_interval=1.0, max_bytes=None, rotate_interval=None, metrics=NULL_METRICS,
+                 label="emotion records"):
+        """Initialize the settings. The file is opened by start()."""
+        self.path = path
+        self.label = label
+        self.fieldnames = fieldnames
+        self.max_backlog = max_backlog
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.records_written = 0
+        self.dropped_records = 0
+        self.metrics = metrics
+        self.queue = Queue(maxsize=max_backlog)
+        self.closing = Event()
+        self.close_lock = Lock()
+        self.thread = None
+        self.file = None
+        self.writer = None
+        self.opened_at = None
+
+    def start(self):
+        """Opens a fresh results file and starts the background thread."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._open_file()
+        self.thread = Thread(target=self._run, name="result-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, record):
+        """
+        Queues a record for writing without blocking the caller.
+
+        Returns:
+        - bool: False if the writer is closed or the backlog is full and the record was dropped.
+        """
+        if self.closing.is_set():
+            return False
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except Full:
+            self.dropped_records += 1
+            self.metrics.increment("dropped_records")
+            if self.dropped_records == 1 or self.dropped_records % 1000 == 0:
+                print(f"Result writer backlog full, dropped {self.dropped_records} records.")
+            return False
+
+    def close(self):
+        """
+        Writes all queued records, syncs the file and stops the thread.
+        Calling close() more than once has no further effect.
+        """
+        with self.close_lock:
+            if self.closing.is_set():
+                return
+            self.closing.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.label is None:
+            return
+        if self.records_written:
+            print(f"Saved {self.records_written} {self.label} to {self.path}.")
+        else:
+            print(f"No {self.label} collected.")
+
+    def _open_file(self):
+        """
+        Creates the results file and writes the CSV header.
+        Record keys without a column (e.g. "t_ms" in the emotions_results.csv schema) are not written.
+        """
+        self.file = open(self.path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction="ignore")
+        self.writer.writeheader()
+        self.opened_at = time.monotonic()
+
+    def _write_batch(self, batch):
+        """Appends a batch of records to the file."""
+        self.writer.writerows(batch)
+
+    def _sync(self):
+        """Flushes the file buffers and forces the data onto the disk."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _rotation_due(self):
+        """Checks the size and age limits of the current file."""
+        if self.max_bytes is not None and self.file.tell() >= self.max_bytes:
+            return True
+        return self.rotate_interval is not None and time.monotonic() - self.opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        """Closes the current file, renames it to the next part and starts a new file."""
+        self._sync()
+        self.file.close()
+        part_number = len(result_files(self.path))  # Existing parts plus the current file
+        os.replace(self.path, rotated_path(self.path, part_number))
+        self._open_file()
+
+    def _run(self):
+        """Background loop: collects batches from the queue and appends them to the file."""
+        last_sync = time.monotonic()
+        while True:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                pass
+
+            if batch:
+                with self.metrics.span("result_write"):
+                    self._write_batch(batch)
+                self.records_written += len(batch)
+
+            now = time.monotonic()
+            if now - last_sync >= self.flush_interval:
+                self._sync()
+                last_sync = now
+                if self._rotation_due():
+                    self._rotate()
+
+            if self.closing.is_set() and self.queue.empty():
+                break
+
+        self._sync()
+        self.file.close()
+
+
+class BinaryResultWriter(ResultWriter):
+    """
+    Background writer appending records to a compact binary session file (*.emo).
+    Each batch is packed into a reused, preallocated structured buffer, so the
+    writer does not allocate per record. The file can be memory-mapped with
+    session_buffer.load_binary while it is still being written.
+
+    Records must contain a "t_ms" entry (milliseconds since the session start).
+
+    Attributes:
+    - start_epoch_ms (int): Wall-clock time of the session start, stored in the file header.
+    """
+
+    def __init__(self, path, start_epoch_ms=None, **kwargs):
+        """Initialize the settings and the reusable batch buffer."""
+        super().__init__(path, **kwargs)
+        self.start_epoch_ms = start_epoch_ms if start_epoch_ms is not None else epoch_ms_now()
+        self.batch_buffer = SessionBuffer(self.batch_size)
+
+    def _open_file(self):
+        """Creates the binary session file and writes its header."""
+        self.file = open(self.path, "wb")
+        write_header(self.file, self.start_epoch_ms)
+        self.opened_at = time.monotonic()
+
+    def _write_batch(self, batch):
+        """Packs a batch of records into the reused buffer and appends it to the file."""
+        self.batch_buffer.clear()
+        for record in batch:
+            self.batch_buffer.append_record(record)
+        self.file.write(self.batch_buffer.view().data)
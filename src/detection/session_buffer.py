@@ -0,0 +1,304 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Compact Columnar Session Storage
+
+This module stores emotion records as fixed-size binary records instead of Python
+dicts and CSV text. Each record holds a monotonic millisecond timestamp, the stream and face ID,
+the dominant emotion as a uint8 code and the seven scores as float32.
+
+In memory the records live in a preallocated NumPy structured array (SessionBuffer).
+On disk they are appended to a binary file with a fixed-size header ("*.emo") that can
+be memory-mapped without copying, or exported to Parquet. Converters to and from the
+emotions_results.csv schema are included:
+
+    python src/detection/session_buffer.py emotions_results.csv emotions_results.emo
+    python src/detection/session_buffer.py emotions_results.emo emotions_results.parquet
+"""
+
+import argparse
+import struct
+import time
+import csv
+import os
+from datetime import datetime
+import numpy as np
+
+from emotion_model import EMOTION_LABELS, CSV_FIELDNAMES
+
+# Binary record layout (42 bytes per record)
+RECORD_DTYPE = np.dtype([
+    ("t_ms", "<u8"),                            # Milliseconds since the session start (monotonic)
+    ("stream_id", "u1"),                        # Capture source the face was seen in
+    ("face_id", "<i4"),                         # Tracked face ID
+    ("emotion", "u1"),                          # Index of the dominant emotion in EMOTION_LABELS
+    ("scores", "<f4", (len(EMOTION_LABELS),)),  # Emotion intensities in percent
+])
+
+# Layout of format version 1 files (written before multi-camera support, without stream_id)
+RECORD_DTYPE_V1 = np.dtype([(name, RECORD_DTYPE.fields[name][0]) for name in RECORD_DTYPE.names if name != "stream_id"])
+
+# File header: magic, version, header size, record size, session start (epoch ms)
+FILE_MAGIC = b"MCQEMO01"
+HEADER_FORMAT = "<8sIIIQ"
+HEADER_SIZE = 64
+FORMAT_VERSION = 2
+
+EMOTION_CODES = {label: code for code, label in enumerate(EMOTION_LABELS)}
+
+
+class SessionBuffer:
+    """
+    Preallocated, growable buffer of emotion records.
+
+    Attributes:
+    - records (np.ndarray): Structured array with RECORD_DTYPE; only the first `size` entries are valid.
+    - size (int): Number of stored records.
+    """
+
+    def __init__(self, capacity=1024):
+        """Preallocates room for `capacity` records."""
+        self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.size = 0
+
+    def append(self, t_ms, face_id, dominant_emotion, emotions, stream_id=0):
+        """
+        Stores one record, doubling the capacity when the buffer is full.
+
+        Parameters:
+        - t_ms: Milliseconds since the session start.
+        - face_id: Tracked face ID.
+        - dominant_emotion: Label of the dominant emotion.
+        - emotions: Dict of emotion label to intensity.
+        - stream_id: Capture source the face was seen in.
+        """
+        if self.size == len(self.records):
+            grown = np.zeros(max(1, 2 * len(self.records)), dtype=RECORD_DTYPE)
+            grown[:self.size] = self.records
+            self.records = grown
+        i = self.size
+        self.records["t_ms"][i] = t_ms
+        self.records["stream_id"][i] = stream_id
+        self.records["face_id"][i] = face_id
+        self.records["emotion"][i] = EMOTION_CODES[dominant_emotion]
+        self.records["scores"][i] = [emotions[label] for label in EMOTION_LABELS]
+        self.size += 1
+
+    def append_record(self, record):
+        """Stores an emotion record dict as produced by the detection scripts."""
+        self.append(record["t_ms"], record.get("face_id", 0), record["dominant_emotion"], record,
+                    record.get("stream_id", 0))
+
+    def view(self):
+        """Returns the valid records without copying them."""
+        return self.records[:self.size]
+
+    def clear(self):
+        """Discards the stored records but keeps the allocated memory."""
+        self.size = 0
+
+
+def write_header(file, start_epoch_ms):
+    """Writes the fixed-size header of a binary session file."""
+    header = struct.pack(HEADER_FORMAT, FILE_MAGIC, FORMAT_VERSION, HEADER_SIZE, RECORD_DTYPE.itemsize, start_epoch_ms)
+    file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+
+def read_header(path):
+    """
+    Reads and validates the header of a binary session file.
+
+    Returns:
+    - tuple: (session start as milliseconds since the epoch, record dtype of the file's format version)
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    magic, version, header_size, record_size, start_epoch_ms = struct.unpack_from(HEADER_FORMAT, header)
+    record_dtype = RECORD_DTYPE_V1 if version == 1 else RECORD_DTYPE
+    if magic != FILE_MAGIC or header_size != HEADER_SIZE or record_size != record_dtype.itemsize:
+        raise ValueError(f"Not a supported emotion session file: {path}")
+    return start_epoch_ms, record_dtype
+
+
+def save_binary(records, path, start_epoch_ms):
+    """Writes records to a new binary session file."""
+    with open(path, "wb") as f:
+        write_header(f, start_epoch_ms)
+        f.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).data)
+
+
+def load_binary(path):
+    """
+    Memory-maps a binary session file without copying the records.
+    A record that was only partially written before a crash is ignored.
+    Version 1 files (without stream IDs) are copied into the current layout with stream 0.
+
+    Returns:
+    - tuple: (records as read-only np.memmap or empty array, session start in epoch ms)
+    """
+    start_epoch_ms, record_dtype = read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // record_dtype.itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=RECORD_DTYPE), start_epoch_ms
+    records = np.memmap(path, dtype=record_dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+    if record_dtype is not RECORD_DTYPE:
+        upgraded = np.zeros(count, dtype=RECORD_DTYPE)
+        for name in record_dtype.names:
+            upgraded[name] = records[name]
+        records = upgraded
+    return records, start_epoch_ms
+
+
+def save_parquet(records, path, start_epoch_ms):
+    """Writes records to a Parquet file (requires pandas and pyarrow)."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame = pd.DataFrame({
+        "t_ms": records["t_ms"],
+        "stream_id": records["stream_id"],
+        "face_id": records["face_id"],
+        "emotion": records["emotion"],
+        **{label: records["scores"][:, i] for i, label in enumerate(EMOTION_LABELS)},
+    })
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    metadata = dict(table.schema.metadata or {}, start_epoch_ms=str(int(start_epoch_ms)))
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def load_parquet(path):
+    """
+    Reads a Parquet file written by save_parquet.
+
+    Returns:
+    - tuple: (records as structured array, session start in epoch ms)
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    start_epoch_ms = int((table.schema.metadata or {}).get(b"start_epoch_ms", b"0"))
+    frame = table.to_pandas()
+    records = np.zeros(len(frame), dtype=RECORD_DTYPE)
+    records["t_ms"] = frame["t_ms"].to_numpy()
+    if "stream_id" in frame:
+        records["stream_id"] = frame["stream_id"].to_numpy()
+    records["face_id"] = frame["face_id"].to_numpy()
+    records["emotion"] = frame["emotion"].to_numpy()
+    records["scores"] = frame[EMOTION_LABELS].to_numpy(dtype=np.float32)
+    return records, start_epoch_ms
+
+
+def parse_time_of_day(value):
+    """Converts an HH:MM:SS or HH:MM:SS.mmm string into milliseconds since midnight."""
+    hours, minutes, seconds = value.split(":")
+    return int(round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000))
+
+
+def format_time_of_day(epoch_ms):
+    """Formats a point in time as a local HH:MM:SS.mmm string."""
+    moment = datetime.fromtimestamp(epoch_ms / 1000)
+    return moment.strftime("%H:%M:%S.") + f"{moment.microsecond // 1000:03d}"
+
+
+def csv_to_records(path):
+    """
+    Converts an emotions_results.csv file into binary records.
+    The CSV only stores the time of day, so the date of the file modification is
+    assumed and times running past midnight are continued on the next day.
+
+    Returns:
+    - tuple: (records as structured array, session start in epoch ms)
+    """
+    buffer = SessionBuffer()
+    first_ms = previous_ms = None
+    day_offset = 0
+    with open(path, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            time_ms = parse_time_of_day(row["time"])
+            if previous_ms is not None and time_ms < previous_ms:
+                day_offset += 24 * 3600 * 1000
+            previous_ms = time_ms
+            time_ms += day_offset
+            if first_ms is None:
+                first_ms = time_ms
+            emotions = {label: float(row[label]) for label in EMOTION_LABELS}
+            buffer.append(time_ms - first_ms, int(row.get("face_id") or 0), row["dominant_emotion"], emotions,
+                          int(row.get("stream_id") or 0))
+
+    midnight = datetime.fromtimestamp(os.path.getmtime(path)).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_epoch_ms = int(midnight.timestamp() * 1000) + (first_ms or 0)
+    return buffer.view(), start_epoch_ms
+
+
+def records_to_csv(records, start_epoch_ms, path):
+    """Writes binary records to a CSV file in the emotions_results.csv schema."""
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_FIELDNAMES)
+        for record in records:
+            writer.writerow([
+                format_time_of_day(start_epoch_ms + int(record["t_ms"])),
+                int(record["stream_id"]),
+                int(record["face_id"]),
+                EMOTION_LABELS[record["emotion"]],
+                *(float(score) for score in record["scores"]),
+            ])
+
+
+def records_to_dataframe(records, start_epoch_ms=None):
+    """
+    Builds a DataFrame in the emotions_results.csv schema for the charts.
+    Score columns are taken as views of the (memory-mapped) records.
+    """
+    import pandas as pd
+
+    columns = {
+        "t_ms": records["t_ms"],
+        "stream_id": records["stream_id"],
+        "face_id": records["face_id"],
+        "dominant_emotion": pd.Categorical.from_codes(records["emotion"], categories=EMOTION_LABELS),
+    }
+    for i, label in enumerate(EMOTION_LABELS):
+        columns[label] = records["scores"][:, i]
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_records(path):
+    """Loads records from a binary session file, a Parquet file or a CSV file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".emo":
+        return load_binary(path)
+    if extension == ".parquet":
+        return load_parquet(path)
+    return csv_to_records(path)
+
+
+def convert(source, target):
+    """Converts between the CSV, binary (*.emo) and Parquet session formats."""
+    records, start_epoch_ms = load_records(source)
+    extension = os.path.splitext(target)[1].lower()
+    if extension == ".emo":
+        save_binary(records, target, start_epoch_ms)
+    elif extension == ".parquet":
+        save_parquet(records, target, start_epoch_ms)
+    else:
+        records_to_csv(records, start_epoch_ms, target)
+    print(f"Converted {len(records)} records from {source} to {target}.")
+
+
+def epoch_ms_now():
+    """Returns the current wall-clock time in milliseconds since the epoch."""
+    return int(time.time() * 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert emotion sessions between CSV, binary (.emo) and Parquet.")
+    parser.add_argument("source", help="Input file (.csv, .emo or .parquet).")
+    parser.add_argument("target", help="Output file (.csv, .emo or .parquet).")
+    args = parser.parse_args()
+    convert(args.source, args.target)
@@ -0,0 +1,354 @@
+# SPDX-FileCopyrightText: 2025 Marbru35
+# SPDX-FileContributor: Carlotta May
+# SPDX-FileContributor: Marlon Spiess
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Multi-Session History Store
+
+This module keeps every detection run as its own session instead of overwriting the
+results file at every start:
+
+    results/sessions/index.json                  one entry per session (ID, mode, start/end, record count)
+    results/sessions/<session_id>/session.json   metadata of the session
+    results/sessions/<session_id>/summary.json   precomputed summary, written when the session closes
+    results/sessions/<session_id>/emotions_results.csv (or .emo) and further per-session files
+
+The main GUI creates a session before it starts a detection script and passes the
+session directory in the MCQ_RESULTS_DIR environment variable; the detection scripts
+write their results there. When the session closes, the store computes its summary
+(dominant emotion distribution, per-emotion percentiles and a downsampled smoothed
+series), so past sessions and comparisons of many sessions open without rescanning
+the raw records. Sessions whose detection script kept streaming statistics
+(stats.json, see emotion_stats.py) are summarized from those without reading the records.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+import json
+import os
+import numpy as np
+
+from emotion_model import EMOTION_LABELS
+from emotion_stats import read_stats, STATS_FILENAME, SUMMARY_POINTS, SUMMARY_PERCENTILES, SMOOTHING_WINDOW
+from result_writer import result_files
+from session_buffer import load_binary, records_to_dataframe, epoch_ms_now
+
+# Environment variable pointing the detection scripts to the directory of the current session
+RESULTS_DIR_ENV = "MCQ_RESULTS_DIR"
+
+RESULTS_FILENAME = "emotions_results.csv"
+BINARY_FILENAME = "emotions_results.emo"
+
+
+def results_directory(default):
+    """Returns the results directory of the current session, or the default outside a session."""
+    return os.environ.get(RESULTS_DIR_ENV) or default
+
+
+def smooth(values, window_size=SMOOTHING_WINDOW):
+    """Applies a trailing moving average smoothing to the data (like a rolling mean with min_periods=1)."""
+    values = np.asarray(values, dtype=float)
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window_size, 0)
+    return (cumulative[upper] - cumulative[lower]) / (upper - lower)
+
+
+def downsample(values, points):
+    """Reduces a series to at most `points` values by averaging equally sized buckets."""
+    if len(values) <= points:
+        return values
+    return np.array([bucket.mean() for bucket in np.array_split(values, points)])
+
+
+def load_session_records(directory):
+    """
+    Loads the records of a session directory.
+    Compact binary session files are memory-mapped without copying; otherwise the CSV files are read.
+
+    Returns:
+    - DataFrame: The emotion records in the emotions_results.csv column layout.
+    """
+    import pandas as pd
+
+    binary_files = result_files(os.path.join(directory, BINARY_FILENAME))
+    if binary_files:
+        frames = [records_to_dataframe(load_binary(path)[0]) for path in binary_files]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    files = result_files(os.path.join(directory, RESULTS_FILENAME))
+    if not files:
+        raise FileNotFoundError(os.path.join(directory, RESULTS_FILENAME))
+    return pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+
+
+def summarize_records(data, points=SUMMARY_POINTS):
+    """
+    Computes the summary of a session shown by the charts.
+
+    Parameters:
+    - data: DataFrame in the emotions_results.csv column layout.
+    - points: Maximum number of points of the smoothed series.
+
+    Returns:
+    - dict: Record/face/stream counts, the dominant emotion distribution in percent,
+      per-emotion mean, standard deviation and percentiles, and the smoothed series downsampled to `points` values.
+    """
+    records = len(data)
+    summary = {"records": records, "faces": 0, "streams": 0, "distribution": {}, "percentiles": {}, "series": {}}
+    if records == 0:
+        return summary
+
+    if "face_id" in data:
+        stream_ids = data["stream_id"] if "stream_id" in data else np.zeros(records, dtype=int)
+        faces = set(zip(np.asarray(stream_ids).tolist(), np.asarray(data["face_id"]).tolist()))
+        summary["faces"] = len(faces)
+        summary["streams"] = len({stream_id for stream_id, _ in faces})
+
+    counts = data["dominant_emotion"].astype(str).value_counts()
+    summary["distribution"] = {emotion: 100 * float(counts.get(emotion, 0)) / records for emotion in EMOTION_LABELS}
+
+    for emotion in EMOTION_LABELS:
+        if emotion not in data:
+            continue
+        values = np.asarray(data[emotion], dtype=float)
+        percentiles = np.percentile(values, SUMMARY_PERCENTILES)
+        summary["percentiles"][emotion] = {"mean": float(values.mean()), "std": float(values.std()),
+                                           **{f"p{p}": float(v) for p, v in zip(SUMMARY_PERCENTILES, percentiles)}}
+        summary["series"][emotion] = [round(float(v), 3) for v in downsample(smooth(values), points)]
+    return summary
+
+
+def _write_json(path, value):
+    """Writes a JSON file atomically, so readers never see a partially written file."""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(value, f, indent=1)
+    os.replace(temporary_path, path)
+
+
+def _read_json(path):
+    """Reads a JSON file; returns None if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _end_time(entry):
+    """Returns the end of a session in epoch milliseconds (its start while it is running)."""
+    return entry.get("ended_at") or entry["started_at"]
+
+
+def _process_alive(pid):
+    """Returns whether the process with this ID is still running (False if the ID is unknown)."""
+    if pid is None:
+        return False
+    try:
+        import psutil
+
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if os.name == "nt":
+        return True  # os.kill() would terminate the process on Windows; assume it is still running
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # The process exists but belongs to another user
+    return True
+
+
+class SessionStore:
+    """
+    Directory of detection sessions with an index and precomputed summaries.
+
+    Attributes:
+    - root (str): Directory holding the session directories and index.json.
+    - index_path (str): Path of the index file.
+    """
+
+    def __init__(self, root):
+        """Initialize the store; the directory is created on the first session."""
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._index = None
+        self._start_times = []  # started_at of the index entries (sorted)
+        self._max_end_times = []  # Latest end time of the entries up to each position (non-decreasing)
+
+    def session_dir(self, session_id):
+        """Returns the directory of a session."""
+        return os.path.join(self.root, session_id)
+
+    def create_session(self, mode, **metadata):
+        """
+        Creates a new, running session owned by the current process.
+
+        Parameters:
+        - mode: Detection mode that produces the records (e.g. "Real-Time").
+        - metadata: Further JSON-serializable attributes stored with the session.
+
+        Returns:
+        - str: The session ID (sortable by start time).
+        """
+        base_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        session_id, suffix = base_id, 1
+        while os.path.exists(self.session_dir(session_id)):
+            suffix += 1
+            session_id = f"{base_id}-{suffix}"
+        os.makedirs(self.session_dir(session_id))
+
+        entry = {"session_id": session_id, "mode": mode, "status": "running", "pid": os.getpid(),
+                 "started_at": epoch_ms_now(), "ended_at": None, "records": 0, **metadata}
+        _write_json(os.path.join(self.session_dir(session_id), "session.json"), entry)
+        self._update_index(entry)
+        return session_id
+
+    def close_session(self, session_id):
+        """
+        Marks a session as closed and precomputes its summary.
+        The final streaming statistics of the session are used if available; otherwise
+        (e.g. after a crash) the records are read and summarized.
+
+        Returns:
+        - dict: The summary of the session.
+        """
+        directory = self.session_dir(session_id)
+        summary = self.summarize_session(session_id)
+        _write_json(os.path.join(directory, "summary.json"), summary)
+
+        entry = self.session(session_id) or {"session_id": session_id, "mode": None, "started_at": epoch_ms_now()}
+        entry.update(status="closed", ended_at=epoch_ms_now(), records=summary["records"],
+                     faces=summary["faces"], streams=summary["streams"])
+        _write_json(os.path.join(directory, "session.json"), entry)
+        self._update_index(entry)
+        return summary
+
+    def summarize_session(self, session_id, final=True):
+        """
+        Computes the summary of a session without storing it.
+
+        Parameters:
+        - session_id: The session to summarize.
+        - final: Only use streaming statistics the detection script has finished; with False,
+          the statistics of a running session are used as they are.
+
+        Returns:
+        - dict: The summary of the session.
+        """
+        directory = self.session_dir(session_id)
+        stats = read_stats(os.path.join(directory, STATS_FILENAME))
+        if stats is not None and (stats.get("final") or not final):
+            return stats["summary"]
+        try:
+            data = load_session_records(directory)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"No records in session {session_id}: {e}")
+            data = None
+        return summarize_records(data) if data is not None else summarize_records([])
+
+    def session(self, session_id):
+        """Returns the metadata of a session, or None if it does not exist."""
+        return _read_json(os.path.join(self.session_dir(session_id), "session.json"))
+
+    def sessions(self, start_ms=None, end_ms=None, mode=None):
+        """
+        Looks up sessions in the index, ordered by start time.
+
+        Parameters:
+        - start_ms, end_ms: Only sessions overlapping this range of epoch milliseconds (None leaves it open).
+        - mode: Only sessions of this detection mode.
+
+        Returns:
+        - list: Index entries of the matching sessions.
+        """
+        entries = self.load_index()
+        # The index is sorted by start time, so later sessions are cut off without scanning them
+        stop = bisect_right(self._start_times, end_ms) if end_ms is not None else len(entries)
+        if start_ms is None:
+            entries = entries[:stop]
+        else:
+            # Every session before `first` ended before start_ms; sessions from `started` on started after it.
+            # Only the sessions in between (running across start_ms) are checked one by one.
+            first = bisect_left(self._max_end_times, start_ms)
+            started = max(first, min(bisect_left(self._start_times, start_ms), stop))
+            entries = [entry for entry in entries[first:started] if _end_time(entry) >= start_ms] + entries[started:stop]
+        if mode is not None:
+            entries = [entry for entry in entries if entry.get("mode") == mode]
+        return entries
+
+    def latest_session(self):
+        """Returns the index entry of the most recent session with records, or None."""
+        for entry in reversed(self.load_index()):
+            if entry.get("records") or entry.get("status") == "running":
+                return entry
+        return None
+
+    def load_summary(self, session_id):
+        """
+        Returns the precomputed summary of a session.
+        Sessions that are still running are summarized in their current state without closing
+        them; sessions that were never closed and whose process is gone (e.g. after a crash)
+        are summarized and closed now.
+        """
+        summary = _read_json(os.path.join(self.session_dir(session_id), "summary.json"))
+        if summary is not None:
+            return summary
+        entry = self.session(session_id)
+        if entry is not None and entry.get("status") == "running" and _process_alive(entry.get("pid")):
+            return self.summarize_session(session_id, final=False)
+        return self.close_session(session_id)
+
+    def load_records(self, session_id):
+        """Loads the raw records of a session (only needed for views the summary does not cover)."""
+        return load_session_records(self.session_dir(session_id))
+
+    def load_index(self):
+        """
+        Returns the index entries ordered by start time.
+        A missing or damaged index is rebuilt from the session.json files.
+        """
+        if self._index is None:
+            index = _read_json(self.index_path)
+            if isinstance(index, list):
+                self._set_index(index)
+            else:
+                self.rebuild_index()
+        return self._index
+
+    def rebuild_index(self):
+        """Scans the session directories and rewrites the index."""
+        entries = []
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                entry = self.session(name)
+                if entry is not None:
+                    entries.append(entry)
+        entries.sort(key=lambda entry: entry["started_at"])
+        self._save_index(entries)
+        return entries
+
+    def _update_index(self, entry):
+        """Adds or replaces the index entry of a session."""
+        entries = [existing for existing in self.load_index() if existing["session_id"] != entry["session_id"]]
+        entries.append(entry)
+        entries.sort(key=lambda existing: existing["started_at"])
+        self._save_index(entries)
+
+    def _save_index(self, entries):
+        """Writes the index file."""
+        os.makedirs(self.root, exist_ok=True)
+        _write_json(self.index_path, entries)
+        self._set_index(entries)
+
+    def _set_index(self, entries):
+        """Caches the index entries and the time lists the lookups bisect."""
+        self._index = entries
+        self._start_times = [entry["started_at"] for entry in entries]
+        self._max_end_times = list(accumulate((_end_time(entry) for entry in entries), max))
@@ -9,15 +9,26 @@ Main GUI for Emotion Detection
 
 This script serves as the central GUI to select between static image-based
 emotion detection and real-time emotion detection via webcam.
+Every detection run is kept as its own session in results/sessions/, so past
+sessions can be reopened and compared.
+
+The window is shown before anything heavy is loaded: matplotlib, NumPy and the session
+store are imported when results are drawn for the first time, and the Python interpreter
+of the detection scripts is resolved in the background while the inference worker
+imports and warms up the emotion model.
 """
 
+import time
+startup_time = time.perf_counter()  # Reference for the startup probe
+
 from tkinter import *
 from tkinter.ttk import Separator
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import pandas as pd
+from datetime import datetime
+from collections import deque
 import subprocess
+import csv
 import os
+import sys
 import threading
 
 
@@ -26,31 +37,129 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir)) 
 detection_dir = os.path.join(current_dir, "detection")
 results_dir = os.path.join(current_dir, "results")
-csv_path = os.path.join(results_dir, "emotions_results.csv")
+sessions_dir = os.path.join(results_dir, "sessions")  # One directory per detection run
 
-def clear_csv_file():
-    """
-    Clears the CSV file to reset stored emotions.
-    This ensures that each new session starts with a clean dataset.
-    """
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir)  # Create results directory if it does not exist
-    with open(csv_path, "w", newline="") as csvfile:
-        csvfile.write("time,dominant_emotion,angry,disgust,fear,happy,sad,surprise,neutral\n")
+# Shared modules of the detection scripts (e.g. the result file layout), mostly imported on first use
+sys.path.insert(0, detection_dir)
+from inference_worker import WORKER_ADDRESS_ENV, WORKER_AUTHKEY_ENV  # Loads no model modules
+
+# Command line flag making main.py quit as soon as the window is shown (used by the startup report)
+STARTUP_PROBE_FLAG = "--startup-probe"
+
+# History of all detection sessions with their precomputed summaries, created on first use
+store = None
+
+def session_store():
+    """Returns the session store; the store (and NumPy with it) is imported on first use."""
+    global store
+    if store is None:
+        from session_store import SessionStore
+
+        store = SessionStore(sessions_dir)
+    return store
 
 def find_python_interpreter():
     """
     Finds the appropriate Python interpreter in the virtual environment.
-    If no virtual environment is detected, it falls back to the system's Python interpreter.
+    The usual environment names are checked first; only if none of them exists are all
+    sibling directories scanned. If no virtual environment is detected, it falls back to
+    the system's Python interpreter.
     """
-    possible_envs = [name for name in os.listdir(parent_dir) if os.path.isdir(os.path.join(parent_dir, name))]
-    for env in possible_envs:
+    common_envs = ["venv", ".venv", "env", ".env"]
+    try:
+        other_envs = sorted(name for name in os.listdir(parent_dir)
+                            if name not in common_envs and os.path.isdir(os.path.join(parent_dir, name)))
+    except OSError:
+        other_envs = []
+    for env in common_envs + other_envs:
         python_path = os.path.join(parent_dir, env, "Scripts", "python.exe")
         if os.path.exists(python_path):
             return python_path
     return "python"  # Default to global Python interpreter if none is found
 
-python_path = find_python_interpreter()
+# Interpreter of the detection scripts, resolved in the background after the window is shown
+python_path = None
+python_path_ready = threading.Event()
+
+def resolve_python_interpreter():
+    """Resolves the interpreter of the detection scripts (once)."""
+    global python_path
+    if not python_path_ready.is_set():
+        python_path = find_python_interpreter()
+        python_path_ready.set()
+    return python_path
+
+def prewarm():
+    """
+    Background startup work while the user selects a mode: resolves the interpreter,
+    starts the inference worker (which imports and warms up the emotion model) and
+    imports the charting modules, so the first chart is drawn without import delay.
+    """
+    resolve_python_interpreter()
+    start_inference_worker()
+    try:
+        import matplotlib.backends.backend_tkagg  # noqa: F401
+        import matplotlib.figure  # noqa: F401
+        import chart_lod  # noqa: F401
+        import session_store  # noqa: F401
+    except ImportError as e:
+        print(f"Could not preload the charting modules: {e}")
+
+# Long-lived inference worker that keeps the emotion model loaded between sessions
+worker_process = None
+worker_address = None
+worker_authkey = os.urandom(16).hex()
+
+def start_inference_worker():
+    """
+    Starts the persistent inference worker once. It imports DeepFace, loads and warms
+    the emotion model and then serves every detection window started from this GUI.
+    The worker holds the read end of a stdin pipe and exits when this process is gone,
+    even after a crash.
+    """
+    global worker_process
+
+    def read_worker_output():
+        """Waits for the worker's READY line and keeps forwarding its console output."""
+        global worker_address
+        for line in worker_process.stdout:
+            if line.startswith("READY ") and worker_address is None:
+                worker_address = line.split()[1]
+            else:
+                print(line, end="")
+
+    script_path = os.path.join(detection_dir, "inference_worker.py")
+    env = dict(os.environ, **{WORKER_AUTHKEY_ENV: worker_authkey})
+    try:
+        worker_process = subprocess.Popen([resolve_python_interpreter(), script_path, "--exit-on-stdin-eof"],
+                                          cwd=current_dir, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          text=True)
+    except OSError as e:
+        print(f"Could not start the inference worker: {e}")
+        return
+    threading.Thread(target=read_worker_output, daemon=True).start()
+
+def stop_inference_worker():
+    """Terminates the inference worker if it is running."""
+    if worker_process is not None and worker_process.poll() is None:
+        worker_process.stdin.close()
+        worker_process.terminate()
+
+def sub_gui_environment(session_id=None):
+    """
+    Returns the environment for a detection window.
+    Once the worker is ready, its address is passed on so the window skips loading the model.
+    The results are written to the directory of the given session.
+    """
+    env = dict(os.environ)
+    if worker_address is not None and worker_process.poll() is None:
+        env[WORKER_ADDRESS_ENV] = worker_address
+        env[WORKER_AUTHKEY_ENV] = worker_authkey
+    if session_id is not None:
+        from session_store import RESULTS_DIR_ENV
+
+        env[RESULTS_DIR_ENV] = session_store().session_dir(session_id)
+    return env
 
 # Color map for charts
 COLOR_MAP = {
@@ -58,71 +167,138 @@ COLOR_MAP = {
     "happy": "green", "sad": "orange", "angry": "red", "disgust": "pink"
 }
 
-def create_bar_chart(frame, emotion_counts):
+# Live dashboard settings
+POLL_INTERVAL_MS = 200  # How often the running detection and its results file are checked
+LIVE_REDRAW_INTERVAL_MS = 500  # Upper bound for the chart redraw rate during a session
+LIVE_WINDOW = 2000  # Number of most recent records shown in the live line chart
+
+# Chart artists, created once and updated in place for every session
+charts = {}
+
+# Smoothed line chart series of recently shown sessions, created with the first chart
+series_cache = None
+
+# Maximum number of sessions in the comparison view
+MAX_COMPARED_SESSIONS = 50
+
+def enable_blitting(chart):
+    """
+    Sets up blitting for the animated artists of a chart.
+    After every full draw the static background is cached, so data updates only
+    have to redraw the animated artists on top of it.
+    """
+    chart["background"] = None
+
+    def on_draw(event):
+        chart["background"] = chart["canvas"].copy_from_bbox(chart["figure"].bbox)
+        for artist in chart["animated"]:
+            chart["figure"].draw_artist(artist)
+
+    chart["canvas"].mpl_connect("draw_event", on_draw)
+
+def redraw_chart(chart):
+    """Redraws the animated artists of a chart by blitting them onto the cached background."""
+    canvas = chart["canvas"]
+    if chart["background"] is None:
+        canvas.draw_idle()
+        return
+    canvas.restore_region(chart["background"])
+    for artist in chart["animated"]:
+        chart["figure"].draw_artist(artist)
+    canvas.blit(chart["figure"].bbox)
+
+def create_bar_chart(frame, emotion_counts=None):
     """
     Generates a bar chart displaying the percentage distribution of dominant emotions.
     
     Parameters:
     - frame: The Tkinter frame where the chart will be displayed.
-    - emotion_counts: A Pandas Series containing emotion labels and their respective percentages.
+    - emotion_counts: Optional mapping (e.g. a Pandas Series) of emotion labels to percentages.
+
+    Returns:
+    - dict: The figure, canvas and artists of the chart, used by update_bar_chart.
     """
-    colors = [COLOR_MAP[emotion] for emotion in emotion_counts.index]
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
 
-    fig_bar, ax_bar = plt.subplots(figsize=(5, 4))
-    emotion_counts.plot(kind='bar', color=colors, ax=ax_bar)
+    emotions = list(COLOR_MAP.keys())
+
+    fig_bar = Figure(figsize=(5, 4))
+    ax_bar = fig_bar.add_subplot(111)
+    bars = ax_bar.bar(emotions, [0] * len(emotions), color=[COLOR_MAP[emotion] for emotion in emotions], animated=True)
     ax_bar.set_title("Percentage of Dominant Emotions (Bar Chart)", fontsize=10)
     ax_bar.set_xlabel("Emotions", fontsize=10)
     ax_bar.set_ylabel("Percentage (%)", fontsize=10)
-    ax_bar.set_xticklabels(ax_bar.get_xticklabels(), rotation=0, fontsize=9)
+    ax_bar.set_ylim(0, 105)
+    ax_bar.tick_params(axis='x', rotation=0, labelsize=9)
     ax_bar.grid(axis='y', linestyle='--', alpha=0.7)
 
-    # Display emotion percentage above bars
-    for i, value in enumerate(emotion_counts):
-        ax_bar.text(i, value + 1, f"{value:.1f}%", ha='center', fontsize=7)
+    # Emotion percentage above bars
+    value_labels = [ax_bar.text(i, 1, "", ha='center', fontsize=7, animated=True) for i in range(len(emotions))]
 
     canvas_bar = FigureCanvasTkAgg(fig_bar, master=frame)
+    chart = {
+        "figure": fig_bar, "canvas": canvas_bar, "emotions": emotions,
+        "bars": bars, "value_labels": value_labels, "animated": [*bars, *value_labels],
+    }
+    enable_blitting(chart)
+    update_bar_chart(chart, emotion_counts if emotion_counts is not None else {})
     canvas_bar.draw()
     canvas_bar.get_tk_widget().pack(fill=BOTH, expand=True)
+    return chart
 
-def create_time_based_line_chart(frame, emotions_data):
+def update_bar_chart(chart, emotion_counts):
     """
-    Generates a time-based line chart displaying emotion intensity over time.
-    Includes a hover effect to emphasize selected lines.
+    Updates the bar heights and percentage labels in place.
 
     Parameters:
-    - frame: The Tkinter frame where the chart will be displayed.
-    - emotions_data: A Pandas DataFrame containing time and emotion intensity values.
+    - chart: The chart returned by create_bar_chart.
+    - emotion_counts: Mapping (e.g. a Pandas Series) of emotion labels to percentages.
     """
-    if emotions_data.empty:
-        print("No data available for line chart.")
-        return
+    for i, (emotion, bar, value_label) in enumerate(zip(chart["emotions"], chart["bars"], chart["value_labels"])):
+        value = float(emotion_counts.get(emotion, 0.0))
+        bar.set_height(value)
+        value_label.set_position((i, value + 1))
+        value_label.set_text(f"{value:.1f}%" if value else "")
 
-    fig_line, ax_line = plt.subplots(figsize=(6, 5))
+def create_time_based_line_chart(frame, emotions_data=None):
+    """
+    Generates a time-based line chart displaying emotion intensity over time.
+    Includes a hover effect to emphasize selected lines and a toolbar for zooming and panning.
+    Only about one point per horizontal pixel of the visible range is drawn.
 
-    def smooth(values, window_size=5):
-        """Applies a moving average smoothing to the data."""
-        return pd.Series(values).rolling(window=window_size, min_periods=1).mean()
+    Parameters:
+    - frame: The Tkinter frame where the chart will be displayed.
+    - emotions_data: Optional Pandas DataFrame (or mapping of emotion to values) with emotion intensities.
 
-    normalized_time = [x / (len(emotions_data) - 1) for x in range(len(emotions_data))]
+    Returns:
+    - dict: The figure, canvas and lines of the chart, used by update_time_based_line_chart.
+    """
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.figure import Figure
+    from chart_lod import nearest_line
+
+    fig_line = Figure(figsize=(6, 5))
+    ax_line = fig_line.add_subplot(111)
 
     lines = {}
     for emotion in COLOR_MAP.keys():
-        if emotion in emotions_data.columns:
-            smoothed_values = smooth(emotions_data[emotion])
-            line, = ax_line.plot(
-                normalized_time,
-                smoothed_values,
-                label=emotion,
-                color=COLOR_MAP[emotion],
-                linestyle='-',
-                linewidth=1,
-                alpha=0.7
-            )
-            lines[emotion] = line
+        line, = ax_line.plot(
+            [], [],
+            label=emotion,
+            color=COLOR_MAP[emotion],
+            linestyle='-',
+            linewidth=1,
+            alpha=0.7,
+            animated=True
+        )
+        lines[emotion] = line
 
     ax_line.set_title("Emotion Intensity Over Time", fontsize=10)
     ax_line.set_xlabel("Time")
     ax_line.set_ylabel("Intensity", fontsize=10)
+    ax_line.set_xlim(0, 1)
+    ax_line.set_ylim(0, 100)
     ax_line.grid(axis='y', linestyle='--', alpha=0.5)
     ax_line.set_xticks([])
 
@@ -150,92 +326,449 @@ def create_time_based_line_chart(frame, emotions_data):
                 break
 
         if not hovered and event.inaxes == ax_line:
-            for emotion, line in lines.items():
-                if line.contains(event)[0]:
-                    line.set_alpha(1.0)
-                    line.set_linewidth(2)
-                    hovered = True
-                else:
-                    line.set_alpha(0.1)
-                    line.set_linewidth(1)
+            # Only the segment under the mouse is tested per line
+            emotion = nearest_line(ax_line, lines, event)
+            if emotion is not None:
+                hovered = True
+                for emo, line in lines.items():
+                    line.set_alpha(1.0 if emo == emotion else 0.1)
+                    line.set_linewidth(2 if emo == emotion else 1)
 
         if not hovered:
+            emotion = None
             for line in lines.values():
                 line.set_alpha(0.7)
                 line.set_linewidth(1)
 
-        fig_line.canvas.draw_idle()
+        # Redraw only when the highlighted line changes
+        if chart.get("highlight", None) != emotion:
+            chart["highlight"] = emotion
+            redraw_chart(chart)
 
     fig_line.canvas.mpl_connect('motion_notify_event', on_hover)
 
     canvas_line = FigureCanvasTkAgg(fig_line, master=frame)
+    toolbar = NavigationToolbar2Tk(canvas_line, frame, pack_toolbar=False)
+    toolbar.update()
+    toolbar.pack(side=BOTTOM, fill=X)
+
+    chart = {
+        "figure": fig_line, "canvas": canvas_line, "axes": ax_line, "toolbar": toolbar,
+        "lines": lines, "animated": list(lines.values()), "full": {},
+    }
+    enable_blitting(chart)
+
+    # Re-decimate for the visible range on zoom/pan and for the new pixel width on resize
+    ax_line.callbacks.connect('xlim_changed', lambda ax: render_line_viewport(chart))
+    canvas_line.mpl_connect('resize_event', lambda event: render_line_viewport(chart))
+
+    if emotions_data is not None:
+        update_time_based_line_chart(chart, emotions_data)
     canvas_line.draw()
     canvas_line.get_tk_widget().pack(fill=BOTH, expand=True)
+    return chart
 
-def show_emotion_analysis():
+def update_time_based_line_chart(chart, emotions_data, cache_key=None, smoothed=False, view_key=None):
     """
-    Reads emotion analysis data from CSV and updates the GUI with visualizations.
-    Displays a bar chart for dominant emotions and a time-based line chart for intensity trends.
+    Replaces the data of the emotion lines in place.
+    The smoothed full-resolution series are kept in the chart (and cached per session),
+    the lines themselves only receive the decimated visible part.
+
+    Parameters:
+    - chart: The chart returned by create_time_based_line_chart.
+    - emotions_data: Pandas DataFrame (or mapping of emotion to values) with emotion intensities.
+    - cache_key: Optional key identifying the session, used to reuse the smoothed series.
+    - smoothed: True if the values are already smoothed (e.g. the series of a session summary).
+    - view_key: Key of the displayed data (defaults to cache_key). The zoom is only reset when it
+      changes, so live updates of the same session keep the range the user zoomed to.
     """
-    try:
-        emotions_data = pd.read_csv(csv_path)
-        emotion_counts = emotions_data['dominant_emotion'].value_counts(normalize=True) * 100
+    global series_cache
+    import numpy as np
+    from chart_lod import SeriesCache
+    from session_store import smooth
+
+    if series_cache is None:
+        series_cache = SeriesCache()
+
+    def compute_series():
+        series = {}
+        for emotion in chart["lines"]:
+            if emotion in emotions_data and len(emotions_data[emotion]) > 0:
+                values = np.asarray(emotions_data[emotion], dtype=float)
+                series[emotion] = (np.linspace(0, 1, len(values)), values if smoothed else smooth(values))
+        return series
+
+    chart["full"] = series_cache.get(cache_key, compute_series) if cache_key is not None else compute_series()
+    if view_key is None:
+        view_key = cache_key
+    if view_key is None or view_key != chart.get("view"):
+        chart["view"] = view_key
+        chart["axes"].set_xlim(0, 1, emit=False)
+        chart["toolbar"].update()  # Reset the zoom history for the new data
+    render_line_viewport(chart)
+
+def render_line_viewport(chart):
+    """Draws the visible range of every series, decimated to about the pixel width of the axes."""
+    from chart_lod import decimate, visible_slice
+
+    ax_line = chart["axes"]
+    x_min, x_max = ax_line.get_xlim()
+    n_out = max(int(ax_line.bbox.width), 100)
+    for emotion, line in chart["lines"].items():
+        if emotion not in chart["full"]:
+            line.set_data([], [])
+            continue
+        x, y = chart["full"][emotion]
+        view = visible_slice(x, x_min, x_max)
+        line.set_data(*decimate(x[view], y[view], n_out))
+
+def ensure_charts():
+    """
+    Creates the bar chart and the line chart on first use.
+    Later sessions reuse the same figures, so no figures pile up.
+    """
+    if charts:
+        return charts
+
+    for widget in graphics_area.winfo_children():
+        widget.destroy()
+
+    left_frame = Frame(graphics_area, bg="white")
+    left_frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+    charts["bar"] = create_bar_chart(left_frame)
 
-        for widget in graphics_area.winfo_children():
-            widget.destroy()
+    right_frame = Frame(graphics_area, bg="white")
+    right_frame.pack(side=RIGHT, fill=BOTH, expand=True, padx=5, pady=5)
+    charts["line"] = create_time_based_line_chart(right_frame)
+    return charts
 
-        left_frame = Frame(graphics_area, bg="white")
-        left_frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
-        create_bar_chart(left_frame, emotion_counts)
+class ResultsTailer:
+    """
+    Incrementally reads the rows appended to the results CSV file.
+
+    Attributes:
+    - path (str): Path of the results file.
+    - offset (int): Number of bytes consumed so far (always at a line boundary).
+    """
 
-        right_frame = Frame(graphics_area, bg="white")
-        right_frame.pack(side=RIGHT, fill=BOTH, expand=True, padx=5, pady=5)
-        create_time_based_line_chart(right_frame, emotions_data)
+    def __init__(self, path):
+        """Initialize the tailer at the beginning of the file."""
+        self.path = path
+        self.offset = 0
+        self.fieldnames = None
+
+    def read_new_rows(self):
+        """
+        Returns the complete rows appended since the last call.
+        A file that was truncated or recreated is read again from the start.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            self.offset = 0
+            self.fieldnames = None
+        if size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self.offset += end + 1
+
+        lines = data[:end + 1].decode("utf-8").splitlines()
+        if self.fieldnames is None and lines:
+            self.fieldnames = next(csv.reader([lines.pop(0)]))
+        return list(csv.DictReader(lines, fieldnames=self.fieldnames))
+
+class LiveDashboard:
+    """
+    Live view of a running detection session.
+    If the detection script keeps streaming statistics (stats.json), the charts show them
+    directly: the distribution and the downsampled smoothed series of the whole session,
+    without reading a single record. Otherwise the results file is tailed and only the most
+    recent LIVE_WINDOW records are kept for the line chart. Either way the cost per redraw
+    stays constant however long the session runs, and the existing chart artists are
+    updated in place at a capped rate.
+    """
+
+    def __init__(self, path, stats_path=None, redraw_interval_ms=LIVE_REDRAW_INTERVAL_MS, window=LIVE_WINDOW):
+        """Initialize the tailer and empty running statistics."""
+        self.tailer = ResultsTailer(path)
+        self.stats_path = stats_path
+        self.stats_mtime = None
+        self.summary = None  # Summary of the streaming statistics, once the script has saved them
+        self.redraw_interval = redraw_interval_ms / 1000
+        self.counts = {emotion: 0 for emotion in COLOR_MAP}
+        self.total = 0
+        self.series = {emotion: deque(maxlen=window) for emotion in COLOR_MAP}
+        self.last_redraw = 0.0
+        self.dirty = False
+
+    def read_stats(self):
+        """Returns the streaming statistics if the detection script has saved new ones since the last call."""
+        from emotion_stats import read_stats
+
+        if self.stats_path is None:
+            return None
+        try:
+            mtime = os.stat(self.stats_path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self.stats_mtime:
+            return None
+        self.stats_mtime = mtime
+        return read_stats(self.stats_path)
+
+    def poll(self):
+        """Consumes new statistics or records and redraws the charts if the redraw interval has passed."""
+        stats = self.read_stats()
+        if stats is not None:
+            self.summary = stats["summary"]
+            self.dirty = True
+        # Records are only tailed as long as there are no streaming statistics
+        rows = self.tailer.read_new_rows() if self.summary is None else []
+        for row in rows:
+            try:
+                values = {emotion: float(row[emotion]) for emotion in COLOR_MAP}
+            except (KeyError, TypeError, ValueError):
+                continue  # Skip incomplete rows
+            if row.get("dominant_emotion") in self.counts:
+                self.counts[row["dominant_emotion"]] += 1
+                self.total += 1
+            for emotion, value in values.items():
+                self.series[emotion].append(value)
+            self.dirty = True
+
+        now = time.monotonic()
+        if self.dirty and now - self.last_redraw >= self.redraw_interval:
+            self.redraw()
+            self.last_redraw = now
+            self.dirty = False
+
+    def redraw(self):
+        """Updates both charts in place and blits them."""
+        import numpy as np
+
+        live_charts = ensure_charts()
+        if self.summary is not None:
+            update_bar_chart(live_charts["bar"], self.summary["distribution"])
+            update_time_based_line_chart(live_charts["line"], self.summary["series"], smoothed=True,
+                                         view_key=(self.tailer.path, "summary"))
+            redraw_chart(live_charts["bar"])
+            redraw_chart(live_charts["line"])
+            return
+
+        total = max(self.total, 1)
+        update_bar_chart(live_charts["bar"], {emotion: 100 * count / total for emotion, count in self.counts.items()})
+        update_time_based_line_chart(live_charts["line"], {emotion: np.fromiter(values, dtype=float, count=len(values))
+                                                           for emotion, values in self.series.items()},
+                                     view_key=(self.tailer.path, "records"))
+        redraw_chart(live_charts["bar"])
+        redraw_chart(live_charts["line"])
+
+def session_label(entry):
+    """Formats an index entry for the session list, e.g. "2025-03-01 14:05  Real-Time  (1234 records)"."""
+    started = datetime.fromtimestamp(entry["started_at"] / 1000).strftime("%Y-%m-%d %H:%M")
+    return f"{started}  {entry.get('mode') or '?'}  ({entry.get('records', 0)} records)"
+
+def show_emotion_analysis(session_id=None):
+    """
+    Shows the precomputed summary of a session in the GUI.
+    Displays a bar chart for dominant emotions and a time-based line chart for intensity trends.
+    The charts are updated in place, so repeated sessions do not create new figures.
+
+    Parameters:
+    - session_id: Session to show; defaults to the most recent session.
+    """
+    if session_id is None:
+        latest = session_store().latest_session()
+        session_id = latest["session_id"] if latest is not None else None
+    summary = session_store().load_summary(session_id) if session_id is not None else None
+    if summary is None or not summary["records"]:
+        if charts:
+            clicked.config(text="No data available. Please run the detection first.", fg="red")
+        else:
+            error_label = Label(graphics_area, text="No data available. Please run the detection first.", fg="red", font=("Helvetica", 12))
+            error_label.pack(fill=BOTH, expand=True)
+        return
 
-        if resize_message_label.winfo_ismapped():
-            resize_message_label.grid_forget()
+    current_charts = ensure_charts()
+    update_bar_chart(current_charts["bar"], summary["distribution"])
+    update_time_based_line_chart(current_charts["line"], summary["series"], session_id, smoothed=True)
+    redraw_chart(current_charts["bar"])
+    redraw_chart(current_charts["line"])
 
-    except FileNotFoundError:
-        error_label = Label(graphics_area, text="No data available. Please run the detection first.", fg="red", font=("Helvetica", 12))
-        error_label.pack(fill=BOTH, expand=True)
+    if resize_message_label.winfo_ismapped():
+        resize_message_label.grid_forget()
 
-def open_sub_gui(script_name, executing_text):
+def show_session_comparison(session_ids):
+    """
+    Opens a window comparing several sessions side by side, using only their summaries.
+    The upper chart stacks the dominant emotion distribution of every session,
+    the lower chart shows the median intensity of every emotion per session.
+
+    Parameters:
+    - session_ids: IDs of the sessions to compare, in chronological order.
+    """
+    import numpy as np
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+
+    session_ids = session_ids[-MAX_COMPARED_SESSIONS:]
+    summaries = [session_store().load_summary(session_id) for session_id in session_ids]
+    positions = np.arange(len(session_ids))
+
+    window = Toplevel(frame)
+    window.title(f"Session Comparison ({len(session_ids)} sessions)")
+    window.geometry("1000x700")
+
+    fig_compare = Figure(figsize=(10, 7))
+    ax_distribution, ax_median = fig_compare.subplots(2, 1, sharex=True)
+    bottom = np.zeros(len(session_ids))
+    for emotion, color in COLOR_MAP.items():
+        values = np.array([summary["distribution"].get(emotion, 0.0) for summary in summaries])
+        ax_distribution.bar(positions, values, bottom=bottom, color=color, label=emotion)
+        bottom += values
+        medians = [summary["percentiles"].get(emotion, {}).get("p50", np.nan) for summary in summaries]
+        ax_median.plot(positions, medians, color=color, marker="o", markersize=3, linewidth=1, label=emotion)
+
+    ax_distribution.set_title("Percentage of Dominant Emotions per Session", fontsize=10)
+    ax_distribution.set_ylabel("Percentage (%)", fontsize=10)
+    ax_distribution.set_ylim(0, 105)
+    ax_distribution.legend(title="Emotions", loc="upper left", bbox_to_anchor=(1.0, 1.0), fontsize=8)
+    ax_median.set_title("Median Emotion Intensity per Session", fontsize=10)
+    ax_median.set_ylabel("Intensity", fontsize=10)
+    ax_median.set_ylim(0, 100)
+    ax_median.grid(axis='y', linestyle='--', alpha=0.5)
+    ax_median.set_xticks(positions)
+    ax_median.set_xticklabels(session_ids, rotation=90, fontsize=7)
+    fig_compare.tight_layout()
+
+    canvas_compare = FigureCanvasTkAgg(fig_compare, master=window)
+    canvas_compare.draw()
+    canvas_compare.get_tk_widget().pack(fill=BOTH, expand=True)
+
+def open_session_browser():
+    """
+    Opens the list of past sessions. A single selected session is shown in the main charts,
+    several selected sessions (at most MAX_COMPARED_SESSIONS) are compared in a separate window.
+    The list can be restricted to a time range, which is answered from the session index.
+    """
+    ranges = {"All": None, "Last 24 hours": 24 * 3600 * 1000, "Last 7 days": 7 * 24 * 3600 * 1000,
+              "Last 30 days": 30 * 24 * 3600 * 1000}
+
+    window = Toplevel(frame)
+    window.title("Sessions")
+    window.geometry("520x420")
+
+    time_range = StringVar(value="All")
+    listed = []  # Index entries in the order of the list box
+
+    def refresh_list(*_):
+        span = ranges[time_range.get()]
+        start_ms = int(time.time() * 1000) - span if span is not None else None
+        listed[:] = list(reversed(session_store().sessions(start_ms=start_ms)))  # Newest first
+        session_list.delete(0, END)
+        for entry in listed:
+            session_list.insert(END, session_label(entry))
+
+    def selected_ids():
+        return [listed[i]["session_id"] for i in session_list.curselection()]
+
+    def open_selected():
+        ids = selected_ids()
+        if len(ids) == 1:
+            show_emotion_analysis(ids[0])
+            clicked.config(text=f"Session {session_label(listed[session_list.curselection()[0]])}", fg="firebrick")
+        elif len(ids) > 1:
+            show_session_comparison(sorted(ids))
+
+    range_menu = OptionMenu(window, time_range, *ranges, command=refresh_list)
+    range_menu.pack(fill=X, padx=10, pady=5)
+
+    session_list = Listbox(window, selectmode=EXTENDED, font=("Courier", 10))
+    session_list.pack(fill=BOTH, expand=True, padx=10, pady=5)
+    session_list.bind("<Double-Button-1>", lambda event: open_selected())
+
+    Button(window, text="Open / Compare selected", command=open_selected).pack(pady=5)
+    refresh_list()
+
+def open_sub_gui(script_name, executing_text, live=False, session_mode=None):
     """
     Opens the selected sub-GUI for emotion detection.
 
     Parameters:
     - script_name: Name of the Python script to execute.
     - executing_text: Status message to display while execution is in progress.
+    - live: Keep the controller visible and update the charts while the detection runs.
+    - session_mode: Mode name of the new session the results are recorded in (None if the script records no results).
     """
-    def run_sub_gui():
+    session_id = None
+    if session_mode is not None:
         try:
-            clear_csv_file()
-            clicked.config(text=executing_text, fg="green")
-            frame.update()
-
-            def hide_main_gui():
-                frame.withdraw()
-                script_path = os.path.join(detection_dir, script_name)
-                process = subprocess.Popen([python_path, script_path], cwd=current_dir)
-                process.wait()
-                frame.deiconify()
-                clicked.config(text="Start the emotion recognition", fg="firebrick")
-                frame.state('zoomed')
-                show_emotion_analysis()
-
-            frame.after(1000, hide_main_gui)
+            session_id = session_store().create_session(session_mode)
+        except OSError as e:
+            clicked.config(text=f"Error: {e}", fg="red")
+            return
+    clicked.config(text=executing_text, fg="green")
 
+    def launch_sub_gui():
+        try:
+            script_path = os.path.join(detection_dir, script_name)
+            process = subprocess.Popen([resolve_python_interpreter(), script_path], cwd=current_dir,
+                                       env=sub_gui_environment(session_id))
         except Exception as e:
             clicked.config(text=f"Error: {e}", fg="red")
-            frame.deiconify()
+            if session_id is not None:
+                session_store().close_session(session_id)
+            return
+
+        dashboard = None
+        if live and session_id is not None:
+            from session_store import RESULTS_FILENAME
+            from emotion_stats import STATS_FILENAME
+
+            directory = session_store().session_dir(session_id)
+            dashboard = LiveDashboard(os.path.join(directory, RESULTS_FILENAME), os.path.join(directory, STATS_FILENAME))
+        else:
+            frame.withdraw()
+        frame.after(POLL_INTERVAL_MS, watch_sub_gui, process, dashboard, session_id)
+
+    frame.after(1000, launch_sub_gui)
 
-    thread = threading.Thread(target=run_sub_gui)
-    thread.start()
+def watch_sub_gui(process, dashboard, session_id=None):
+    """
+    Polls the running sub-GUI without blocking the Tkinter main loop.
+    Updates the live dashboard while it runs; when it exits, the session is closed
+    (which precomputes its summary) and its analysis is shown.
+
+    Parameters:
+    - process: The subprocess of the detection script.
+    - dashboard: The LiveDashboard of the session, or None.
+    - session_id: The session the script records into, or None.
+    """
+    if dashboard is not None:
+        dashboard.poll()
+    if process.poll() is None:
+        frame.after(POLL_INTERVAL_MS, watch_sub_gui, process, dashboard, session_id)
+        return
+
+    frame.deiconify()
+    clicked.config(text="Start the emotion recognition", fg="firebrick")
+    frame.state('zoomed')
+    if session_id is not None:
+        session_store().close_session(session_id)
+        show_emotion_analysis(session_id)
 
 def button_action():
     """
     Handles user selection for emotion detection mode.
-    Initiates either static image analysis or real-time detection.
+    Initiates static image analysis, real-time detection or offline video analysis.
     """
     selected_mode = mode.get()
     if selected_mode == "Modus":
@@ -243,11 +776,15 @@ def button_action():
     elif selected_mode == "Static":
         open_sub_gui("emotion_detection_static.py", "Executing Static emotion recognition...")
     elif selected_mode == "Real-Time":
-        open_sub_gui("emotion_detection_realtime.py", "Executing Real-Time emotion recognition...")
+        open_sub_gui("emotion_detection_realtime.py", "Executing Real-Time emotion recognition...", live_dashboard.get(),
+                     session_mode="Real-Time")
+    elif selected_mode == "Video":
+        open_sub_gui("emotion_detection_video.py", "Executing Video emotion recognition...", live_dashboard.get(),
+                     session_mode="Video")
 
 def exit_to_main_gui():
-    """Exits the main GUI and clears the CSV file."""
-    clear_csv_file()
+    """Exits the main GUI and stops the inference worker. The sessions are kept."""
+    stop_inference_worker()
     frame.quit()
 
 # Initialize GUI
@@ -263,8 +800,11 @@ frame.grid_columnconfigure(2, weight=1)
 frame.grid_columnconfigure(3, weight=1)
 frame.grid_rowconfigure(3, weight=4)
 
+sessions_button = Button(frame, text="Sessions...", command=open_session_browser, width=10, font=("Arial", 11))
+sessions_button.grid(row=0, column=0, padx=10, pady=10, sticky="e")
+
 mode = StringVar(value="Modus")
-options = ["Static", "Real-Time"]
+options = ["Static", "Real-Time", "Video"]
 
 option_menu = OptionMenu(frame, mode, *options)
 option_menu.config(width=12, font=("Arial", 12, "bold"), bg="lightblue", fg="black", activebackground="blue", activeforeground="white")
@@ -273,6 +813,10 @@ option_menu.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
 start = Button(frame, text="Start", command=button_action, width=10, height=2, bg="lime", fg="darkgreen", font=("Arial", 12, "bold"))
 start.grid(row=0, column=2, padx=10, pady=10, sticky="ew")
 
+live_dashboard = BooleanVar(value=False)
+live_check = Checkbutton(frame, text="Live dashboard", variable=live_dashboard, font=("Arial", 11))
+live_check.grid(row=0, column=3, padx=10, pady=10, sticky="w")
+
 clicked = Label(frame, text="Start the emotion recognition", font=("Arial", 12), fg="firebrick")
 clicked.grid(row=1, column=0, columnspan=4, pady=5, sticky="n")
 
@@ -289,4 +833,16 @@ resize_message_label.grid_forget()
 exit = Button(frame, text="Exit", command=exit_to_main_gui, bg="red", fg="white", width=10, height=1)
 exit.grid(row=4, column=0, sticky="sw", padx=5, pady=5)
 
-frame.mainloop()
\ No newline at end of file
+def finish_startup_probe():
+    """Reports the time until the window is shown and quits (startup report only)."""
+    print(f"STARTUP_MS {(time.perf_counter() - startup_time) * 1000:.1f}", flush=True)
+    frame.quit()
+
+if STARTUP_PROBE_FLAG in sys.argv[1:]:
+    frame.after_idle(finish_startup_probe)
+else:
+    # Resolve the interpreter and load the emotion model in the background while the user selects a mode
+    frame.after(0, lambda: threading.Thread(target=prewarm, name="prewarm", daemon=True).start())
+
+frame.mainloop()
+stop_inference_worker()
\ No newline at end of file